@@ -0,0 +1,140 @@
+"""Compare note latency through the daemon with direct SQLite access.
+
+Reports, as one JSON object per measurement:
+
+* cli-add / cli-list: wall-clock of a full `main.py` run, direct vs daemon;
+* request-add / request-list: in-process latency of one operation, i.e.
+  `add_note`/`list_notes` (open DB, run, close) vs one daemon round trip;
+* concurrent-add: throughput of many clients adding at once through the
+  daemon, with the mean group-commit size.
+
+    python3 final/bench/bench_daemon.py --runs 50
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from daemon import NotesDaemon, connect  # noqa: E402
+from notes_core import add_note, list_notes, new_note_fields  # noqa: E402
+
+MAIN = os.path.join(ROOT, "main.py")
+
+
+def timed(fn, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def report(name: str, direct: dict, daemon: dict) -> None:
+    print(json.dumps({"benchmark": name, "direct": direct, "daemon": daemon}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=30)
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--adds-per-client", type=int, default=50)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        sink = io.StringIO()
+
+        def cli(argv, use_daemon):
+            env = dict(os.environ)
+            if not use_daemon:
+                env["NOTES_NO_DAEMON"] = "1"
+            return lambda: subprocess.run(
+                [sys.executable, MAIN] + argv + ["--db", db_path], env=env, stdout=subprocess.DEVNULL, check=True
+            )
+
+        def direct_add():
+            with redirect_stdout(sink):
+                add_note("bench", ["direct add"], None, db_path=db_path)
+
+        def direct_list():
+            with redirect_stdout(sink):
+                list_notes(limit=20, db_path=db_path)
+
+        # Direct numbers first, before the daemon's socket exists.
+        direct = {
+            "cli-add": timed(cli(["add", "-t", "cli add"], False), args.runs),
+            "cli-list": timed(cli(["list"], False), args.runs),
+            "request-add": timed(direct_add, args.runs),
+            "request-list": timed(direct_list, args.runs),
+        }
+
+        daemon = NotesDaemon(db_path)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        while daemon.server is None:
+            time.sleep(0.01)
+        try:
+            client = connect(db_path)
+            fields = new_note_fields("bench", ["daemon add"], None)
+            via_daemon = {
+                "cli-add": timed(cli(["add", "-t", "cli add"], True), args.runs),
+                "cli-list": timed(cli(["list"], True), args.runs),
+                "request-add": timed(lambda: client.request("add", fields=fields), args.runs),
+                "request-list": timed(lambda: client.request("list", limit=20), args.runs),
+            }
+            client.close()
+            for name in direct:
+                report(name, direct[name], via_daemon[name])
+
+            commits_before, added_before = daemon.add_commits, daemon.notes_added
+
+            def writer():
+                c = connect(db_path)
+                for _ in range(args.adds_per_client):
+                    c.request("add", fields=fields)
+                c.close()
+
+            threads = [threading.Thread(target=writer) for _ in range(args.clients)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            added = daemon.notes_added - added_before
+            commits = daemon.add_commits - commits_before
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "concurrent-add",
+                        "clients": args.clients,
+                        "notes": added,
+                        "notes_per_second": round(added / elapsed),
+                        "mean_group_size": round(added / max(commits, 1), 2),
+                    }
+                )
+            )
+        finally:
+            daemon.shutdown()
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark subtree queries (`list-dir --recursive`) on many distinct directories.
+
+Builds a monorepo-shaped database (services / packages / modules) and times
+`--directory-prefix` at several depths against the naive `directory LIKE
+'prefix/%'` scan it replaces. Reports the median of `--runs` queries, the
+number of matching notes and the query plan, as one JSON object per query:
+
+    python3 final/bench/bench_dirtree.py --rows 1000000 --dirs 50000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from database import dir_key, open_db  # noqa: E402
+from notes_core import INSERT_NOTE_SQL, NOTE_COLUMNS, NotesStore, _list_query  # noqa: E402
+
+MONOREPO = "/srv/mono"
+
+
+def directory(n: int) -> str:
+    return f"{MONOREPO}/svc{n % 50}/pkg{n // 50 % 40}/mod{n // 2000}"
+
+
+def populate(db_path: str, rows: int, dirs: int, batch: int = 10000) -> None:
+    conn = open_db(db_path)
+    for start in range(0, rows, batch):
+        conn.executemany(
+            INSERT_NOTE_SQL,
+            (
+                (
+                    f"user{i % 13}",
+                    "bench-host",
+                    f"2024-01-01T00:00:{i // 1000 % 60:02d}.{i % 1000:03d}Z",
+                    None,
+                    f"task {i}",
+                    None,
+                    directory(i % dirs),
+                    0,
+                    None,
+                    dir_key(directory(i % dirs)),
+                )
+                for i in range(start, min(start + batch, rows))
+            ),
+        )
+        conn.commit()
+    conn.close()
+
+
+def timed(run, runs: int) -> tuple[float, int]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        count = run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), count
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--dirs", type=int, default=20000)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--runs", type=int, default=20)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        populate(db_path, args.rows, args.dirs)
+        with NotesStore(db_path) as store:
+            for prefix in [MONOREPO, f"{MONOREPO}/svc7", f"{MONOREPO}/svc7/pkg3", directory(7 + 3 * 50)]:
+                q, params = _list_query(args.limit, None, None, None, None, directory_prefix=prefix)
+                plan = [row[3] for row in store.conn.execute("EXPLAIN QUERY PLAN " + q, params)]
+
+                def ranged() -> int:
+                    return sum(1 for _ in store.query(args.limit, directory_prefix=prefix))
+
+                def like() -> int:
+                    return len(store.conn.execute(
+                        f"SELECT {NOTE_COLUMNS} FROM notes WHERE is_hidden = 0 AND (directory = ? OR directory LIKE ?) "
+                        "ORDER BY ts_epoch_ms DESC, id DESC LIMIT ?",
+                        (prefix, prefix + "/%", args.limit),
+                    ).fetchall())
+
+                for name, run in [("directory-prefix", ranged), ("like-scan", like)]:
+                    seconds, count = timed(run, args.runs)
+                    print(json.dumps({"benchmark": name, "rows": args.rows, "dirs": args.dirs, "prefix": prefix,
+                                      "matches": count, "seconds": round(seconds, 5),
+                                      **({"plan": plan} if name == "directory-prefix" else {})}))
+
+
+if __name__ == "__main__":
+    main()
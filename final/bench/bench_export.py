@@ -0,0 +1,89 @@
+"""Benchmark `export` against `list` on a large database.
+
+Reports rows per second and the peak RSS of each command, measured in a
+separate process, as one JSON object per command. Under the default
+`concurrent` profile the RSS includes SQLite's 64 MiB mmap window; use
+NOTES_DB_PROFILE=compat to see the Python-side footprint alone.
+
+    python3 final/bench/bench_export.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from database import open_db  # noqa: E402
+from notes_core import INSERT_NOTE_SQL  # noqa: E402
+
+
+def populate(db_path: str, rows: int, batch: int = 10000) -> None:
+    conn = open_db(db_path)
+    for start in range(0, rows, batch):
+        conn.executemany(
+            INSERT_NOTE_SQL,
+            (
+                (
+                    f"user{i % 13}",
+                    "bench-host",
+                    f"2024-01-01T00:00:00.{i:06d}Z",
+                    f"project{i % 31}",
+                    f"task {i}; follow-up {i}",
+                    "benchmark note",
+                    f"/srv/repo/dir{i % 97}",
+                    0,
+                    None,
+                    f"/srv/repo/dir{i % 97}/",
+                )
+                for i in range(start, min(start + batch, rows))
+            ),
+        )
+        conn.commit()
+    conn.close()
+
+
+def measure(cmd: list[str]) -> dict:
+    """Run `cmd` with stdout discarded; return wall time and peak RSS."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} exited with {proc.returncode}")
+    # ru_maxrss is in kilobytes on Linux.
+    return {"seconds": round(elapsed, 3), "peak_rss_mb": round(usage.ru_maxrss / 1024, 1)}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--db", help="Reuse an existing database instead of generating one")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        if not args.db:
+            populate(db_path, args.rows)
+
+        main_py = os.path.join(ROOT, "main.py")
+        commands = {
+            "export-jsonl": [sys.executable, main_py, "export", "--db", db_path],
+            "export-csv": [sys.executable, main_py, "export", "-f", "csv", "--db", db_path],
+            "list": [sys.executable, main_py, "list", "--limit", str(args.rows), "--db", db_path],
+        }
+        for name, cmd in commands.items():
+            result = measure(cmd)
+            result["rows_per_second"] = round(args.rows / result["seconds"])
+            print(json.dumps({"benchmark": name, "rows": args.rows, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark `add --follow` against one `add` process per line.
+
+Pipes `--lines` lines into a single `add --follow` run, and `--per-line`
+lines through separate `add -t LINE` processes (what a shell loop over a
+job's output does), and reports lines per second for each as one JSON
+object per line:
+
+    python3 final/bench/bench_follow.py --lines 200000 --per-line 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+MAIN = os.path.join(ROOT, "main.py")
+
+
+def report(name: str, lines: int, elapsed: float, **extra) -> None:
+    print(json.dumps({"benchmark": name, "lines": lines, "seconds": round(elapsed, 3),
+                      "lines_per_second": round(lines / elapsed), **extra}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--lines", type=int, default=100000)
+    p.add_argument("--per-line", type=int, default=200, help="Lines to add with one process each")
+    p.add_argument("--batch-lines", type=int, default=100)
+    args = p.parse_args()
+    env = dict(os.environ, NOTES_NO_DAEMON="1")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "follow.db")
+        data = "".join(f"deploy step {i}: ok\n" for i in range(args.lines)).encode()
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, MAIN, "add", "--follow", "-p", "bench", "--batch-lines", str(args.batch_lines),
+             "--db", db_path],
+            input=data, env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+        report("add-follow", args.lines, time.perf_counter() - start, batch_lines=args.batch_lines)
+
+        db_path = os.path.join(tmp, "per-line.db")
+        start = time.perf_counter()
+        for i in range(args.per_line):
+            subprocess.run(
+                [sys.executable, MAIN, "add", "-p", "bench", "-t", f"deploy step {i}: ok", "--db", db_path],
+                env=env, stdout=subprocess.DEVNULL, stdin=subprocess.DEVNULL, check=True,
+            )
+        report("add-per-line", args.per_line, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
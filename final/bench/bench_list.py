@@ -0,0 +1,68 @@
+"""Benchmark `list` on a large result set.
+
+Runs `list --limit N` once per output format and reports wall time, rows
+per second and peak RSS, as one JSON object per run. A `materialized` run
+renders the same rows the way `list` used to (fetchall, then one string per
+note) for comparison. Set NOTES_DB_PROFILE=compat to leave SQLite's mmap
+window out of the RSS figures.
+
+    python3 final/bench/bench_list.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+from bench_export import measure, populate  # noqa: E402
+
+MATERIALIZED = """
+import sys
+sys.path.insert(0, {root!r})
+from database import get_db_connection
+from notes_core import Note, NOTE_COLUMNS
+
+conn, _ = get_db_connection({db!r})
+rows = conn.execute(
+    f"SELECT {{NOTE_COLUMNS}} FROM notes WHERE is_hidden = 0 ORDER BY timestamp DESC, id DESC LIMIT ?", ({limit},)
+).fetchall()
+notes = [Note(*row[:8], bool(row[8])) for row in rows]
+sys.stdout.write("".join(str(n) for n in notes))
+"""
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=200000)
+    p.add_argument("--db", help="Reuse an existing database instead of generating one")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        if not args.db:
+            populate(db_path, args.rows)
+
+        main_py = os.path.join(ROOT, "main.py")
+        commands = {
+            f"list-{fmt}": [
+                sys.executable, main_py, "list", "--limit", str(args.rows), "--format", fmt, "--db", db_path
+            ]
+            for fmt in ("text", "json", "tsv")
+        }
+        commands["materialized"] = [
+            sys.executable, "-c", MATERIALIZED.format(root=ROOT, db=db_path, limit=args.rows)
+        ]
+        for name, cmd in commands.items():
+            result = measure(cmd)
+            result["rows_per_second"] = round(args.rows / result["seconds"])
+            print(json.dumps({"benchmark": name, "rows": args.rows, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Measure cold CLI startup per subcommand.
+
+For each subcommand this reports the median wall-clock time of a full
+`main.py` run against a warm database, and the slowest modules according to
+`python -X importtime`, as one JSON object per subcommand:
+
+    python3 final/bench/bench_startup.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+MAIN = os.path.join(ROOT, "main.py")
+
+SUBCOMMANDS = {
+    "help": ["--help"],
+    "list": ["list", "--limit", "5"],
+    "list-dir": ["list-dir", "--limit", "5"],
+    "search": ["search", "task"],
+    "add": ["add", "-t", "startup benchmark"],
+}
+
+
+def command(name: str, db_path: str) -> list[str]:
+    argv = SUBCOMMANDS[name]
+    if name != "help":
+        argv = argv + ["--db", db_path]
+    return [sys.executable, MAIN] + argv
+
+
+def wall_clock(cmd: list[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def import_times(cmd: list[str], top: int = 5) -> tuple[int, list[dict]]:
+    """Return total import time and the `top` slowest modules (self time, µs)."""
+    proc = subprocess.run(
+        [cmd[0], "-X", "importtime"] + cmd[1:],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    modules = []
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_us": int(self_us)})
+        # Top-level imports are printed with a single space of indentation.
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    modules.sort(key=lambda m: m["self_us"], reverse=True)
+    return total, modules[:top]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--runs", type=int, default=10)
+    p.add_argument("subcommands", nargs="*", help=f"Subset of: {', '.join(SUBCOMMANDS)}")
+    args = p.parse_args()
+    unknown = set(args.subcommands) - set(SUBCOMMANDS)
+    if unknown:
+        p.error(f"unknown subcommand(s): {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        # Create and warm the database so runs measure the fast path.
+        subprocess.run(command("add", db_path), stdout=subprocess.DEVNULL, check=True)
+
+        baseline = wall_clock([sys.executable, "-c", "pass"], args.runs)
+        print(json.dumps({"benchmark": "startup", "subcommand": "python -c pass", "seconds": round(baseline, 4)}))
+        for name in args.subcommands or SUBCOMMANDS:
+            cmd = command(name, db_path)
+            total_us, slowest = import_times(cmd)
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "startup",
+                        "subcommand": name,
+                        "seconds": round(wall_clock(cmd, args.runs), 4),
+                        "import_ms": round(total_us / 1000, 1),
+                        "slowest_imports": slowest,
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
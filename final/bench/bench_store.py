@@ -0,0 +1,57 @@
+"""Compare `add_note` calls with one `NotesStore.add_many` batch.
+
+`add_note` opens the database, inserts and commits once per note;
+`add_many` reuses one connection and commits the whole batch at once.
+Reports wall time and notes per second for each, as one JSON object:
+
+    python3 final/bench/bench_store.py --count 100000
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from notes_core import NotesStore, add_note  # noqa: E402
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(json.dumps({"benchmark": name, "notes": count, "seconds": round(elapsed, 3),
+                      "notes_per_second": round(count / elapsed)}))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--count", type=int, default=100000)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "add_note.db")
+        NotesStore(db_path).close()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()) as sink:
+            for i in range(args.count):
+                add_note("bench", [f"task {i}"], None, db_path=db_path)
+                if i % 1000 == 0:
+                    sink.seek(0)
+                    sink.truncate()
+        report("add_note", args.count, time.perf_counter() - start)
+
+        db_path = os.path.join(tmp, "add_many.db")
+        NotesStore(db_path).close()
+        start = time.perf_counter()
+        with NotesStore(db_path) as store:
+            store.add_many({"project": "bench", "tasks": [f"task {i}"]} for i in range(args.count))
+        report("add_many", args.count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Benchmark suite over a synthetic database, with a regression threshold mode.
+
+Builds (or reuses, with --db) a database from gen_db.py and times every
+`list` filter combination, hidden-note listing, `list-dir` (exact, recursive
+and --summary), `complete`, `remove`, add throughput (per-note commits and
+one batch) and cold CLI startup. Each measurement is printed as one JSON
+object per line; --output also writes them to a file that a later run can
+compare against:
+
+    python3 final/bench/bench_suite.py --rows 1000000 --output base.jsonl
+    python3 final/bench/bench_suite.py --rows 1000000 --baseline base.jsonl
+
+With --baseline, a case whose median time grew by more than --tolerance
+(and by more than --min-delta seconds, to ignore timer noise) is reported
+on stderr and the exit status is 1.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, ROOT)
+
+from complete import complete  # noqa: E402
+from gen_db import PASSWORDS, Population, entries, generate  # noqa: E402
+from notes_core import NotesStore, dir_summary  # noqa: E402
+
+MAIN = os.path.join(ROOT, "main.py")
+
+
+def median_seconds(run: Callable[[], object], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def list_cases(pop: Population) -> dict[str, dict]:
+    """`list` keyword arguments per case: every filter combination on the most common values."""
+    values = {"user": pop.users[0], "project": pop.projects[0], "directory": pop.directories[1]}
+    cases = {}
+    for r in range(len(values) + 1):
+        for combo in itertools.combinations(values, r):
+            cases["+".join(combo) or "unfiltered"] = {f: values[f] for f in combo}
+    cases["rare-project"] = {"project": pop.projects[-1]}
+    cases["since"] = {"since": "2023-12-01"}
+    cases["deep-page"] = {"before": "1672531200000,0"}
+    cases["hidden"] = {"show_hidden": True, "password": PASSWORDS[0]}
+    return cases
+
+
+def run_suite(db_path: str, rows: int, seed: int, runs: int, limit: int = 20) -> list[dict]:
+    pop = Population(rows, seed)
+    results = []
+
+    def record(benchmark: str, case: str, seconds: float, **extra) -> None:
+        result = {"benchmark": benchmark, "case": case, "rows": rows, "seconds": round(seconds, 6), **extra}
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    with NotesStore(db_path) as store:
+        for case, kwargs in list_cases(pop).items():
+            record("list", case, median_seconds(lambda: list(store.query(limit, **kwargs)), runs))
+        team = pop.directories[1]
+        record("list-dir", "exact", median_seconds(lambda: list(store.query(limit, directory=team)), runs))
+        record("list-dir", "recursive",
+               median_seconds(lambda: list(store.query(limit, directory_prefix=team)), runs))
+        record("list-dir", "summary", median_seconds(lambda: dir_summary(team, db_path=db_path), runs))
+        for field, prefix in [("project", pop.projects[0][:-1]), ("directory", team), ("directory", "")]:
+            record("complete", f"{field}:{prefix or 'empty'}",
+                   median_seconds(lambda: complete(field, prefix, db_path=db_path), runs))
+
+    env = dict(os.environ, NOTES_NO_DAEMON="1")
+    for name, argv in [("list", ["list", "--limit", str(limit)]), ("list-dir", ["list-dir"]),
+                       ("list-dir-summary", ["list-dir", "--summary"]), ("complete", ["complete", "project", "p"]),
+                       ("add", ["add", "-t", "startup benchmark"])]:
+        cmd = [sys.executable, MAIN] + argv + ["--db", db_path]
+        seconds = median_seconds(
+            lambda: subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True),
+            runs,
+        )
+        record("startup", name, seconds)
+
+    with NotesStore(db_path) as store:
+        ids = [row[0] for row in store.conn.execute("SELECT id FROM notes WHERE is_hidden = 0")]
+        victims = iter(random.Random(seed).sample(ids, min(len(ids), runs * 5)))
+        record("remove", "one-per-commit", median_seconds(lambda: store.remove_many([next(victims)]), runs))
+        batch = [next(victims) for _ in range(min(len(ids), runs * 5) - runs)]
+        start = time.perf_counter()
+        store.remove_many(batch)
+        record("remove", "batch", time.perf_counter() - start, notes=len(batch))
+
+        new = list(entries(2000, seed + 1))
+        start = time.perf_counter()
+        for entry in new[:200]:
+            store.insert_entries([entry])
+        elapsed = time.perf_counter() - start
+        record("add", "one-per-commit", elapsed, notes_per_second=round(200 / elapsed))
+        start = time.perf_counter()
+        store.insert_entries(new[200:])
+        elapsed = time.perf_counter() - start
+        record("add", "batch", elapsed, notes_per_second=round(1800 / elapsed))
+    return results
+
+
+def load_results(path: str) -> dict[tuple, dict]:
+    with open(path, encoding="utf-8") as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    return {(r["benchmark"], r["case"], r["rows"]): r for r in results if "case" in r}
+
+
+def regressions(results: list[dict], baseline: dict[tuple, dict], tolerance: float, min_delta: float) -> list[dict]:
+    """Return the cases that got slower than `baseline` by more than both thresholds."""
+    slower = []
+    for result in results:
+        before = baseline.get((result["benchmark"], result["case"], result["rows"]))
+        if before is None:
+            continue
+        delta = result["seconds"] - before["seconds"]
+        if delta > min_delta and result["seconds"] > before["seconds"] * (1 + tolerance):
+            slower.append({"benchmark": result["benchmark"], "case": result["case"], "rows": result["rows"],
+                           "baseline_seconds": before["seconds"], "seconds": result["seconds"]})
+    return slower
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=100000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--runs", type=int, default=10, help="Repetitions per case; the median is reported")
+    p.add_argument("--db", help="Generated database to reuse (created there on the first run)")
+    p.add_argument("--output", help="Also write results to this JSON Lines file")
+    p.add_argument("--baseline", help="Results file to compare against")
+    p.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25)")
+    p.add_argument("--min-delta", type=float, default=0.002, help="Ignore slowdowns below this many seconds")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # remove/add modify the database, so every run works on a fresh copy.
+        source = args.db or os.path.join(tmp, "source.db")
+        if not os.path.exists(source):
+            start = time.perf_counter()
+            generate(source, args.rows, args.seed)
+            print(json.dumps({"benchmark": "generate", "rows": args.rows, "seed": args.seed,
+                              "seconds": round(time.perf_counter() - start, 3)}), flush=True)
+        db_path = os.path.join(tmp, "bench.db")
+        with NotesStore(source) as store:
+            store.conn.execute("VACUUM INTO ?", (db_path,))
+        results = run_suite(db_path, args.rows, args.seed, args.runs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r) + "\n" for r in results)
+    if args.baseline:
+        slower = regressions(results, load_results(args.baseline), args.tolerance, args.min_delta)
+        for entry in slower:
+            print(json.dumps({"regression": entry}), file=sys.stderr)
+        if slower:
+            print(f"Error: {len(slower)} case(s) slower than {args.baseline}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
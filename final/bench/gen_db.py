@@ -0,0 +1,122 @@
+"""Generate a synthetic notes database for benchmarks.
+
+Notes are written through `NotesStore.insert_entries`, the same path `add`
+uses, so search index, task index and rollups are all populated. The same
+`--rows` and `--seed` always produce the same database. Projects, users and
+directories follow Zipf-like distributions (a few values are very common, a
+long tail is rare), directories form a monorepo-shaped tree, timestamps
+spread over the last two years, and `--hidden` of the notes are hidden
+behind one of a few passwords (see PASSWORDS).
+
+    python3 final/bench/gen_db.py --rows 1000000 --seed 1 /tmp/notes-1m.db
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from typing import Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from notes_core import NotesStore  # noqa: E402
+
+PASSWORDS = ["bench-secret-1", "bench-secret-2", "bench-secret-3"]
+SPAN = datetime.timedelta(days=730)
+VERBS = ["fixed", "reviewed", "deployed", "updated", "tested", "documented", "refactored", "triaged", "scanned"]
+OBJECTS = ["firewall", "login flow", "ci pipeline", "backup job", "tls certs", "api gateway", "dns zone", "audit log"]
+
+
+def zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    """Cumulative weights where value k is picked with probability ~ 1/(k+1)^s."""
+    return list(itertools.accumulate(1 / (k + 1) ** s for k in range(n)))
+
+
+class Population:
+    """Value pools and their skewed distributions for a database of `rows` notes."""
+
+    def __init__(self, rows: int, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.projects = [f"project-{i}" for i in range(max(5, min(rows // 500, 2000)))]
+        self.users = [f"user{i}" for i in range(max(3, min(rows // 2000, 500)))]
+        self.directories = self._tree(max(10, min(rows // 20, 200000)))
+        self.project_weights = zipf_weights(len(self.projects))
+        self.user_weights = zipf_weights(len(self.users))
+        self.directory_weights = zipf_weights(len(self.directories), 0.9)
+
+    def _tree(self, count: int) -> list[str]:
+        # /src/mono/<team>/<service>/<package>; shallow entries first so they are the common ones.
+        dirs = ["/src/mono"]
+        for team in range(20):
+            dirs.append(f"/src/mono/team{team}")
+        i = 0
+        while len(dirs) < count:
+            dirs.append(f"/src/mono/team{i % 20}/svc{i // 20 % 100}/pkg{i // 2000}")
+            i += 1
+        return dirs[:count]
+
+    def pick(self, values: list[str], weights: list[float]) -> str:
+        return self.rng.choices(values, cum_weights=weights)[0]
+
+
+def entries(rows: int, seed: int = 0, hidden: float = 0.02, end: Optional[datetime.datetime] = None):
+    """Yield (fields, hidden, password) entries for `insert_entries`, oldest first."""
+    pop = Population(rows, seed)
+    rng = pop.rng
+    end = end or datetime.datetime(2024, 1, 1)
+    start = end - SPAN
+    step = SPAN / max(rows, 1)
+    for i in range(rows):
+        moment = start + step * i + datetime.timedelta(seconds=rng.random())
+        tasks = "; ".join(f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}" for _ in range(rng.randint(1, 3)))
+        is_hidden = rng.random() < hidden
+        fields = {
+            "username": pop.pick(pop.users, pop.user_weights),
+            "host": f"host{rng.randrange(20)}",
+            "timestamp": moment.isoformat(timespec="microseconds") + "Z",
+            "project": pop.pick(pop.projects, pop.project_weights),
+            "tasks": tasks,
+            "notes": f"synthetic note {i}" if rng.random() < 0.3 else None,
+            "directory": pop.pick(pop.directories, pop.directory_weights),
+        }
+        yield fields, is_hidden, rng.choice(PASSWORDS) if is_hidden else None
+
+
+def generate(db_path: str, rows: int, seed: int = 0, hidden: float = 0.02, batch_size: int = 10000) -> None:
+    """Create `db_path` with `rows` synthetic notes, one transaction per batch."""
+    with NotesStore(db_path) as store:
+        batch = []
+        for entry in entries(rows, seed, hidden):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                store.insert_entries(batch)
+                batch = []
+        if batch:
+            store.insert_entries(batch)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("path", help="Database to create (must not exist)")
+    p.add_argument("--rows", type=int, default=100000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--hidden", type=float, default=0.02, help="Fraction of hidden notes")
+    args = p.parse_args()
+    if os.path.exists(args.path):
+        p.error(f"{args.path} already exists")
+
+    start = time.perf_counter()
+    generate(args.path, args.rows, args.seed, args.hidden)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"benchmark": "generate", "rows": args.rows, "seed": args.seed, "seconds": round(elapsed, 3),
+                      "size_mb": round(os.path.getsize(args.path) / 2 ** 20, 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,37 @@
-"""CLI argument parsing and command routing."""
+"""CLI argument parsing and command routing.
+
+Handlers import notes_core lazily so that each subcommand only loads what it
+uses; keep module-level imports here to the standard minimum.
+"""
 
 import argparse
 import os
 import sys
 from typing import Optional
 
-from notes_core import add_note, list_notes, remove_note
+import complete
+import tracing
+
+
+def add_page_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the keyset pagination options shared by list and list-dir."""
+    page = parser.add_mutually_exclusive_group()
+    page.add_argument("--before", metavar="TIMESTAMP,ID", help="Show notes older than this continuation token")
+    page.add_argument("--after", metavar="TIMESTAMP,ID", help="Show notes newer than this continuation token")
+
+
+def add_time_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --since/--until range options shared by list, list-dir and export."""
+    parser.add_argument("--since", help="Only notes at or after this ISO date/time, or this long ago (e.g. 7d)")
+    parser.add_argument("--until", help="Only notes before this ISO date/time, or this long ago (e.g. 12h)")
 
 
 def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     """Parse and return command-line arguments."""
     p = argparse.ArgumentParser(description="Notes for completed tasks (system-friendly)")
+    p.add_argument("--trace", action="store_true", help="Report phase timings and SQL statements on stderr")
+    p.add_argument("--trace-format", choices=["text", "json"], help="Trace as text (default) or one JSON line")
+    p.add_argument("--trace-plan", action="store_true", help="Include EXPLAIN QUERY PLAN in the trace")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     # Add subcommand
@@ -19,6 +40,12 @@ def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     add.add_argument("--tasks", "-t", action="append", help="Task completed (can be repeated)")
     add.add_argument("--note", "-n", help="Special notes or comments")
     add.add_argument("--hidden", action="store_true", help="Mark note as hidden (password protected)")
+    add.add_argument("--follow", "-f", action="store_true", help="Store each stdin line as a note as it arrives")
+    add.add_argument("--batch-lines", type=int, default=100, help="With --follow: commit after this many lines")
+    add.add_argument("--batch-ms", type=int, default=1000, help="With --follow: or this long after a line arrived")
+    add.add_argument(
+        "--spool", action="store_true", default=None, help="Append to the spool file instead of the DB ($NOTES_SPOOL)"
+    )
     add.add_argument("--db", help="(Optional) override DB path (for testing)")
 
     # List subcommand
@@ -27,17 +54,123 @@ def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     lst.add_argument("--user", help="Filter by username")
     lst.add_argument("--project", help="Filter by project")
     lst.add_argument("--directory", "-d", help="Filter by directory")
+    lst.add_argument("--directory-prefix", help="Only notes recorded in this directory or anywhere below it")
+    lst.add_argument("--task", help="Only notes containing exactly this task")
+    add_time_arguments(lst)
     lst.add_argument("--hidden", action="store_true", help="Show hidden notes (requires password)")
+    lst.add_argument("--format", choices=["text", "json", "tsv"], default="text", help="Output format")
+    add_page_arguments(lst)
     lst.add_argument("--db", help="(Optional) override DB path (for testing)")
 
     # List-dir subcommand
     ldir = sub.add_parser("list-dir", help="List notes from current directory")
     ldir.add_argument("--limit", "-l", type=int, default=20)
+    ldir.add_argument("--recursive", "-r", action="store_true", help="Include notes from subdirectories")
+    ldir.add_argument(
+        "--summary", "-s", action="store_true", help="Only print the note count and newest note (read-only, for prompts)"
+    )
+    ldir.add_argument("--format", choices=["text", "json", "tsv"], default="text", help="Output format")
+    add_time_arguments(ldir)
+    add_page_arguments(ldir)
     ldir.add_argument("--db", help="(Optional) override DB path (for testing)")
 
+    # Tasks subcommand
+    tsk = sub.add_parser("tasks", help="Show the most frequent tasks")
+    tsk.add_argument("--top", type=int, default=10, metavar="N", help="Number of tasks to show")
+    tsk.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Stats subcommand
+    st = sub.add_parser("stats", help="Count notes per project, user, host, day or week")
+    st.add_argument("--by", choices=["project", "user", "host", "day", "week"], default="project")
+    st.add_argument("--since", help="Only days on or after this ISO date, or the day this long ago (e.g. 7d)")
+    st.add_argument("--until", help="Only days before this ISO date, or the day this long ago (e.g. 12h)")
+    st.add_argument("--rebuild", action="store_true", help="Recompute the rollup tables first")
+    st.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Prune subcommand
+    prn = sub.add_parser("prune", help="Delete old notes and reclaim disk space")
+    prn.add_argument("--older-than", required=True, metavar="AGE", help="Age such as 180d, 4w, 12h or 90m")
+    prn.add_argument("--project", help="Only prune notes of this project")
+    prn.add_argument("--dry-run", action="store_true", help="Only report how many notes would be deleted")
+    prn.add_argument("--batch-size", type=int, default=500, help="Notes deleted per transaction")
+    prn.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Archive subcommand
+    arc = sub.add_parser("archive", help="Move old notes into the archive database next to the DB")
+    arc.add_argument("--older-than", required=True, metavar="AGE", help="Age such as 365d, 52w or 12h")
+    arc.add_argument("--batch-size", type=int, default=500, help="Notes moved per transaction")
+    arc.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Search subcommand
+    srch = sub.add_parser("search", help="Full-text search over tasks and notes")
+    srch.add_argument("query", nargs="+", help='Search terms; "quoted phrase" and prefix* are supported')
+    srch.add_argument("--phrase", action="store_true", help="Match the terms as one exact phrase")
+    srch.add_argument("--limit", "-l", type=int, default=20)
+    srch.add_argument("--user", help="Filter by username")
+    srch.add_argument("--project", help="Filter by project")
+    srch.add_argument("--directory", "-d", help="Filter by directory")
+    srch.add_argument("--hidden", action="store_true", help="Include hidden notes (requires password)")
+    srch.add_argument("--rebuild", action="store_true", help="Rebuild the search index before searching")
+    srch.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Import subcommand
+    imp = sub.add_parser("import", help="Bulk-import notes from a JSON Lines or CSV file")
+    imp.add_argument("source", help="File to import, or - for stdin")
+    imp.add_argument("--format", "-f", choices=["jsonl", "csv"], default="jsonl", help="Input format")
+    imp.add_argument("--batch-size", type=int, default=1000, help="Notes per transaction")
+    imp.add_argument("--resume-key", help="Progress key for resuming (defaults to the file path; required for stdin)")
+    imp.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Export subcommand
+    exp = sub.add_parser("export", help="Stream notes as JSON Lines, CSV or TSV")
+    exp.add_argument("--format", "-f", choices=["jsonl", "csv", "tsv"], default="jsonl", help="Output format")
+    exp.add_argument("--output", "-o", help="Output file (default: stdout)")
+    exp.add_argument("--user", help="Filter by username")
+    exp.add_argument("--project", help="Filter by project")
+    exp.add_argument("--directory", "-d", help="Filter by directory")
+    add_time_arguments(exp)
+    exp.add_argument("--hidden", action="store_true", help="Include hidden notes (requires password)")
+    exp.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Serve subcommand
+    srv = sub.add_parser("serve", help="Run the resident daemon that other notes commands forward to")
+    srv.add_argument("--socket", help="Unix socket path (default: next to the DB, or $NOTES_SOCKET)")
+    srv.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Watch subcommand
+    wch = sub.add_parser("watch", help="Print matching notes as they are added, like tail -f")
+    wch.add_argument("--limit", "-l", type=int, default=10, help="Recent notes to print first (default 10)")
+    wch.add_argument("--user", help="Filter by username")
+    wch.add_argument("--project", help="Filter by project")
+    wch.add_argument("--directory", "-d", help="Filter by directory")
+    wch.add_argument("--directory-prefix", help="Only notes recorded in this directory or anywhere below it")
+    wch.add_argument("--task", help="Only notes containing exactly this task")
+    wch.add_argument("--hidden", action="store_true", help="Show hidden notes (requires password)")
+    wch.add_argument("--format", choices=["text", "json"], default="text", help="Output format (json: one per line)")
+    wch.add_argument("--min-interval", type=float, default=0.1, help="Poll interval after a change (seconds)")
+    wch.add_argument("--max-interval", type=float, default=2.0, help="Longest poll interval while idle (seconds)")
+    wch.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Complete subcommand (main.py answers the common forms before argparse)
+    cmp = sub.add_parser("complete", help="Print known values for shell completion, most used first")
+    cmp.add_argument("field", choices=complete.FIELDS, help="Which values to complete")
+    cmp.add_argument("prefix", nargs="?", default="", help="Only values starting with this")
+    cmp.add_argument("--limit", "-l", type=int, default=complete.DEFAULT_LIMIT)
+    cmp.add_argument("--db", help="(Optional) override DB path (for testing)")
+
+    # Flush subcommand
+    fl = sub.add_parser("flush", help="Move notes spooled by 'add --spool' into the database")
+    fl.add_argument("--db", help="(Optional) override DB path (for testing)")
+
     # Remove subcommand
-    rm = sub.add_parser("remove", help="Remove a note by id")
-    rm.add_argument("id", type=int, help="ID of the note to remove")
+    rm = sub.add_parser("remove", help="Remove notes by id, id range or filter")
+    rm.add_argument("ids", nargs="*", metavar="ID", help="Note id or inclusive range such as 100-250")
+    rm.add_argument("--user", help="Only notes by this username")
+    rm.add_argument("--project", help="Only notes in this project")
+    rm.add_argument("--directory", "-d", help="Only notes recorded in this directory")
+    add_time_arguments(rm)
+    rm.add_argument("--dry-run", action="store_true", help="Only report how many notes would be removed")
+    rm.add_argument("--batch-size", type=int, default=500, help="Notes deleted per transaction (default 500)")
     rm.add_argument("--db", help="(Optional) override DB path (for testing)")
 
     return p.parse_args(argv)
@@ -53,8 +186,14 @@ def read_tasks_from_stdin() -> list[str]:
     return []
 
 
-def handle_add_command(args: argparse.Namespace) -> None:
+def handle_add_command(args: argparse.Namespace, client=None) -> None:
     """Handle the 'add' subcommand."""
+    if args.follow:
+        handle_follow(args)
+        return
+
+    from notes_core import add_note
+
     tasks = args.tasks or []
     
     # If no --tasks provided, allow reading from stdin
@@ -73,16 +212,68 @@ def handle_add_command(args: argparse.Namespace) -> None:
             print("Error: Password required for hidden note.", file=sys.stderr)
             sys.exit(1)
 
-    add_note(args.project, tasks, args.note, db_path=args.db, hidden=args.hidden, password=password)
+    if client is not None:
+        from notes_core import new_note_fields
 
+        fields = new_note_fields(args.project, tasks, args.note)
+        client.run("add", fields=fields, hidden=args.hidden, password=password)
+        return
 
-def handle_list_command(args: argparse.Namespace) -> None:
+    add_note(args.project, tasks, args.note, db_path=args.db, hidden=args.hidden, password=password, spool=args.spool)
+
+
+def handle_follow(args: argparse.Namespace) -> None:
+    """Handle 'add --follow': streams go straight to SQLite, even with a daemon running."""
+    from notes_core import follow_notes
+
+    if args.tasks:
+        print("Error: --follow reads tasks from stdin; drop --tasks.", file=sys.stderr)
+        sys.exit(1)
+    password = None
+    if args.hidden:
+        import getpass
+        password = getpass.getpass("Enter password for hidden note: ")
+    follow_notes(
+        args.project,
+        args.note,
+        db_path=args.db,
+        hidden=args.hidden,
+        password=password,
+        batch_lines=args.batch_lines,
+        batch_ms=args.batch_ms,
+    )
+
+
+def handle_list_command(args: argparse.Namespace, client=None) -> None:
     """Handle the 'list' subcommand."""
     password = None
     if args.hidden:
         import getpass
         password = getpass.getpass("Enter password to view hidden notes: ")
-    
+    # Relative prefixes are taken from the current directory, like list-dir.
+    directory_prefix = os.path.abspath(args.directory_prefix) if args.directory_prefix else None
+
+    if client is not None:
+        client.run(
+            "list",
+            limit=args.limit,
+            user=args.user,
+            project=args.project,
+            directory=args.directory,
+            show_hidden=args.hidden,
+            password=password,
+            before=args.before,
+            after=args.after,
+            format=args.format,
+            task=args.task,
+            since=args.since,
+            until=args.until,
+            directory_prefix=directory_prefix,
+        )
+        return
+
+    from notes_core import list_notes
+
     list_notes(
         limit=args.limit,
         user=args.user,
@@ -91,30 +282,260 @@ def handle_list_command(args: argparse.Namespace) -> None:
         db_path=args.db,
         show_hidden=args.hidden,
         password=password,
+        before=args.before,
+        after=args.after,
+        fmt=args.format,
+        task=args.task,
+        since=args.since,
+        until=args.until,
+        directory_prefix=directory_prefix,
     )
 
 
-def handle_list_dir_command(args: argparse.Namespace) -> None:
+def handle_list_dir_command(args: argparse.Namespace, client=None) -> None:
     """Handle the 'list-dir' subcommand."""
     current_dir = os.getcwd()
-    list_notes(limit=args.limit, directory=current_dir, db_path=args.db)
+    # --recursive turns the exact match into a subtree match.
+    directory, directory_prefix = (None, current_dir) if args.recursive else (current_dir, None)
+    if args.summary:
+        from notes_core import show_dir_summary
+
+        show_dir_summary(current_dir, args.recursive, args.format, args.db)
+        return
+    if client is not None:
+        client.run(
+            "list",
+            limit=args.limit,
+            directory=directory,
+            directory_prefix=directory_prefix,
+            before=args.before,
+            after=args.after,
+            format=args.format,
+            since=args.since,
+            until=args.until,
+        )
+        return
+
+    from notes_core import list_notes
+
+    list_notes(
+        limit=args.limit,
+        directory=directory,
+        directory_prefix=directory_prefix,
+        db_path=args.db,
+        before=args.before,
+        after=args.after,
+        fmt=args.format,
+        since=args.since,
+        until=args.until,
+    )
+
+
+def handle_tasks_command(args: argparse.Namespace) -> None:
+    """Handle the 'tasks' subcommand."""
+    from notes_core import top_tasks
+
+    top_tasks(args.top, db_path=args.db)
+
+
+def handle_stats_command(args: argparse.Namespace) -> None:
+    """Handle the 'stats' subcommand."""
+    from notes_core import show_stats
+
+    show_stats(args.by, since=args.since, until=args.until, rebuild=args.rebuild, db_path=args.db)
+
+
+def handle_prune_command(args: argparse.Namespace) -> None:
+    """Handle the 'prune' subcommand."""
+    from notes_core import prune_notes
+
+    prune_notes(
+        args.older_than, project=args.project, dry_run=args.dry_run, batch_size=args.batch_size, db_path=args.db
+    )
+
+
+def handle_archive_command(args: argparse.Namespace) -> None:
+    """Handle the 'archive' subcommand."""
+    from notes_core import archive_notes
+
+    archive_notes(args.older_than, batch_size=args.batch_size, db_path=args.db)
+
+
+def handle_search_command(args: argparse.Namespace) -> None:
+    """Handle the 'search' subcommand."""
+    from notes_core import search_notes
+
+    query = " ".join(args.query)
+    if args.phrase:
+        query = '"' + query.replace('"', '""') + '"'
+
+    password = None
+    if args.hidden:
+        import getpass
+        password = getpass.getpass("Enter password to view hidden notes: ")
+
+    search_notes(
+        query,
+        limit=args.limit,
+        user=args.user,
+        project=args.project,
+        directory=args.directory,
+        db_path=args.db,
+        show_hidden=args.hidden,
+        password=password,
+        rebuild=args.rebuild,
+    )
+
 
+def handle_import_command(args: argparse.Namespace) -> None:
+    """Handle the 'import' subcommand."""
+    from notes_core import import_notes
+
+    import_notes(
+        args.source,
+        fmt=args.format,
+        db_path=args.db,
+        batch_size=args.batch_size,
+        resume_key=args.resume_key,
+    )
+
+
+def handle_export_command(args: argparse.Namespace) -> None:
+    """Handle the 'export' subcommand."""
+    from notes_core import export_notes
+
+    password = None
+    if args.hidden:
+        import getpass
+        password = getpass.getpass("Enter password to export hidden notes: ")
+
+    export_notes(
+        fmt=args.format,
+        output=args.output,
+        user=args.user,
+        project=args.project,
+        directory=args.directory,
+        since=args.since,
+        until=args.until,
+        db_path=args.db,
+        show_hidden=args.hidden,
+        password=password,
+    )
 
-def handle_remove_command(args: argparse.Namespace) -> None:
+
+def handle_remove_command(args: argparse.Namespace, client=None) -> None:
     """Handle the 'remove' subcommand."""
-    remove_note(args.id, db_path=args.db)
+    filters = {
+        "user": args.user,
+        "project": args.project,
+        "directory": args.directory,
+        "since": args.since,
+        "until": args.until,
+    }
+    if not args.ids and not any(filters.values()):
+        print("Error: give note ids (e.g. 12 100-250) or a filter such as --project.", file=sys.stderr)
+        sys.exit(1)
+    if client is not None:
+        client.run("remove", ids=args.ids, dry_run=args.dry_run, batch_size=args.batch_size, **filters)
+        return
+
+    from notes_core import remove_notes
+
+    remove_notes(args.ids, dry_run=args.dry_run, batch_size=args.batch_size, db_path=args.db, **filters)
+
+
+def handle_watch_command(args: argparse.Namespace) -> None:
+    """Handle the 'watch' subcommand."""
+    from notes_core import watch_notes
+
+    password = None
+    if args.hidden:
+        import getpass
+        password = getpass.getpass("Enter password to view hidden notes: ")
+    watch_notes(
+        user=args.user,
+        project=args.project,
+        directory=args.directory,
+        db_path=args.db,
+        show_hidden=args.hidden,
+        password=password,
+        task=args.task,
+        directory_prefix=os.path.abspath(args.directory_prefix) if args.directory_prefix else None,
+        backlog=args.limit,
+        fmt=args.format,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+    )
+
+
+def handle_complete_command(args: argparse.Namespace) -> None:
+    """Handle the 'complete' subcommand."""
+    complete.print_completions(args.field, args.prefix, args.limit, args.db)
+
+
+def handle_flush_command(args: argparse.Namespace) -> None:
+    """Handle the 'flush' subcommand."""
+    from notes_core import flush_notes
+
+    flush_notes(db_path=args.db)
+
+
+def handle_serve_command(args: argparse.Namespace) -> None:
+    """Handle the 'serve' subcommand."""
+    from daemon import serve
+
+    serve(db_path=args.db, socket_path=args.socket)
+
+
+def dispatch(args: argparse.Namespace, client=None) -> None:
+    """Route commands to their handlers.
+
+    `client` is a daemon.DaemonClient when a notes daemon is running; the
+    subcommands it supports are then answered by the daemon.
+    """
+    if args.trace or args.trace_format or args.trace_plan:
+        tracing.enable(",".join([args.trace_format or "text"] + (["plan"] if args.trace_plan else [])))
+    if tracing.ENABLED and client is None:
+        import importlib
+
+        # Handlers import it lazily; time the import as its own phase.
+        with tracing.phase("import notes_core"):
+            importlib.import_module("notes_core")
+    with tracing.phase(f"command:{args.cmd}"):
+        _route(args, client)
 
 
-def dispatch(args: argparse.Namespace) -> None:
-    """Route commands to their handlers."""
+def _route(args: argparse.Namespace, client=None) -> None:
     if args.cmd == "add":
-        handle_add_command(args)
+        handle_add_command(args, client)
     elif args.cmd == "list":
-        handle_list_command(args)
+        handle_list_command(args, client)
     elif args.cmd == "list-dir":
-        handle_list_dir_command(args)
+        handle_list_dir_command(args, client)
+    elif args.cmd == "tasks":
+        handle_tasks_command(args)
+    elif args.cmd == "stats":
+        handle_stats_command(args)
+    elif args.cmd == "prune":
+        handle_prune_command(args)
+    elif args.cmd == "archive":
+        handle_archive_command(args)
+    elif args.cmd == "search":
+        handle_search_command(args)
+    elif args.cmd == "import":
+        handle_import_command(args)
+    elif args.cmd == "export":
+        handle_export_command(args)
     elif args.cmd == "remove":
-        handle_remove_command(args)
+        handle_remove_command(args, client)
+    elif args.cmd == "watch":
+        handle_watch_command(args)
+    elif args.cmd == "complete":
+        handle_complete_command(args)
+    elif args.cmd == "flush":
+        handle_flush_command(args)
+    elif args.cmd == "serve":
+        handle_serve_command(args)
     else:
         print(f"Unknown command: {args.cmd}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,194 @@
+"""Backend of the shell completion scripts: `notes complete FIELD [PREFIX]`.
+
+Prints up to `--limit` known values of FIELD (project, user or directory)
+that start with PREFIX, most used first, one per line. Values come from the
+trigger-maintained vocabulary table, so a lookup is one primary-key range
+scan (or, for an empty prefix, a walk of idx_vocabulary_rank).
+
+Like `stats`, `list` and `list-dir --summary`, it covers archived notes:
+the archive is an ordinary notes database with its own vocabulary table, and
+the two are merged by value.
+
+This runs on every Tab press, so main.py answers `complete` through
+parse_argv() and print_completions() before importing argparse, cli, daemon
+or tracing, and this module itself needs nothing but sqlite3 and dbfiles.
+The databases are opened read-only; only ones that predate the vocabulary
+table go through database.open_db once to be upgraded, and notes waiting in
+the add spool are flushed through notes_core first.
+"""
+
+import os
+import sqlite3
+import sys
+
+from dbfiles import USER_DB, archive_path_for, connect_readonly, pending_spools, readonly_uri, spool_path_for
+
+FIELDS = ("project", "user", "directory")
+DEFAULT_LIMIT = 50
+
+
+def _prefix_range(prefix: str) -> tuple:
+    """Return (low, high) such that low <= value < high for every value starting with `prefix`."""
+    last = prefix[-1]
+    if ord(last) < sys.maxunicode:
+        return prefix, prefix[:-1] + chr(ord(last) + 1)
+    return prefix, None
+
+
+def _range(field: str, prefix: str) -> tuple:
+    """Return (condition, params) selecting the vocabulary rows of `field` that start with `prefix`."""
+    if not prefix:
+        return "field = ?", [field]
+    low, high = _prefix_range(prefix)
+    if high is None:
+        return "field = ? AND value >= ?", [field, low]
+    return "field = ? AND value >= ? AND value < ?", [field, low, high]
+
+
+def _lookup_query(field: str, prefix: str, limit: int, schema: str = "main") -> tuple:
+    """Return (sql, params) for (value, count, last_used) of `field` starting with `prefix`, most used first."""
+    cond, params = _range(field, prefix)
+    select = f"SELECT value, count, last_used FROM {schema}.vocabulary WHERE {cond}"
+    if not prefix:
+        # Walks idx_vocabulary_rank backwards and stops after `limit` rows.
+        return select + " ORDER BY count DESC, last_used DESC LIMIT ?", params + [limit]
+    # `+` keeps SQLite from walking idx_vocabulary_rank to avoid the sort:
+    # that visits every value of the field, while the primary-key range
+    # visits (and then sorts) only the matches.
+    return select + " ORDER BY +count DESC, +last_used DESC LIMIT ?", params + [limit]
+
+
+def _merged_query(field: str, prefix: str, limit: int) -> tuple:
+    """Return (sql, params) ranking main and archive values together by summed count, then latest use."""
+    cond, params = _range(field, prefix)
+    rows = " UNION ALL ".join(
+        f"SELECT value, count, last_used FROM {schema}.vocabulary WHERE {cond}" for schema in ("main", "archive")
+    )
+    return (
+        f"SELECT value, SUM(count), MAX(last_used) FROM ({rows}) GROUP BY value "
+        "ORDER BY SUM(count) DESC, MAX(last_used) DESC LIMIT ?",
+        params + params + [limit],
+    )
+
+
+def _lookup(conn: sqlite3.Connection, field: str, prefix: str, limit: int, archive: bool) -> list:
+    if not archive:
+        return [row[0] for row in conn.execute(*_lookup_query(field, prefix, limit))]
+    # Top-k merge: take the `depth` most used values of each database. A
+    # value in neither list is used at most (last count of the main list) +
+    # (last count of the archive list) times, so once the `limit`th merged
+    # candidate beats that bound the candidates are the answer. Usage is
+    # skewed, so four times `limit` is normally enough; with flat counts
+    # every value in range is summed instead.
+    depth = 4 * limit
+    while depth <= 64 * limit:
+        known = {}
+        bound = 0
+        for schema in ("main", "archive"):
+            rows = conn.execute(*_lookup_query(field, prefix, depth, schema)).fetchall()
+            if len(rows) == depth:
+                bound += rows[-1][1]
+            known.update(((schema, value), (count, last_used)) for value, count, last_used in rows)
+        ranked = []
+        for value in {value for _, value in known}:
+            count = last_used = 0
+            for schema in ("main", "archive"):
+                if (schema, value) not in known:
+                    known[schema, value] = conn.execute(
+                        f"SELECT count, last_used FROM {schema}.vocabulary WHERE field = ? AND value = ?",
+                        (field, value),
+                    ).fetchone() or (0, 0)
+                count += known[schema, value][0]
+                last_used = max(last_used, known[schema, value][1])
+            ranked.append((count, last_used, value))
+        ranked.sort(reverse=True)
+        if bound == 0 or (len(ranked) >= limit and ranked[limit - 1][0] > bound):
+            return [value for _, _, value in ranked[:limit]]
+        depth *= 4
+    return [row[0] for row in conn.execute(*_merged_query(field, prefix, limit))]
+
+
+def _read(path: str, archive, field: str, prefix: str, limit: int) -> list:
+    conn = connect_readonly(path)
+    try:
+        if archive:
+            conn.execute("ATTACH DATABASE ? AS archive", (readonly_uri(archive),))
+        return _lookup(conn, field, prefix, limit, bool(archive))
+    finally:
+        conn.close()
+
+
+def complete(field: str, prefix: str = "", limit: int = DEFAULT_LIMIT, db_path=None) -> list:
+    """Return up to `limit` values of `field` starting with `prefix`, most used first.
+
+    Raises ValueError for an unknown field. A missing database has no values.
+    """
+    if field not in FIELDS:
+        raise ValueError(f"unknown field '{field}' (expected one of: {', '.join(FIELDS)})")
+    path = db_path or USER_DB
+    if limit < 1:
+        return []
+    if pending_spools(spool_path_for(path)):
+        from notes_core import NotesStore
+
+        NotesStore(path).close()
+    if not os.path.exists(path):
+        return []
+    archive = archive_path_for(path)
+    if not os.path.exists(archive):
+        archive = None
+    try:
+        return _read(path, archive, field, prefix, limit)
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e):
+            raise
+        from database import open_db
+
+        for stale in (path, archive):
+            if stale:
+                open_db(stale).close()
+        return _read(path, archive, field, prefix, limit)
+
+
+def print_completions(field: str, prefix: str = "", limit: int = DEFAULT_LIMIT, db_path=None) -> None:
+    try:
+        values = complete(field, prefix, limit, db_path)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except sqlite3.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    if values:
+        sys.stdout.write("\n".join(values) + "\n")
+
+
+def parse_argv(argv: list):
+    """Parse `FIELD [PREFIX] [--limit N] [--db PATH]` (argv after `complete`).
+
+    Returns (field, prefix, limit, db_path), or None for anything else
+    (e.g. --help or a malformed option), which main.py leaves to argparse.
+    """
+    positional = []
+    limit, db_path = DEFAULT_LIMIT, None
+    args = iter(argv)
+    for arg in args:
+        if arg == "--":
+            positional.extend(args)
+        elif arg in ("--limit", "-l", "--db"):
+            value = next(args, None)
+            if value is None:
+                return None
+            if arg == "--db":
+                db_path = value
+            elif value.isdigit():
+                limit = int(value)
+            else:
+                return None
+        elif arg.startswith("-") and arg != "-":
+            return None
+        else:
+            positional.append(arg)
+    if not 1 <= len(positional) <= 2:
+        return None
+    return positional[0], positional[1] if len(positional) == 2 else "", limit, db_path
@@ -0,0 +1,57 @@
+# bash completion for notes. Source this file from ~/.bashrc, or link it as
+# /etc/bash_completion.d/notes (install.sh does).
+#
+# Values after --project, --user and --directory come from `notes complete`,
+# which reads the database's vocabulary table: most used first, in a few ms.
+
+_notes_subcommands="add list list-dir watch search tasks stats export import remove prune archive flush serve complete"
+declare -gA _notes_option_cache
+
+_notes() {
+    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]}
+    local sub="" field="" i
+    local -a db=()
+
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        case ${COMP_WORDS[i]} in
+            --db) db=(--db "${COMP_WORDS[i+1]}") ;;
+            -*) ;;
+            *) [[ -z $sub && ${COMP_WORDS[i-1]} != --trace-format ]] && sub=${COMP_WORDS[i]} ;;
+        esac
+    done
+
+    case $prev in
+        --project|-p) field=project ;;
+        --user) field=user ;;
+        --directory|-d|--directory-prefix) field=directory ;;
+        --db|--output|-o) COMPREPLY=($(compgen -f -- "$cur")); return ;;
+    esac
+
+    if [[ -n $field ]]; then
+        local IFS=$'\n'
+        COMPREPLY=($(notes complete "${db[@]}" "$field" -- "$cur" 2>/dev/null))
+        # Keep the frequency order instead of sorting (bash >= 4.4).
+        compopt -o nosort 2>/dev/null
+        return
+    fi
+
+    if [[ -z $sub ]]; then
+        if [[ $cur == -* ]]; then
+            COMPREPLY=($(compgen -W "--trace --trace-format --trace-plan --help" -- "$cur"))
+        else
+            COMPREPLY=($(compgen -W "$_notes_subcommands" -- "$cur"))
+        fi
+        return
+    fi
+
+    if [[ $cur == -* ]]; then
+        # Options are read once per shell from the subcommand's --help.
+        if [[ -z ${_notes_option_cache[$sub]+set} ]]; then
+            _notes_option_cache[$sub]=$(notes "$sub" --help 2>/dev/null | grep -E '^  -' |
+                grep -oE -- '(^|[ ,])--?[A-Za-z][-A-Za-z]*' | tr -d ' ,' | sort -u | tr '\n' ' ')
+        fi
+        COMPREPLY=($(compgen -W "${_notes_option_cache[$sub]}" -- "$cur"))
+    fi
+}
+
+complete -o default -F _notes notes
@@ -0,0 +1,377 @@
+"""Optional resident notes daemon and its thin client.
+
+`notes serve` keeps one warm SQLite connection (with its statement cache and
+page cache) and answers add/list/list-dir/remove requests over a Unix domain
+socket. Each message is a 4-byte big-endian length followed by a UTF-8 JSON
+object:
+
+    request:  {"cmd": "add" | "list" | "remove", "args": {...}}
+    response: {"code": 0, "stdout": "...", "stderr": "..."}
+
+All database work runs on a single worker thread. `add` requests that queue up
+while a transaction is committing are written together in the next one
+(group commit), so concurrent writers share a single fsync. When idle, and
+before every other request, the worker flushes notes spooled by
+`add --spool` into the database.
+
+main.py forwards to the daemon whenever its socket accepts connections and
+falls back to direct SQLite access otherwise.
+"""
+
+import os
+import sqlite3
+import sys
+from typing import Optional
+
+from database import USER_DB
+
+MAX_MESSAGE = 16 * 1024 * 1024
+GROUP_COMMIT_LIMIT = 256
+# How long the worker waits for a request before flushing the add spool.
+SPOOL_FLUSH_SECONDS = 1.0
+
+# Subcommands the daemon can answer; list-dir is sent as a list request.
+FORWARDED_COMMANDS = {"add", "list", "list-dir", "remove"}
+
+
+def socket_path_for(db_path: Optional[str] = None) -> str:
+    """Return the socket a daemon serving `db_path` listens on."""
+    if os.environ.get("NOTES_SOCKET"):
+        return os.environ["NOTES_SOCKET"]
+    return os.path.splitext(db_path or USER_DB)[0] + ".sock"
+
+
+def send_message(sock, payload: dict) -> None:
+    import json
+    import struct
+
+    data = json.dumps(payload).encode()
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def recv_message(sock) -> Optional[dict]:
+    """Read one framed message; None when the peer closed the connection."""
+    import json
+    import struct
+
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    (length,) = struct.unpack(">I", header)
+    if length > MAX_MESSAGE:
+        raise ValueError(f"message of {length} bytes exceeds the {MAX_MESSAGE} byte limit")
+    body = _recv_exact(sock, length)
+    if body is None:
+        raise ConnectionError("connection closed mid-message")
+    return json.loads(body)
+
+
+def _recv_exact(sock, n: int) -> Optional[bytes]:
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            if chunks:
+                raise ConnectionError("connection closed mid-message")
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+class DaemonClient:
+    """Connection to a running daemon."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def request(self, cmd: str, **args) -> dict:
+        send_message(self.sock, {"cmd": cmd, "args": args})
+        response = recv_message(self.sock)
+        if response is None:
+            raise ConnectionError("daemon closed the connection")
+        return response
+
+    def run(self, cmd: str, **args) -> None:
+        """Send a request and replay its output like the direct code path."""
+        try:
+            response = self.request(cmd, **args)
+        except OSError as e:
+            print(f"Error: lost connection to the notes daemon: {e}", file=sys.stderr)
+            sys.exit(2)
+        sys.stdout.write(response.get("stdout", ""))
+        sys.stderr.write(response.get("stderr", ""))
+        if response.get("code"):
+            sys.exit(response["code"])
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def connect(db_path: Optional[str] = None, timeout: float = 5.0) -> Optional[DaemonClient]:
+    """Return a client for the daemon serving `db_path`, or None if none is running."""
+    path = socket_path_for(db_path)
+    # Checked first so the common no-daemon case never imports socket.
+    if os.environ.get("NOTES_NO_DAEMON") or not os.path.exists(path):
+        return None
+
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        # Stale socket file left by a daemon that is no longer running.
+        sock.close()
+        return None
+    return DaemonClient(sock)
+
+
+def client_for(args) -> Optional[DaemonClient]:
+    """Return a daemon client when `args` is a subcommand it can serve."""
+    if args.cmd not in FORWARDED_COMMANDS:
+        return None
+    if getattr(args, "summary", False):
+        # list-dir --summary reads the database directly, read-only.
+        return None
+    return connect(args.db)
+
+
+class _Job:
+    __slots__ = ("cmd", "args", "done", "response")
+
+    def __init__(self, cmd: str, args: dict):
+        import threading
+
+        self.cmd = cmd
+        self.args = args
+        self.done = threading.Event()
+        self.response: dict = {}
+
+    def finish(self, stdout: str = "", stderr: str = "", code: int = 0) -> None:
+        self.response = {"code": code, "stdout": stdout, "stderr": stderr}
+        self.done.set()
+
+
+class NotesDaemon:
+    """Serve one database over a Unix socket from a single warm connection."""
+
+    def __init__(self, db_path: Optional[str] = None, socket_path: Optional[str] = None):
+        import queue
+        import threading
+
+        self.db_path = db_path
+        self.socket_path = socket_path or socket_path_for(db_path)
+        self.jobs: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self.store = None
+        self.server = None
+        self.ready = threading.Event()
+        self.startup_error: Optional[Exception] = None
+        # Group commit bookkeeping: notes_added / add_commits is the mean group size.
+        self.add_commits = 0
+        self.notes_added = 0
+
+    def submit(self, cmd: str, args: dict) -> dict:
+        job = _Job(cmd, args)
+        self.jobs.put(job)
+        job.done.wait()
+        return job.response
+
+    # Worker thread -------------------------------------------------------
+
+    def _work(self) -> None:
+        import queue
+
+        from notes_core import NotesStore
+
+        try:
+            self.store = NotesStore(self.db_path)
+        except (RuntimeError, sqlite3.Error) as e:
+            self.startup_error = e
+            return
+        finally:
+            self.ready.set()
+
+        carry = None
+        while True:
+            job = carry or self._next_job()
+            carry = None
+            if job is None:
+                break
+            if job.cmd != "add":
+                self._run_one(job)
+                continue
+
+            batch = [job]
+            while len(batch) < GROUP_COMMIT_LIMIT:
+                try:
+                    nxt = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is not None and nxt.cmd == "add":
+                    batch.append(nxt)
+                else:
+                    carry = nxt
+                    if nxt is None:
+                        self.jobs.put(None)
+                    break
+            self._add_batch(batch)
+        self.store.close()
+
+    def _next_job(self) -> Optional[_Job]:
+        import queue
+
+        while True:
+            try:
+                return self.jobs.get(timeout=SPOOL_FLUSH_SECONDS)
+            except queue.Empty:
+                self._flush_spool()
+
+    def _flush_spool(self) -> None:
+        try:
+            self.store.flush_spool()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error: cannot flush the add spool: {e}", file=sys.stderr)
+
+    def _add_batch(self, batch: list) -> None:
+        try:
+            self.store.insert_entries([(job.args["fields"], job.args.get("hidden", False), job.args.get("password"))
+                                       for job in batch])
+            self.add_commits += 1
+            self.notes_added += len(batch)
+        except (sqlite3.Error, ValueError, KeyError, TypeError):
+            if len(batch) > 1:
+                # Isolate the failing request instead of failing the whole group.
+                for job in batch:
+                    self._add_batch([job])
+                return
+            exc = sys.exc_info()[1]
+            batch[0].finish(stderr=f"Error: {exc}\n", code=1 if isinstance(exc, ValueError) else 2)
+            return
+        for job in batch:
+            job.finish(f"Saved note for user '{job.args['fields']['username']}' to {self.store.path}\n")
+
+    def _run_one(self, job: _Job) -> None:
+        import io
+
+        from notes_core import FORMATTERS, _remove_from_store, _write_page
+
+        args = job.args
+        # Spooled notes must be visible to (and removable by) this request.
+        self._flush_spool()
+        try:
+            if job.cmd == "list":
+                limit = args.get("limit", 20)
+                fmt = args.get("format", "text")
+                if fmt not in FORMATTERS:
+                    raise ValueError(f"unknown format '{fmt}'")
+                notes = self.store.query(
+                    limit,
+                    args.get("user"),
+                    args.get("project"),
+                    args.get("directory"),
+                    args.get("show_hidden", False),
+                    args.get("password"),
+                    args.get("before"),
+                    args.get("after"),
+                    args.get("task"),
+                    args.get("since"),
+                    args.get("until"),
+                    args.get("directory_prefix"),
+                )
+                out, err = io.StringIO(), io.StringIO()
+                _write_page(notes, limit, bool(args.get("after")), fmt, out, err)
+                job.finish(out.getvalue(), err.getvalue())
+            elif job.cmd == "remove":
+                out, err = io.StringIO(), io.StringIO()
+                code = _remove_from_store(
+                    self.store,
+                    args.get("ids") or ([args["id"]] if "id" in args else []),
+                    out,
+                    err,
+                    args.get("user"),
+                    args.get("project"),
+                    args.get("directory"),
+                    args.get("since"),
+                    args.get("until"),
+                    args.get("dry_run", False),
+                    args.get("batch_size", 500),
+                )
+                job.finish(out.getvalue(), err.getvalue(), code)
+            else:
+                job.finish(stderr=f"Error: unsupported daemon command '{job.cmd}'\n", code=1)
+        except ValueError as e:
+            job.finish(stderr=f"Error: {e}\n", code=1)
+        except (sqlite3.Error, KeyError, TypeError) as e:
+            job.finish(stderr=f"Error: {e}\n", code=2)
+
+    # Socket side ---------------------------------------------------------
+
+    def serve_forever(self) -> None:
+        import socket
+        import socketserver
+        import threading
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"a daemon is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                while True:
+                    try:
+                        request = recv_message(self.request)
+                    except (ValueError, ConnectionError):
+                        return
+                    if request is None:
+                        return
+                    cmd = request.get("cmd")
+                    response = daemon.submit(cmd, request.get("args") or {})
+                    send_message(self.request, response)
+
+        worker = threading.Thread(target=self._work, name="notes-db", daemon=True)
+        worker.start()
+        self.ready.wait()
+        if self.startup_error is not None:
+            raise RuntimeError(f"Cannot open database: {self.startup_error}")
+
+        old_umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        self.server.daemon_threads = True
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.jobs.put(None)
+            worker.join()
+
+    def shutdown(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+
+
+def serve(db_path: Optional[str] = None, socket_path: Optional[str] = None) -> None:
+    daemon = NotesDaemon(db_path, socket_path)
+    print(f"Serving notes on {daemon.socket_path} (Ctrl-C to stop)", file=sys.stderr)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
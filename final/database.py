@@ -1,10 +1,54 @@
 import os
 import sqlite3
-from typing import Optional
+import time
+from typing import Callable, Optional, TypeVar
 
-USER_DB = os.path.expanduser("~/.local/share/infosec_notes/notes.db")
+import tracing
+from dbfiles import BUSY_TIMEOUT_MS, USER_DB, archive_path_for, connect_readonly
+
+T = TypeVar("T")
+
+# Connection profiles, selected with NOTES_DB_PROFILE. "concurrent" lets
+# many shells and CI hooks write to a shared DB: WAL keeps readers from
+# blocking the writer and busy_timeout makes writers queue instead of failing
+# with "database is locked". "compat" keeps SQLite's rollback journal for
+# filesystems where WAL is unavailable (e.g. network mounts).
+PROFILES = {
+    "concurrent": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": BUSY_TIMEOUT_MS,
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,
+    },
+    "compat": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": BUSY_TIMEOUT_MS,
+        "mmap_size": 0,
+        "cache_size": -2000,
+    },
+}
+DEFAULT_PROFILE = "concurrent"
 
 def ensure_db(conn: sqlite3.Connection) -> None:
+    """Bring the schema up to SCHEMA_VERSION, tracked in PRAGMA user_version.
+
+    Databases created before versioning report version 0; every migration
+    is idempotent, so they are upgraded by replaying the whole list.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == SCHEMA_VERSION:
+        # Warm database: no DDL at all.
+        return
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        with tracing.phase(f"migrate:{MIGRATIONS[target - 1].__name__}"):
+            MIGRATIONS[target - 1](conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+
+
+def _migrate_base_schema(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
     cur.execute(
         """
@@ -22,20 +66,718 @@ def ensure_db(conn: sqlite3.Connection) -> None:
         )
         """
     )
+    ensure_search_index(conn)
+
+
+def ensure_search_index(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 index over tasks/notes and the triggers that keep it in sync."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+    existed = cur.fetchone() is not None
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            tasks, notes, content='notes', content_rowid='id'
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, tasks, notes) VALUES (new.id, new.tasks, new.notes);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, tasks, notes) VALUES ('delete', old.id, old.tasks, old.notes);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, tasks, notes) VALUES ('delete', old.id, old.tasks, old.notes);
+            INSERT INTO notes_fts(rowid, tasks, notes) VALUES (new.id, new.tasks, new.notes);
+        END
+        """
+    )
+    if not existed:
+        # Databases created before the index existed already hold notes.
+        rebuild_search_index(conn)
+    conn.commit()
+
+
+def rebuild_search_index(conn: sqlite3.Connection) -> None:
+    conn.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def _migrate_filter_indexes(conn: sqlite3.Connection) -> None:
+    # One index per `list` filter path; each ends in timestamp so that
+    # ORDER BY timestamp DESC LIMIT n reads the index backwards without a sort.
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_hidden_ts ON notes (is_hidden, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_project_ts ON notes (project, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_directory_ts ON notes (directory, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_username_ts ON notes (username, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_password_hash ON notes (password_hash)")
+
+
+def _migrate_import_progress(conn: sqlite3.Connection) -> None:
+    # Records committed so far per import source, for resuming bulk imports.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            records_done INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _migrate_password_verifiers(conn: sqlite3.Connection) -> None:
+    # One salted scrypt verifier per distinct hidden-note password; see passwords.py.
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS notes_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO notes_meta (key, value) VALUES ('verifier_lookup_salt', hex(randomblob(16)))")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS password_verifiers (
+            id INTEGER PRIMARY KEY,
+            lookup TEXT NOT NULL UNIQUE,
+            salt BLOB NOT NULL,
+            key BLOB NOT NULL
+        )
+        """
+    )
+    if not _has_column(conn, "notes", "verifier_id"):
+        cur.execute("ALTER TABLE notes ADD COLUMN verifier_id INTEGER REFERENCES password_verifiers (id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_verifier_ts ON notes (verifier_id, timestamp)")
+
+
+def split_tasks(text: Optional[str]) -> list[str]:
+    """Split the `; `-joined tasks column back into individual tasks."""
+    return [t.strip() for t in (text or "").split(";") if t.strip()]
+
+
+def _migrate_note_tasks(conn: sqlite3.Connection, chunk_size: int = 5000) -> None:
+    # One row per task of each non-hidden note, so "which notes did task X"
+    # and "most frequent tasks" are index lookups rather than LIKE scans.
+    # Hidden notes are left out so their tasks cannot be counted or matched.
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS note_tasks (
+            note_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            PRIMARY KEY (note_id, position)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_note_tasks_task ON note_tasks (task, note_id)")
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_tasks_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM note_tasks WHERE note_id = old.id;
+        END
+        """
+    )
+    conn.commit()
+
+    # Backfill in committed chunks; an interrupted run resumes where it stopped.
+    last_id = cur.execute("SELECT COALESCE(MAX(note_id), 0) FROM note_tasks").fetchone()[0]
+    while True:
+        rows = cur.execute(
+            "SELECT id, tasks FROM notes WHERE id > ? AND is_hidden = 0 ORDER BY id LIMIT ?", (last_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+        cur.executemany(
+            "INSERT OR IGNORE INTO note_tasks (note_id, position, task) VALUES (?, ?, ?)",
+            ((note_id, pos, task) for note_id, text in rows for pos, task in enumerate(split_tasks(text))),
+        )
+        conn.commit()
+        last_id = rows[-1][0]
+
+
+# Dimensions kept in note_rollups, with the notes column each one counts.
+ROLLUP_DIMENSIONS = {"project": "project", "user": "username", "host": "host"}
+
+
+def _migrate_rollups(conn: sqlite3.Connection) -> None:
+    # Per-day note counts for each dimension, maintained by triggers so that
+    # `stats` reads a few rows per day instead of the notes table. Like
+    # note_tasks, hidden notes are not counted. The triggers need
+    # ts_epoch_ms, so they come with _migrate_rollup_utc_days.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS note_rollups (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, day, key)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def rollup_day_sql(row: str) -> str:
+    """SQL for the UTC day (YYYY-MM-DD) of a note, `row` being `new`, `old` or `notes`.
+
+    It is the day of ts_epoch_ms, the instant `stats --since` filters on.
+    """
+    epoch_ms = f"COALESCE({row}.ts_epoch_ms, {epoch_ms_sql(row + '.timestamp')})"
+    return f"date({epoch_ms} / 1000, 'unixepoch')"
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> None:
+    """Recompute note_rollups from the notes table."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM note_rollups")
+    for dimension, column in ROLLUP_DIMENSIONS.items():
+        cur.execute(
+            "INSERT INTO note_rollups (dimension, day, key, count) "
+            f"SELECT ?, {rollup_day_sql('notes')}, COALESCE({column}, ''), COUNT(*) "
+            "FROM notes WHERE is_hidden = 0 GROUP BY 2, 3",
+            (dimension,),
+        )
+    conn.commit()
+
+
+def _migrate_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    # Lets `prune` hand freed pages back to the filesystem with
+    # incremental_vacuum; switching an existing file needs one full VACUUM.
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def incremental_vacuum(conn: sqlite3.Connection, step_pages: int = 1024, schema: str = "main") -> int:
+    """Release free pages `step_pages` at a time; return how many were released.
+
+    Each step is a short write transaction, so other writers can interleave.
+    In WAL mode the file only shrinks once the WAL is checkpointed, which is
+    done at the end.
+    """
+    released = 0
+    while True:
+        free = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        if free == 0:
+            break
+        conn.execute(f"PRAGMA {schema}.incremental_vacuum({int(step_pages)})").fetchall()
+        conn.commit()
+        remaining = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        if remaining >= free:
+            break
+        released += free - remaining
+    conn.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)").fetchall()
+    return released
+
+
+def epoch_ms_sql(expr: str) -> str:
+    """SQL converting an ISO-8601 text `expr` (any offset) to integer Unix milliseconds.
+
+    Values SQLite cannot parse become 0, i.e. sort as the oldest notes.
+    """
+    return (
+        f"COALESCE(CAST(strftime('%s', {expr}) AS INTEGER) * 1000 "
+        f"+ CAST(substr(strftime('%f', {expr}), 4) AS INTEGER), 0)"
+    )
+
+
+def _backfill_in_chunks(conn: sqlite3.Connection, assignment: str, where: str, chunk_size: int) -> None:
+    """Run `UPDATE notes SET <assignment> WHERE <where>` in committed chunks of ids."""
+    cur = conn.cursor()
+    last_id = 0
+    while True:
+        row = cur.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM notes WHERE id > ? ORDER BY id LIMIT ?)", (last_id, chunk_size)
+        ).fetchone()
+        if row[0] is None:
+            break
+        cur.execute(f"UPDATE notes SET {assignment} WHERE id > ? AND id <= ? AND {where}", (last_id, row[0]))
+        conn.commit()
+        last_id = row[0]
+
+
+def _migrate_epoch_ms(conn: sqlite3.Connection, chunk_size: int = 20000) -> None:
+    # Integer sort key: smaller indexes and cheaper comparisons than the ISO
+    # text, and correct across time-zone offsets. The text column is kept
+    # for display. Writers pass ts_epoch_ms; the trigger covers any INSERT
+    # that does not.
+    cur = conn.cursor()
+    if not _has_column(conn, "notes", "ts_epoch_ms"):
+        cur.execute("ALTER TABLE notes ADD COLUMN ts_epoch_ms INTEGER")
+    # Only text edits touch the search index; setting the sort key (or a
+    # verifier) must not re-index, least of all before notes_fts_ai has run.
+    cur.execute("DROP TRIGGER IF EXISTS notes_fts_au")
+    cur.execute(
+        """
+        CREATE TRIGGER notes_fts_au AFTER UPDATE OF tasks, notes ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, tasks, notes) VALUES ('delete', old.id, old.tasks, old.notes);
+            INSERT INTO notes_fts(rowid, tasks, notes) VALUES (new.id, new.tasks, new.notes);
+        END
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS notes_ts_epoch_ai AFTER INSERT ON notes WHEN new.ts_epoch_ms IS NULL BEGIN
+            UPDATE notes SET ts_epoch_ms = {epoch_ms_sql('new.timestamp')} WHERE id = new.id;
+        END
+        """
+    )
+    conn.commit()
+
+    _backfill_in_chunks(conn, f"ts_epoch_ms = {epoch_ms_sql('timestamp')}", "ts_epoch_ms IS NULL", chunk_size)
+
+    # The (column, timestamp) indexes are replaced by (column, ts_epoch_ms).
+    for name, column in [
+        ("hidden", "is_hidden"),
+        ("project", "project"),
+        ("directory", "directory"),
+        ("username", "username"),
+        ("verifier", "verifier_id"),
+    ]:
+        cur.execute(f"DROP INDEX IF EXISTS idx_notes_{name}_ts")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_notes_{name}_ms ON notes ({column}, ts_epoch_ms)")
+    # The archive boundary becomes a millisecond value as well.
+    cur.execute(
+        f"UPDATE notes_meta SET value = {epoch_ms_sql('value')} "
+        "WHERE key = 'archived_before' AND value GLOB '*[^0-9]*'"
+    )
+
+
+def dir_key(directory: str) -> str:
+    """Normalize `directory` for subtree range scans.
+
+    Runs of separators collapse and the result ends in exactly one `/`, so
+    `/a/b`, `/a/b/` and `/a//b` share the key `/a/b/`. A backslash is a
+    separator only where it is os.sep; on POSIX it is part of the name.
+    Inserts store this key and queries look it up, so both always agree.
+    """
+    import re
+
+    if os.sep != "/":
+        directory = directory.replace(os.sep, "/")
+    return re.sub("/+", "/", directory).rstrip("/") + "/"
+
+
+def dir_key_sql(expr: str) -> str:
+    """SQL approximating dir_key() for inserts that leave dir_key NULL.
+
+    Only the fallback trigger and the original backfill use it: it collapses
+    at most eight separators in a row, which _migrate_python_dir_keys fixes
+    up for the rows it got wrong.
+    """
+    collapsed = expr if os.sep == "/" else f"replace({expr}, '{os.sep}', '/')"
+    for _ in range(3):
+        collapsed = f"replace({collapsed}, '//', '/')"
+    return f"CASE WHEN {expr} IS NULL THEN NULL ELSE rtrim({collapsed}, '/') || '/' END"
+
+
+def _migrate_dir_key(conn: sqlite3.Connection, chunk_size: int = 20000) -> None:
+    # A normalized copy of directory: the subtree of /a/b is the half-open
+    # range ['/a/b/', '/a/b0') because '0' is the character after '/'.
+    cur = conn.cursor()
+    if not _has_column(conn, "notes", "dir_key"):
+        cur.execute("ALTER TABLE notes ADD COLUMN dir_key TEXT")
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS notes_dir_key_ai AFTER INSERT ON notes
+        WHEN new.dir_key IS NULL AND new.directory IS NOT NULL BEGIN
+            UPDATE notes SET dir_key = {dir_key_sql('new.directory')} WHERE id = new.id;
+        END
+        """
+    )
+    conn.commit()
+    _backfill_in_chunks(
+        conn, f"dir_key = {dir_key_sql('directory')}", "dir_key IS NULL AND directory IS NOT NULL", chunk_size
+    )
+    # Exact --directory matches use the same index, so trailing slashes no longer matter.
+    cur.execute("DROP INDEX IF EXISTS idx_notes_directory_ms")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_dir_key_ms ON notes (dir_key, ts_epoch_ms)")
+
+
+def _migrate_spool_ids(conn: sqlite3.Connection) -> None:
+    # Notes flushed from the add spool keep their spool_id so a repeated
+    # flush can tell which records are already stored.
+    cur = conn.cursor()
+    if not _has_column(conn, "notes", "spool_id"):
+        cur.execute("ALTER TABLE notes ADD COLUMN spool_id TEXT")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_notes_spool_id ON notes (spool_id) WHERE spool_id IS NOT NULL")
+
+
+def _migrate_dir_summary(conn: sqlite3.Connection) -> None:
+    # One row per directory (by dir_key) with its note count and newest note,
+    # kept by triggers so `list-dir --summary` reads a single row. Like the
+    # rollups, hidden notes are not counted.
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dir_summary (
+            directory TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            last_note_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    # ts_epoch_ms and dir_key are normally set by the INSERT itself; the
+    # COALESCEs cover inserts that leave them to their triggers.
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS dir_summary_ai AFTER INSERT ON notes
+        WHEN new.is_hidden = 0 AND new.directory IS NOT NULL BEGIN
+            INSERT INTO dir_summary (directory, count, last_ts, last_note_id)
+            VALUES (
+                COALESCE(new.dir_key, {dir_key_sql('new.directory')}),
+                1,
+                COALESCE(new.ts_epoch_ms, {epoch_ms_sql('new.timestamp')}),
+                new.id
+            )
+            ON CONFLICT (directory) DO UPDATE SET
+                count = count + 1,
+                last_note_id = CASE WHEN (excluded.last_ts, excluded.last_note_id) > (last_ts, last_note_id)
+                               THEN excluded.last_note_id ELSE last_note_id END,
+                last_ts = max(last_ts, excluded.last_ts);
+        END
+        """
+    )
+    # Deleting the newest note of a directory finds the next one through idx_notes_dir_key_ms.
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS dir_summary_ad AFTER DELETE ON notes
+        WHEN old.is_hidden = 0 AND old.dir_key IS NOT NULL BEGIN
+            UPDATE dir_summary SET count = count - 1 WHERE directory = old.dir_key;
+            DELETE FROM dir_summary WHERE directory = old.dir_key AND count <= 0;
+            UPDATE dir_summary SET (last_ts, last_note_id) = (
+                SELECT ts_epoch_ms, id FROM notes WHERE dir_key = old.dir_key AND is_hidden = 0
+                ORDER BY ts_epoch_ms DESC, id DESC LIMIT 1
+            ) WHERE directory = old.dir_key AND last_note_id = old.id;
+        END
+        """
+    )
+    rebuild_dir_summary(conn)
+
+
+def rebuild_dir_summary(conn: sqlite3.Connection) -> None:
+    """Recompute dir_summary from the notes table."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM dir_summary")
+    cur.execute(
+        """
+        INSERT INTO dir_summary (directory, count, last_ts, last_note_id)
+        SELECT dir_key, COUNT(*), MAX(ts_epoch_ms), (
+            SELECT id FROM notes AS newest WHERE newest.dir_key = n.dir_key AND newest.is_hidden = 0
+            ORDER BY ts_epoch_ms DESC, id DESC LIMIT 1
+        )
+        FROM notes AS n WHERE is_hidden = 0 AND dir_key IS NOT NULL GROUP BY dir_key
+        """
+    )
+    conn.commit()
+
+
+# Fields `notes complete` offers values for -> the notes column they come from.
+VOCABULARY_FIELDS = {"project": "project", "user": "username", "directory": "directory"}
+
+
+def _migrate_vocabulary(conn: sqlite3.Connection) -> None:
+    # Distinct values per field with how often and how recently they were
+    # used, kept by triggers so completion never runs SELECT DISTINCT over
+    # notes. The primary key answers prefix ranges; idx_vocabulary_rank
+    # answers an empty prefix in frequency order. Hidden notes are skipped.
+    cur = conn.cursor()
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vocabulary (
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            last_used INTEGER NOT NULL,
+            PRIMARY KEY (field, value)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vocabulary_rank ON vocabulary (field, count, last_used)")
+    inserts = []
+    deletes = []
+    for field, column in VOCABULARY_FIELDS.items():
+        inserts.append(
+            "INSERT INTO vocabulary (field, value, count, last_used) "
+            f"SELECT '{field}', new.{column}, 1, COALESCE(new.ts_epoch_ms, {epoch_ms_sql('new.timestamp')}) "
+            f"WHERE new.{column} != '' "
+            "ON CONFLICT (field, value) DO UPDATE SET count = count + 1, last_used = max(last_used, excluded.last_used);"
+        )
+        deletes.append(f"UPDATE vocabulary SET count = count - 1 WHERE (field, value) = ('{field}', old.{column});")
+        deletes.append(f"DELETE FROM vocabulary WHERE (field, value) = ('{field}', old.{column}) AND count <= 0;")
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS vocabulary_ai AFTER INSERT ON notes WHEN new.is_hidden = 0 BEGIN\n"
+        + "\n".join(inserts)
+        + "\nEND"
+    )
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS vocabulary_ad AFTER DELETE ON notes WHEN old.is_hidden = 0 BEGIN\n"
+        + "\n".join(deletes)
+        + "\nEND"
+    )
+    rebuild_vocabulary(conn)
+
+
+def rebuild_vocabulary(conn: sqlite3.Connection) -> None:
+    """Recompute the vocabulary table from the notes table."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM vocabulary")
+    for field, column in VOCABULARY_FIELDS.items():
+        cur.execute(
+            "INSERT INTO vocabulary (field, value, count, last_used) "
+            f"SELECT ?, {column}, COUNT(*), MAX(ts_epoch_ms) FROM notes "
+            f"WHERE is_hidden = 0 AND {column} != '' GROUP BY {column}",
+            (field,),
+        )
+    conn.commit()
+
+
+def _archived_max_id(conn: sqlite3.Connection) -> int:
+    """Return the highest note id in the archive next to `conn`'s database (0 if none)."""
+    main_file = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+    path = archive_path_for(main_file) if main_file else ""
+    if not path or not os.path.exists(path):
+        return 0
+    archive = connect_readonly(path)
+    try:
+        return archive.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        archive.close()
+
+
+def _migrate_autoincrement_ids(conn: sqlite3.Connection) -> None:
+    # Without AUTOINCREMENT SQLite reuses the id of a removed newest note,
+    # which may still name a note in the archive (or one `watch` has already
+    # reported). SQLite cannot add AUTOINCREMENT in place, so the table is
+    # rebuilt with the same columns, indexes and triggers. The sequence
+    # starts above every id handed out so far, archived ones included.
+    table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes'").fetchone()[0]
+    if "AUTOINCREMENT" in table_sql.upper():
+        return
+    archived_max = _archived_max_id(conn)
+    dependents = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'notes' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    new_sql = table_sql.replace("CREATE TABLE notes", "CREATE TABLE notes_new", 1).replace(
+        "id INTEGER PRIMARY KEY", "id INTEGER PRIMARY KEY AUTOINCREMENT", 1
+    )
+    conn.commit()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute(new_sql)
+        cur.execute("INSERT INTO notes_new SELECT * FROM notes")
+        # Dropping a table fires no triggers, so the derived tables stay as they are.
+        cur.execute("DROP TABLE notes")
+        cur.execute("ALTER TABLE notes_new RENAME TO notes")
+        for (sql,) in dependents:
+            cur.execute(sql)
+        cur.execute("DELETE FROM sqlite_sequence WHERE name = 'notes'")
+        cur.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'notes', max(COALESCE((SELECT MAX(id) FROM notes), 0), ?)",
+            (archived_max,),
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _migrate_rollup_utc_days(conn: sqlite3.Connection) -> None:
+    # Days used to be substr(timestamp, 1, 10), the local date of a
+    # timestamp with an offset (2024-01-01T23:30:00-05:00 is 2024-01-02 in
+    # UTC), so the rollups disagreed with `stats --since`. The triggers are
+    # replaced and the rollups recomputed.
+    cur = conn.cursor()
+    inserts = []
+    deletes = []
+    for dimension, column in ROLLUP_DIMENSIONS.items():
+        key = f"'{dimension}', {{day}}, COALESCE({{row}}.{column}, '')"
+        new_key = key.format(row="new", day=rollup_day_sql("new"))
+        old_key = key.format(row="old", day=rollup_day_sql("old"))
+        inserts.append(
+            f"INSERT INTO note_rollups (dimension, day, key, count) VALUES ({new_key}, 1) "
+            "ON CONFLICT (dimension, day, key) DO UPDATE SET count = count + 1;"
+        )
+        deletes.append(f"UPDATE note_rollups SET count = count - 1 WHERE (dimension, day, key) = ({old_key});")
+        deletes.append(f"DELETE FROM note_rollups WHERE (dimension, day, key) = ({old_key}) AND count <= 0;")
+    cur.execute("DROP TRIGGER IF EXISTS note_rollups_ai")
+    cur.execute("DROP TRIGGER IF EXISTS note_rollups_ad")
+    cur.execute(
+        "CREATE TRIGGER note_rollups_ai AFTER INSERT ON notes WHEN new.is_hidden = 0 BEGIN\n"
+        + "\n".join(inserts)
+        + "\nEND"
+    )
+    cur.execute(
+        "CREATE TRIGGER note_rollups_ad AFTER DELETE ON notes WHEN old.is_hidden = 0 BEGIN\n"
+        + "\n".join(deletes)
+        + "\nEND"
+    )
+    rebuild_rollups(conn)
+
 
 
-def open_db(path: str) -> sqlite3.Connection:
+def _migrate_drop_verifier_lookup(conn: sqlite3.Connection) -> None:
+    # Verifiers used to carry a `lookup` key: scrypt of the password under one
+    # salt stored in notes_meta, so a single guess could be tested against
+    # every verifier at once. passwords.py now tries each verifier with its
+    # own salt; the column and the shared salt go. A UNIQUE column cannot be
+    # dropped in place, so the table is rebuilt.
+    cur = conn.cursor()
+    cur.execute("DELETE FROM notes_meta WHERE key = 'verifier_lookup_salt'")
+    if not _has_column(conn, "password_verifiers", "lookup"):
+        return
+    cur.execute("CREATE TABLE password_verifiers_new (id INTEGER PRIMARY KEY, salt BLOB NOT NULL, key BLOB NOT NULL)")
+    cur.execute("INSERT INTO password_verifiers_new (id, salt, key) SELECT id, salt, key FROM password_verifiers")
+    cur.execute("DROP TABLE password_verifiers")
+    cur.execute("ALTER TABLE password_verifiers_new RENAME TO password_verifiers")
+
+
+def _migrate_python_dir_keys(conn: sqlite3.Connection) -> None:
+    # dir_key used to be computed by dir_key_sql on insert, which collapses
+    # at most eight separators in a row and took `\` for one on POSIX too.
+    # Inserts now bind dir_key(); keys of rows with a backslash or a doubled
+    # separator are recomputed the same way and dir_summary rebuilt.
+    rows = conn.execute(
+        "SELECT id, directory, dir_key FROM notes WHERE directory IS NOT NULL "
+        "AND (instr(directory, '\\') > 0 OR instr(directory, '//') > 0)"
+    ).fetchall()
+    changed = [(dir_key(directory), note_id) for note_id, directory, key in rows if dir_key(directory) != key]
+    if changed:
+        conn.executemany("UPDATE notes SET dir_key = ? WHERE id = ?", changed)
+        rebuild_dir_summary(conn)
+
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_filter_indexes,
+    _migrate_import_progress,
+    _migrate_password_verifiers,
+    _migrate_note_tasks,
+    _migrate_rollups,
+    _migrate_incremental_vacuum,
+    _migrate_epoch_ms,
+    _migrate_dir_key,
+    _migrate_spool_ids,
+    _migrate_dir_summary,
+    _migrate_vocabulary,
+    _migrate_autoincrement_ids,
+    _migrate_rollup_utc_days,
+    _migrate_drop_verifier_lookup,
+    _migrate_python_dir_keys,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def apply_profile(conn: sqlite3.Connection, profile: Optional[str] = None) -> None:
+    name = profile or os.environ.get("NOTES_DB_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise RuntimeError(f"Unknown DB profile '{name}' (expected one of: {', '.join(PROFILES)})")
+    settings = PROFILES[name]
+
+    # busy_timeout goes first so that switching the journal mode waits for
+    # other connections instead of failing.
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])}")
+    current_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if current_mode.upper() != settings["journal_mode"]:
+        conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+    conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])}")
+
+
+def attach_archive(conn: sqlite3.Connection, db_path: str) -> str:
+    """Attach the archive of `db_path` as schema `archive`, creating it if needed.
+
+    The archive is an ordinary notes database, so its own triggers keep its
+    search index and rollups current as rows are moved into it.
+    """
+    path = archive_path_for(db_path)
+    open_db(path).close()
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    return path
+
+
+def open_db_readonly(path: str) -> sqlite3.Connection:
+    """Open `path` read-only through a `mode=ro` URI.
+
+    Unlike open_db this runs no migrations and changes no settings that touch
+    the file, so any number of readers can use it without taking a write
+    lock. Raises sqlite3.OperationalError if the database does not exist.
+    """
+    return connect_readonly(path, tracing.connection_factory())
+
+
+def open_db(path: str, profile: Optional[str] = None) -> sqlite3.Connection:
     dirpath = os.path.dirname(path)
     if not os.path.exists(dirpath):
         try:
             os.makedirs(dirpath, exist_ok=True)
         except PermissionError:
             raise
-    conn = sqlite3.connect(path)
-    ensure_db(conn)
+    conn = sqlite3.connect(path, factory=tracing.connection_factory())
+    # Only takes effect before the first page is written (i.e. before the
+    # journal mode switch below); older files are converted by a migration.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    with tracing.phase("apply_profile"):
+        apply_profile(conn, profile)
+    with tracing.phase("ensure_db"):
+        ensure_db(conn)
     return conn
 
 
+def _is_busy(exc: sqlite3.OperationalError) -> bool:
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def run_with_retry(
+    conn: sqlite3.Connection,
+    work: Callable[[sqlite3.Cursor], T],
+    attempts: int = 5,
+    base_delay: float = 0.05,
+) -> T:
+    """Run `work` in a transaction and commit, retrying when the DB is busy.
+
+    busy_timeout already absorbs most contention; this covers the cases SQLite
+    reports immediately (e.g. a deferred transaction that cannot upgrade).
+    Waits grow exponentially with full jitter so retrying writers spread out.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = work(conn.cursor())
+            conn.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            attempt += 1
+            if attempt >= attempts or not _is_busy(e):
+                raise
+            import random
+
+            time.sleep(random.uniform(0, base_delay * (2 ** (attempt - 1))))
+        except BaseException:
+            # E.g. an IntegrityError: never leave half a transaction open.
+            conn.rollback()
+            raise
+
+
 def get_db_connection(db_path: Optional[str] = None) -> tuple[sqlite3.Connection, str]:
     candidate_paths = [USER_DB]
     if db_path:
@@ -45,14 +787,16 @@ def get_db_connection(db_path: Optional[str] = None) -> tuple[sqlite3.Connection
     last_exc = None
     used_path = None
     
-    for p in candidate_paths:
-        try:
-            conn = open_db(p)
-            used_path = p
-            break
-        except PermissionError as e:
-            last_exc = e
-            continue
+    with tracing.phase("get_db_connection"):
+        for p in candidate_paths:
+            try:
+                with tracing.phase(f"open_db:{p}"):
+                    conn = open_db(p)
+                used_path = p
+                break
+            except PermissionError as e:
+                last_exc = e
+                continue
     
     if conn is None:
         raise RuntimeError(f"Cannot open database (permission denied). Last error: {last_exc}")
@@ -0,0 +1,51 @@
+"""Where the notes databases (and the add spool) live and how to open one read-only.
+
+Only os and sqlite3 are imported here, so `notes complete` (which runs on
+every Tab press) shares these with database.py without loading typing,
+tracing or the migrations.
+"""
+
+import os
+import sqlite3
+
+USER_DB = os.path.expanduser("~/.local/share/infosec_notes/notes.db")
+# How long a connection waits for another one's lock before "database is locked".
+BUSY_TIMEOUT_MS = 5000
+
+
+def archive_path_for(db_path: str) -> str:
+    """Return the archive database that sits next to `db_path`."""
+    return os.path.splitext(db_path)[0] + "-archive.db"
+
+
+def spool_path_for(db_path: str) -> str:
+    """Return the current user's spool for `db_path`; it sits next to the database."""
+    return os.path.splitext(db_path)[0] + f"-spool-{os.getuid()}.jsonl"
+
+
+def pending_spools(path: str) -> list:
+    """Return the spool files waiting to be flushed: interrupted flushes first, then the spool."""
+    directory, name = os.path.split(path)
+    try:
+        names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return []
+    leftovers = sorted(n for n in names if n.startswith(name + ".flushing."))
+    files = [os.path.join(directory, n) for n in leftovers]
+    if name in names:
+        files.append(path)
+    return files
+
+
+def readonly_uri(path: str) -> str:
+    """Return a `file:` URI that opens (or attaches) `path` read-only."""
+    # Characters with a meaning in URIs; the rest of the path is taken as is.
+    escaped = path.replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+    return f"file:{escaped}?mode=ro"
+
+
+def connect_readonly(path: str, factory: type = sqlite3.Connection) -> sqlite3.Connection:
+    """Open `path` through a read-only URI; raises sqlite3.OperationalError if it does not exist."""
+    conn = sqlite3.connect(readonly_uri(path), uri=True, factory=factory)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
@@ -23,5 +23,14 @@ echo "Installing script to $BIN_PATH"
 sudo ln -sf "$SCRIPT_SRC" "$BIN_PATH"
 sudo chmod 0755 "$SCRIPT_SRC"
 
+if [[ -d /etc/bash_completion.d ]]; then
+  echo "Installing bash completion to /etc/bash_completion.d/notes"
+  sudo ln -sf "$SELF_DIR/completion/notes.bash" /etc/bash_completion.d/notes
+fi
+if [[ -d /usr/local/share/zsh/site-functions ]]; then
+  echo "Installing zsh completion to /usr/local/share/zsh/site-functions/_notes"
+  sudo ln -sf "$SELF_DIR/completion/_notes" /usr/local/share/zsh/site-functions/_notes
+fi
+
 echo "Done. You can now run 'notes add ...' and 'notes list'."
 echo "If you prefer to keep the DB per-user, don't run this installer."
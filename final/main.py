@@ -1,9 +1,31 @@
-from cli import parse_args, dispatch
+import sys
 
 
 def main() -> None:
-    args = parse_args()
-    dispatch(args)
+    if sys.argv[1:2] == ["complete"]:
+        # Runs on every Tab press: answered before argparse, tracing and the
+        # daemon client are even imported (see complete.py).
+        import complete
+
+        parsed = complete.parse_argv(sys.argv[2:])
+        if parsed is not None:
+            complete.print_completions(*parsed)
+            return
+
+    import tracing
+    from cli import dispatch, parse_args
+    from daemon import client_for
+
+    with tracing.phase("parse_args"):
+        args = parse_args()
+    # Forward to a running `notes serve` daemon; otherwise use SQLite directly.
+    client = client_for(args)
+    try:
+        dispatch(args, client)
+    finally:
+        if client is not None:
+            client.close()
+        tracing.report()
 
 
 if __name__ == "__main__":
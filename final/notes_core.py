@@ -1,15 +1,38 @@
+# Only what every subcommand needs is imported here; the rest is imported
+# where it is used so that e.g. a prompt hook calling `list-dir` does not pay
+# for socket, hashlib, json or csv. (datetime is already loaded by sqlite3.)
 import datetime
-import getpass
-import hashlib
 import os
-import socket
+import sqlite3
 import sys
-from typing import Iterable, Optional
+from typing import IO, Callable, Iterable, Iterator, Optional
 
-from database import get_db_connection
+from database import (
+    ROLLUP_DIMENSIONS,
+    USER_DB,
+    archive_path_for,
+    attach_archive,
+    dir_key,
+    epoch_ms_sql,
+    get_db_connection,
+    incremental_vacuum,
+    open_db_readonly,
+    rebuild_rollups,
+    rebuild_search_index,
+    run_with_retry,
+    split_tasks,
+)
+from dbfiles import pending_spools, readonly_uri, spool_path_for
+import tracing
 
 
 class Note:
+    """One stored note; slotted because listings build one per row."""
+
+    __slots__ = (
+        "id", "username", "host", "timestamp", "project", "tasks", "notes", "directory", "is_hidden", "ts_epoch_ms"
+    )
+
     def __init__(
         self,
         id: int,
@@ -21,6 +44,7 @@ class Note:
         notes: Optional[str],
         directory: Optional[str],
         is_hidden: bool = False,
+        ts_epoch_ms: Optional[int] = None,
     ):
         self.id = id
         self.username = username
@@ -31,6 +55,7 @@ class Note:
         self.notes = notes
         self.directory = directory
         self.is_hidden = is_hidden
+        self.ts_epoch_ms = ts_epoch_ms
     
     def __str__(self) -> str:
         hidden_mark = " [HIDDEN]" if self.is_hidden else ""
@@ -45,10 +70,146 @@ class Note:
         lines.append("")
         return "\n".join(lines)
 
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def _note_factory(cursor: sqlite3.Cursor, row: tuple) -> Note:
+    """sqlite3 row factory for queries selecting NOTE_COLUMNS."""
+    return Note(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], bool(row[8]), row[9])
+
+
+# ts_epoch_ms is derived from the timestamp parameter by the same SQL the
+# migrations used; dir_key (?10) is database.dir_key(directory), which the
+# directory filters look up.
+_INSERT_COLUMNS = (
+    "username, host, timestamp, project, tasks, notes, directory, is_hidden, verifier_id, ts_epoch_ms, dir_key"
+)
+_INSERT_VALUES = f"?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, {epoch_ms_sql('?3')}, ?10"
+INSERT_NOTE_SQL = f"INSERT INTO notes ({_INSERT_COLUMNS}) VALUES ({_INSERT_VALUES})"
+# Notes flushed from the add spool also store their spool_id, as ?11.
+INSERT_SPOOLED_NOTE_SQL = f"INSERT INTO notes ({_INSERT_COLUMNS}, spool_id) VALUES ({_INSERT_VALUES}, ?11)"
+
+
+def _privacy_flags() -> tuple[bool, bool, bool]:
+    """Return whether (username, host, directory) must be redacted."""
+    if os.environ.get("NOTES_PRIVACY_LEVEL", "full").lower() == "minimal":
+        return True, True, True
+    return (
+        bool(os.environ.get("NOTES_HIDE_USERNAME")),
+        bool(os.environ.get("NOTES_HIDE_HOST")),
+        bool(os.environ.get("NOTES_HIDE_DIR")),
+    )
+
+
+def _system_fields(
+    username: Optional[str] = None,
+    host: Optional[str] = None,
+    directory: Optional[str] = None,
+    flags: Optional[tuple[bool, bool, bool]] = None,
+) -> tuple[str, str, str]:
+    """Return (username, host, directory) with the privacy settings applied.
+
+    Values that are not supplied default to the current user, host and
+    working directory.
+    """
+    import getpass
+    import socket
+
+    hide_username, hide_host, hide_dir = flags or _privacy_flags()
+    username = "user" if hide_username else (username or getpass.getuser())
+    host = "host" if hide_host else (host or socket.gethostname())
+    directory = "/redacted" if hide_dir else (directory or os.getcwd())
+    return username, host, directory
+
+
+def _tasks_text(tasks: Iterable[str]) -> str:
+    return "; ".join([t.strip() for t in tasks if t.strip()])
+
+
+def new_note_fields(project: Optional[str], tasks: Iterable[str], note: Optional[str]) -> dict:
+    """Capture the fields of a new note in the caller's environment.
+
+    Username, host and directory come from the calling process (with the
+    privacy settings applied), so this must run on the client side when the
+    note is stored by the daemon.
+    """
+    username, host, directory = _system_fields()
+    return {
+        "username": username,
+        "host": host,
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "project": project,
+        "tasks": _tasks_text(tasks),
+        "notes": note,
+        "directory": directory,
+    }
+
+
+def _hidden_verifier(conn: sqlite3.Connection, hidden: bool, password: Optional[str]) -> Optional[int]:
+    """Return the verifier id a new note should reference (inside the caller's transaction)."""
+    if not (hidden and password):
+        return None
+    from passwords import get_or_create_verifier
+
+    return get_or_create_verifier(conn, password)
+
+
+def _note_row(fields: dict, hidden: bool, verifier_id: Optional[int]) -> tuple:
+    return (
+        fields["username"],
+        fields["host"],
+        fields["timestamp"],
+        fields["project"],
+        fields["tasks"],
+        fields["notes"],
+        fields["directory"],
+        1 if hidden else 0,
+        verifier_id,
+        None if fields["directory"] is None else dir_key(fields["directory"]),
+    )
+
+
+INSERT_TASK_SQL = "INSERT INTO note_tasks (note_id, position, task) VALUES (?, ?, ?)"
+
+
+def _insert_notes(conn: sqlite3.Connection, cur: sqlite3.Cursor, entries: list) -> int:
+    """Insert (fields, hidden, password) entries inside the caller's transaction.
 
-def hash_password(password: str) -> str:
-    """Simple SHA-256 hash for password protection."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    Each non-hidden note also gets its `note_tasks` rows here, so a note and
+    its task index entries are committed together. Repeated passwords reuse
+    one verifier search.
+    """
+    verifiers: dict[str, Optional[int]] = {}
+    task_rows = []
+    for fields, hidden, password in entries:
+        verifier_id = None
+        if hidden:
+            if password not in verifiers:
+                verifiers[password] = _hidden_verifier(conn, hidden, password)
+            verifier_id = verifiers[password]
+        spool_id = fields.get("spool_id")
+        if spool_id is None:
+            cur.execute(INSERT_NOTE_SQL, _note_row(fields, hidden, verifier_id))
+        else:
+            cur.execute(INSERT_SPOOLED_NOTE_SQL, _note_row(fields, hidden, verifier_id) + (spool_id,))
+        if not hidden:
+            note_id = cur.lastrowid
+            task_rows.extend((note_id, pos, task) for pos, task in enumerate(split_tasks(fields["tasks"])))
+    cur.executemany(INSERT_TASK_SQL, task_rows)
+    return len(entries)
+
+
+def _insert_spooled(conn: sqlite3.Connection, cur: sqlite3.Cursor, records: list[dict]) -> int:
+    """Insert spooled records not stored yet (by spool_id); return how many were new."""
+    marks = ", ".join("?" * len(records))
+    stored = {
+        row[0]
+        for row in cur.execute(
+            f"SELECT spool_id FROM notes WHERE spool_id IN ({marks})", [r["spool_id"] for r in records]
+        )
+    }
+    return _insert_notes(conn, cur, [(r, False, None) for r in records if r["spool_id"] not in stored])
 
 
 def add_note(
@@ -58,39 +219,978 @@ def add_note(
     db_path: Optional[str] = None,
     hidden: bool = False,
     password: Optional[str] = None,
+    spool: Optional[bool] = None,
 ) -> None:
-    privacy_level = os.environ.get("NOTES_PRIVACY_LEVEL", "full").lower()
-    
-    if privacy_level == "minimal":
-        username = "user"
-        host = "host"
-        directory = "/redacted"
-    else:
-        username = getpass.getuser() if not os.environ.get("NOTES_HIDE_USERNAME") else "user"
-        host = socket.gethostname() if not os.environ.get("NOTES_HIDE_HOST") else "host"
-        directory = os.getcwd() if not os.environ.get("NOTES_HIDE_DIR") else "/redacted"
+    """Store one note; with `spool` (default: NOTES_SPOOL) append it to the spool instead.
+
+    Hidden notes are never spooled, so their password is not written to disk.
+    """
+    import spool as spool_file
 
-    ts = datetime.datetime.utcnow().isoformat() + "Z"
-    tasks_text = "; ".join([t.strip() for t in tasks if t.strip()])
+    fields = new_note_fields(project, tasks, note)
+
+    if not hidden and spool_file.enabled(spool):
+        path = spool_file.spool_path_for(db_path or USER_DB)
+        try:
+            spool_file.append(path, fields)
+        except OSError as e:
+            print(f"Error: cannot write spool: {e}", file=sys.stderr)
+            sys.exit(2)
+        print(f"Spooled note for user '{fields['username']}' to {path}")
+        return
 
     try:
-        conn, used_path = get_db_connection(db_path)
+        store = NotesStore(db_path)
     except RuntimeError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(2)
 
-    pw_hash = hash_password(password) if hidden and password else None
+    with store:
+        try:
+            store.add_fields(fields, hidden, password)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+    print(f"Saved note for user '{fields['username']}' to {store.path}")
+
 
+def flush_notes(db_path: Optional[str] = None, batch_size: int = 500) -> None:
+    """Move the notes spooled by `add --spool` into the database."""
     try:
+        store = NotesStore(db_path, flush_spool=False)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        try:
+            added = store.flush_spool(batch_size)
+        except (sqlite3.OperationalError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+    print(f"Flushed {added} spooled notes into {store.path}")
+
+
+NOTE_COLUMNS = "id, username, host, timestamp, project, tasks, notes, directory, is_hidden, ts_epoch_ms"
+
+
+def _unlock(conn: sqlite3.Connection, show_hidden: bool, password: Optional[str]) -> Optional[int]:
+    """Return the verifier id whose hidden notes the caller may see, if any."""
+    # show_hidden without a (matching) password only shows non-hidden notes
+    if not (show_hidden and password):
+        return None
+    from passwords import unlock
+
+    with tracing.phase("unlock"):
+        return unlock(conn, password)
+
+
+def _visibility_branches(verifier_id: Optional[int]) -> list[tuple[list[str], list]]:
+    """Return one (conditions, params) branch per group of notes the caller may see."""
+    branches = [(["is_hidden = 0"], [])]
+    if verifier_id is not None:
+        branches.append((["is_hidden = 1", "verifier_id = ?"], [verifier_id]))
+    return branches
+
+
+def _visibility_conditions(verifier_id: Optional[int]) -> tuple[list[str], list]:
+    """Return the visibility branches folded into a single WHERE fragment."""
+    branches = _visibility_branches(verifier_id)
+    cond = " OR ".join("(" + " AND ".join(conds) + ")" for conds, _ in branches)
+    params = [p for _, branch_params in branches for p in branch_params]
+    return [f"({cond})"], params
+
+
+def _filter_conditions(
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    task: Optional[str] = None,
+    schema: str = "main",
+    directory_prefix: Optional[str] = None,
+) -> tuple[list[str], list]:
+    conds = []
+    params = []
+    if user:
+        conds.append("username = ?")
+        params.append(user)
+    if project:
+        conds.append("project = ?")
+        params.append(project)
+    if directory:
+        conds.append("dir_key = ?")
+        params.append(dir_key(directory))
+    if directory_prefix:
+        # The subtree is the key range [prefix/, prefix0): '0' follows '/'.
+        key = dir_key(directory_prefix)
+        conds.append("dir_key >= ? AND dir_key < ?")
+        params += [key, key[:-1] + "0"]
+    if task:
+        # Answered from idx_note_tasks_task, then by rowid.
+        tasks_table = "note_tasks" if schema == "main" else f"{schema}.note_tasks"
+        conds.append(f"id IN (SELECT note_id FROM {tasks_table} WHERE task = ?)")
+        params.append(task)
+    return conds, params
+
+
+def _select_notes(
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    verifier_id: Optional[int],
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    before: Optional[tuple[int, int]] = None,
+    after: Optional[tuple[int, int]] = None,
+    task: Optional[str] = None,
+    schemas: tuple[str, ...] = ("main",),
+    directory_prefix: Optional[str] = None,
+) -> tuple[str, list]:
+    """Build an unordered SELECT of the notes matching the filters.
+
+    `since`/`until` are epoch milliseconds and `before`/`after` are
+    (ts_epoch_ms, id) keyset bounds; because every index ends in ts_epoch_ms
+    (and implicitly id), they all become index range scans.
+
+    Each visibility branch is a separate SELECT so that every branch can walk
+    a `(column, ts_epoch_ms)` index in order; the UNION ALL is then merged
+    without a sort. When a user/project/directory filter is present the
+    visibility terms are written as `+column` so SQLite drives the scan from
+    the more selective filter index instead.
+
+    `schemas` lists the attached databases to read; ("main", "archive")
+    adds the same branches over the archive. `directory_prefix` matches
+    that directory and everything below it as a range on idx_notes_dir_key_ms;
+    those rows come back in directory order, so ordering them costs a sort
+    of the matches only.
+    """
+    range_conds = []
+    range_params = []
+    if since:
+        range_conds.append("ts_epoch_ms >= ?")
+        range_params.append(since)
+    if until:
+        range_conds.append("ts_epoch_ms < ?")
+        range_params.append(until)
+    if before:
+        range_conds.append("(ts_epoch_ms, id) < (?, ?)")
+        range_params.extend(before)
+    if after:
+        range_conds.append("(ts_epoch_ms, id) > (?, ?)")
+        range_params.extend(after)
+
+    selects = []
+    params: list = []
+    for schema in schemas:
+        table = "notes" if schema == "main" else f"{schema}.notes"
+        filter_conds, filter_params = _filter_conditions(user, project, directory, task, schema, directory_prefix)
+        for conds, branch_params in _visibility_branches(verifier_id):
+            if filter_conds:
+                conds = ["+" + c for c in conds]
+            selects.append(
+                f"SELECT {NOTE_COLUMNS} FROM {table} WHERE " + " AND ".join(conds + filter_conds + range_conds)
+            )
+            params += branch_params + filter_params + range_params
+    return " UNION ALL ".join(selects), params
+
+
+def _list_query(
+    limit: int,
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    verifier_id: Optional[int],
+    before: Optional[tuple[int, int]] = None,
+    after: Optional[tuple[int, int]] = None,
+    task: Optional[str] = None,
+    schemas: tuple[str, ...] = ("main",),
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    directory_prefix: Optional[str] = None,
+) -> tuple[str, list]:
+    """Build the SQL behind `list`.
+
+    Returns the newest `limit` matching notes, or with `after` the `limit`
+    notes immediately newer than that position, oldest first.
+    """
+    q, params = _select_notes(
+        user,
+        project,
+        directory,
+        verifier_id,
+        since,
+        until,
+        before=before,
+        after=after,
+        task=task,
+        schemas=schemas,
+        directory_prefix=directory_prefix,
+    )
+    q += " ORDER BY ts_epoch_ms, id LIMIT ?" if after else " ORDER BY ts_epoch_ms DESC, id DESC LIMIT ?"
+    params.append(limit)
+    return q, params
+
+
+def _newer_query(
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    verifier_id: Optional[int],
+    task: Optional[str] = None,
+    directory_prefix: Optional[str] = None,
+) -> tuple[str, list]:
+    """Build the SQL behind `watch`: matching notes with id > ?, oldest first, LIMIT ?.
+
+    The caller appends the last seen id and the limit to the parameters.
+    Ids are AUTOINCREMENT, so every note committed later has a higher id,
+    even one added after the newest note was removed.
+    NOT INDEXED keeps the planner off the filter indexes, so the scan is a
+    rowid range that only touches notes added since the last poll.
+    """
+    visibility_conds, visibility_params = _visibility_conditions(verifier_id)
+    filter_conds, filter_params = _filter_conditions(user, project, directory, task, directory_prefix=directory_prefix)
+    where = " AND ".join(visibility_conds + filter_conds + ["id > ?"])
+    return (
+        f"SELECT {NOTE_COLUMNS} FROM notes NOT INDEXED WHERE {where} ORDER BY id LIMIT ?",
+        visibility_params + filter_params,
+    )
+
+
+def _parse_page_token(token: str) -> tuple[int, int]:
+    """Parse a `<ts_epoch_ms>,<id>` continuation token printed by `list`.
+
+    An ISO-8601 timestamp is accepted in place of the milliseconds.
+    """
+    ts, sep, id_ = token.rpartition(",")
+    if not sep or not ts or not id_.isdigit():
+        raise ValueError(f"invalid page token '{token}' (expected <ts_epoch_ms>,<id>)")
+    if ts.isdigit():
+        return int(ts), int(id_)
+    return _epoch_ms(_parse_iso(ts)), int(id_)
+
+
+def _fts_query(text: str) -> str:
+    """Turn search text into an FTS5 query in which every term is a string.
+
+    Bare terms are quoted, so `deploy-prod`, `nginx.service` or `C++` are
+    matched as words instead of being parsed as FTS5 operators or column
+    filters. A `"quoted phrase"` (with `""` for a literal quote, as in FTS5)
+    and a trailing `*` for a prefix are kept as written.
+    """
+    terms = []
+    i, n = 0, len(text)
+    while i < n:
+        if text[i].isspace():
+            i += 1
+            continue
+        if text[i] == '"':
+            j = i + 1
+            while j < n and (text[j] != '"' or text[j + 1:j + 2] == '"'):
+                j += 2 if text[j] == '"' else 1
+            # An unterminated phrase runs to the end of the text.
+            phrase, i = text[i + 1:j], j + 1
+            prefix = text[i:i + 1] == "*"
+            i += prefix
+        else:
+            j = i
+            while j < n and not text[j].isspace():
+                j += 1
+            phrase, i = text[i:j], j
+            prefix = phrase.endswith("*")
+            phrase = phrase.rstrip("*").replace('"', '""')
+        if phrase:
+            terms.append(f'"{phrase}"' + ("*" if prefix else ""))
+    # No terms matches nothing, like an empty phrase.
+    return " ".join(terms) or '""'
+
+
+def _is_fts_syntax_error(exc: sqlite3.OperationalError) -> bool:
+    return str(exc).startswith(("fts5:", "unterminated string", "unknown special query"))
+
+
+class _ChunkedWriter:
+    """Collect small writes and pass them to `out` in large chunks."""
+
+    def __init__(self, out: IO[str], chunk_size: int = 1 << 16):
+        self.out = out
+        self.chunk_size = chunk_size
+        self.parts: list[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.parts:
+            self.out.write("".join(self.parts))
+            self.parts.clear()
+            self.size = 0
+        self.out.flush()
+
+
+def _write_text(notes: Iterable[Note], out) -> None:
+    empty = True
+    for note in notes:
+        out.write(str(note))
+        empty = False
+    if empty:
+        out.write("No notes found.\n")
+
+
+def _write_json(notes: Iterable[Note], out) -> None:
+    import json
+
+    # A JSON array, written incrementally so nothing is held in memory.
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    sep = "\n"
+    out.write("[")
+    for note in notes:
+        out.write(sep)
+        out.write(encode(note.to_dict()))
+        sep = ",\n"
+    out.write("\n]\n")
+
+
+def _write_tsv(notes: Iterable[Note], out) -> None:
+    import csv
+
+    writer = csv.writer(out, delimiter="\t", lineterminator="\n")
+    writer.writerow(Note.__slots__)
+    hidden = Note.__slots__.index("is_hidden")
+    for note in notes:
+        row = [getattr(note, f) for f in Note.__slots__]
+        # 0/1, as `export -f tsv` writes it, rather than True/False.
+        row[hidden] = int(note.is_hidden)
+        writer.writerow(row)
+
+
+# Output formats for `list`/`list-dir`: name -> writer(notes, out).
+FORMATTERS = {
+    "text": _write_text,
+    "json": _write_json,
+    "tsv": _write_tsv,
+}
+
+
+class _PageTracker:
+    """Pass notes through while remembering how many there were and the ends."""
+
+    def __init__(self, notes: Iterable[Note]):
+        self.notes = notes
+        self.count = 0
+        self.first: Optional[Note] = None
+        self.last: Optional[Note] = None
+
+    def __iter__(self) -> Iterator[Note]:
+        for note in self.notes:
+            if self.first is None:
+                self.first = note
+            self.last = note
+            self.count += 1
+            yield note
+
+
+def _parse_page_tokens(
+    before: Optional[str], after: Optional[str]
+) -> tuple[Optional[tuple[int, int]], Optional[tuple[int, int]]]:
+    if before and after:
+        raise ValueError("use either --before or --after, not both")
+    return (
+        _parse_page_token(before) if before else None,
+        _parse_page_token(after) if after else None,
+    )
+
+
+def _iter_cursor(cur: sqlite3.Cursor, chunk_size: int) -> Iterator:
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _iter_page(
+    conn: sqlite3.Connection,
+    limit: Optional[int],
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    verifier_id: Optional[int],
+    before_key: Optional[tuple[int, int]],
+    after_key: Optional[tuple[int, int]],
+    chunk_size: int = 1000,
+    task: Optional[str] = None,
+    archived_before: Optional[int] = None,
+    attach: Optional[Callable[[], None]] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    directory_prefix: Optional[str] = None,
+) -> Iterator[Note]:
+    """Yield one page of notes, newest first, reading the cursor in chunks.
+
+    `archived_before` is the archive boundary (epoch ms) when there is an
+    archive: every archived note is older than it, so the archive is only
+    attached (by calling `attach`) and read once the page reaches past that
+    point.
+    """
+
+    def run(limit, before_key, after_key, schemas) -> sqlite3.Cursor:
+        if len(schemas) > 1 and attach is not None:
+            attach()
+        # LIMIT -1 means no limit in SQLite.
+        q, params = _list_query(
+            -1 if limit is None else limit,
+            user,
+            project,
+            directory,
+            verifier_id,
+            before_key,
+            after_key,
+            task,
+            schemas,
+            since,
+            until,
+            directory_prefix,
+        )
         cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO notes (username, host, timestamp, project, tasks, notes, directory, is_hidden, password_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (username, host, ts, project, tasks_text, note, directory, 1 if hidden else 0, pw_hash),
+        cur.row_factory = _note_factory
+        return cur.execute(q, params)
+
+    if archived_before is not None and since is not None and since >= archived_before:
+        archived_before = None
+
+    if after_key:
+        reaches_archive = archived_before is not None and after_key[0] < archived_before
+        # Rows arrive oldest first; a page is bounded by `limit`, so flip it in memory.
+        yield from reversed(run(limit, None, after_key, ("main", "archive") if reaches_archive else ("main",)).fetchall())
+        return
+
+    yielded = 0
+    last = None
+    cur = run(limit, before_key, None, ("main",))
+    for note in _iter_cursor(cur, chunk_size):
+        if archived_before is not None and note.ts_epoch_ms < archived_before:
+            break
+        yield note
+        yielded += 1
+        last = note
+    cur.close()
+    if archived_before is None or (limit is not None and yielded >= limit):
+        return
+
+    # The rest of the page may interleave hot and archived notes: continue
+    # from the last note shown over both databases.
+    key = (last.ts_epoch_ms, last.id) if last else before_key
+    remaining = None if limit is None else limit - yielded
+    yield from _iter_cursor(run(remaining, key, None, ("main", "archive")), chunk_size)
+
+
+def _write_page(
+    notes: Iterable[Note],
+    limit: Optional[int],
+    paging_back: bool,
+    fmt: str,
+    out: IO[str],
+    token_out: IO[str],
+) -> None:
+    """Render a page of notes plus the continuation token when the page is full.
+
+    `paging_back` is true for pages requested with `--after`.
+    The token goes to `token_out` for machine-readable formats so it does
+    not corrupt their output.
+    """
+    page = _PageTracker(notes)
+    writer = _ChunkedWriter(out)
+    FORMATTERS[fmt](page, writer)
+    writer.flush()
+    if page.count and page.count == limit:
+        if fmt == "text":
+            token_out = out
+        if paging_back:
+            token_out.write(f"Newer notes: --after {page.first.ts_epoch_ms},{page.first.id}\n")
+        else:
+            token_out.write(f"More notes: --before {page.last.ts_epoch_ms},{page.last.id}\n")
+
+
+class NotesStore:
+    """A notes database held open for repeated operations.
+
+    Unlike the module-level functions, which open the database per call and
+    exit the process on errors, a store keeps one connection (and with it
+    sqlite3's per-connection statement cache, which the fixed SQL strings
+    below always hit) and raises instead: RuntimeError when the database
+    cannot be opened, ValueError for invalid arguments and sqlite3.Error for
+    database failures.
+
+        with NotesStore() as store:
+            store.add_many({"project": "Infra", "tasks": [t]} for t in tasks)
+            for note in store.query(project="Infra", limit=10):
+                print(note)
+    """
+
+    def __init__(self, db_path: Optional[str] = None, flush_spool: bool = True):
+        self.conn, self.path = get_db_connection(db_path)
+        # Set once the archive database is attached as schema `archive`.
+        self.archive_path: Optional[str] = None
+        if flush_spool:
+            # Notes spooled by `add` become visible to whoever opens the database next.
+            self._try_flush_spool()
+
+    def __enter__(self) -> "NotesStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add(
+        self,
+        project: Optional[str],
+        tasks: Iterable[str],
+        note: Optional[str] = None,
+        hidden: bool = False,
+        password: Optional[str] = None,
+    ) -> int:
+        """Store one note from the calling environment; return its id."""
+        return self.add_fields(new_note_fields(project, tasks, note), hidden, password)
+
+    def add_fields(self, fields: dict, hidden: bool = False, password: Optional[str] = None) -> int:
+        """Store one note given as `new_note_fields` output; return its id."""
+        self.insert_entries([(fields, hidden, password)])
+        return self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def add_many(self, notes: Iterable[dict]) -> int:
+        """Store many notes in a single transaction; return how many were stored.
+
+        Each note is a dict with `tasks` (list or `;`-separated string) and
+        optionally `project`, `notes`, `hidden` and `password`. Username, host
+        and directory are captured once for the whole batch.
+        """
+        flags = _privacy_flags()
+        username, host, directory = _system_fields(flags=flags)
+        entries = []
+        for number, note in enumerate(notes, 1):
+            tasks = note.get("tasks") or []
+            if isinstance(tasks, str):
+                tasks = tasks.split(";")
+            fields = {
+                "username": username,
+                "host": host,
+                "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+                "project": note.get("project"),
+                "tasks": _tasks_text(tasks),
+                "notes": note.get("notes"),
+                "directory": directory,
+            }
+            if not fields["tasks"]:
+                raise ValueError(f"note {number}: at least one task is required")
+            entries.append((fields, bool(note.get("hidden")), note.get("password")))
+        return self.insert_entries(entries)
+
+    def insert_entries(self, entries: list[tuple[dict, bool, Optional[str]]]) -> int:
+        """Insert (fields, hidden, password) entries in one transaction."""
+        for fields, hidden, password in entries:
+            if hidden and not password:
+                raise ValueError("password required for hidden note")
+        return run_with_retry(self.conn, lambda cur: _insert_notes(self.conn, cur, entries))
+
+    def flush_spool(self, batch_size: int = 500) -> int:
+        """Insert the notes `add` spooled for this database; return how many were new.
+
+        Each batch is one transaction; records already stored (by spool_id)
+        are skipped, so an interrupted flush can be repeated safely.
+        """
+        import spool
+
+        path = spool.spool_path_for(self.path)
+        if not spool.pending(path):
+            return 0
+        added = 0
+
+        def apply(records: list[dict]) -> None:
+            nonlocal added
+            added += run_with_retry(self.conn, lambda cur: _insert_spooled(self.conn, cur, records))
+
+        with tracing.phase("flush_spool"):
+            spool.drain(path, apply, batch_size)
+        return added
+
+    def _try_flush_spool(self) -> int:
+        try:
+            return self.flush_spool()
+        except (sqlite3.OperationalError, OSError):
+            # Busy or unreadable: the spool stays put for the next flush.
+            return 0
+
+    def _attach_archive(self) -> None:
+        if self.archive_path is None:
+            self.archive_path = attach_archive(self.conn, self.path)
+
+    def archived_before(self) -> Optional[int]:
+        """Return the archive boundary in epoch ms: every archived note is older. None without an archive."""
+        row = self.conn.execute("SELECT value FROM notes_meta WHERE key = 'archived_before'").fetchone()
+        return int(row[0]) if row else None
+
+    def _schemas(self) -> tuple[str, ...]:
+        """Return the schemas holding notes, attaching the archive if there is one."""
+        if self.archived_before() is None:
+            return ("main",)
+        self._attach_archive()
+        return ("main", "archive")
+
+    def query(
+        self,
+        limit: Optional[int] = None,
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        directory: Optional[str] = None,
+        show_hidden: bool = False,
+        password: Optional[str] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        task: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        directory_prefix: Optional[str] = None,
+    ) -> Iterator[Note]:
+        """Return a lazy iterator over matching notes, newest first (see `list_notes`)."""
+        before_key, after_key = _parse_page_tokens(before, after)
+        since_ms = _epoch_ms(_parse_time_bound(since)) if since else None
+        until_ms = _epoch_ms(_parse_time_bound(until)) if until else None
+        verifier_id = _unlock(self.conn, show_hidden, password)
+        return _iter_page(
+            self.conn,
+            limit,
+            user,
+            project,
+            directory,
+            verifier_id,
+            before_key,
+            after_key,
+            task=task,
+            archived_before=self.archived_before(),
+            attach=self._attach_archive,
+            since=since_ms,
+            until=until_ms,
+            directory_prefix=directory_prefix,
+        )
+
+    def watch(
+        self,
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        directory: Optional[str] = None,
+        show_hidden: bool = False,
+        password: Optional[str] = None,
+        task: Optional[str] = None,
+        directory_prefix: Optional[str] = None,
+        backlog: int = 10,
+        min_interval: float = 0.1,
+        max_interval: float = 2.0,
+        batch_size: int = 500,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> Iterator[list[Note]]:
+        """Yield the newest `backlog` matches, then every matching note added later, oldest first.
+
+        Each yield is one batch of new notes. Between batches it polls
+        `PRAGMA data_version`, which changes only when another connection
+        commits, and queries only when it did. The poll interval starts at
+        `min_interval` and doubles while nothing changes, up to `max_interval`.
+        """
+        import time
+
+        sleep = sleep or time.sleep
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("poll intervals must satisfy 0 < min_interval <= max_interval")
+        verifier_id = _unlock(self.conn, show_hidden, password)
+        q, params = _newer_query(user, project, directory, verifier_id, task, directory_prefix)
+        last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if backlog > 0:
+            notes = list(
+                self.query(backlog, user, project, directory, show_hidden, password, task=task,
+                           directory_prefix=directory_prefix)
+            )
+            if notes:
+                notes.reverse()
+                last_id = max(last_id, max(note.id for note in notes))
+                yield notes
+
+        interval = min_interval
+        while True:
+            sleep(interval)
+            # Our own commits (a spool flush) do not change data_version.
+            flushed = self._try_flush_spool()
+            current = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if current == version and not flushed:
+                interval = min(interval * 2, max_interval)
+                continue
+            version = current
+            interval = min_interval
+            while True:
+                cur = self.conn.cursor()
+                cur.row_factory = _note_factory
+                notes = cur.execute(q, params + [last_id, batch_size]).fetchall()
+                if notes:
+                    last_id = notes[-1].id
+                    yield notes
+                if len(notes) < batch_size:
+                    break
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        directory: Optional[str] = None,
+        show_hidden: bool = False,
+        password: Optional[str] = None,
+    ) -> list[Note]:
+        """Return the best FTS5 matches for the search text `query` (see `search_notes`).
+
+        Archived notes are searched only when the hot database has fewer
+        than `limit` matches; they are ranked after the hot matches.
+        """
+        verifier_id = _unlock(self.conn, show_hidden, password)
+        visibility_conds, visibility_params = _visibility_conditions(verifier_id)
+        filter_conds, filter_params = _filter_conditions(user, project, directory)
+        # Neither filter touches a column name that notes_fts also defines.
+        where = " AND ".join(["notes_fts MATCH ?"] + visibility_conds + filter_conds)
+        match = _fts_query(query)
+        notes: list[Note] = []
+        for schema in ("main", "archive"):
+            if schema == "archive":
+                if len(notes) >= limit or self.archived_before() is None:
+                    break
+                self._attach_archive()
+            prefix = "" if schema == "main" else f"{schema}."
+            cur = self.conn.cursor()
+            cur.row_factory = _note_factory
+            cur.execute(
+                "SELECT n.id, n.username, n.host, n.timestamp, n.project, n.tasks, n.notes, n.directory, n.is_hidden, "
+                "n.ts_epoch_ms "
+                f"FROM {prefix}notes_fts JOIN {prefix}notes n ON n.id = notes_fts.rowid "
+                f"WHERE {where} ORDER BY notes_fts.rank LIMIT ?",
+                [match] + visibility_params + filter_params + [limit - len(notes)],
+            )
+            notes += cur.fetchall()
+        return notes
+
+    def top_tasks(self, limit: int = 10) -> list[tuple[str, int]]:
+        """Return the `limit` most frequent tasks of non-hidden notes as (task, count)."""
+        # Covering scans of idx_note_tasks_task; the tables themselves are never read.
+        counts = " UNION ALL ".join(
+            f"SELECT task, COUNT(*) AS n FROM {'note_tasks' if schema == 'main' else schema + '.note_tasks'} GROUP BY task"
+            for schema in self._schemas()
+        )
+        return self.conn.execute(
+            f"SELECT task, SUM(n) AS total FROM ({counts}) GROUP BY task ORDER BY total DESC, task LIMIT ?", (limit,)
+        ).fetchall()
+
+    def stats(
+        self, by: str = "project", since: Optional[str] = None, until: Optional[str] = None
+    ) -> list[tuple[str, int]]:
+        """Return (group, count) pairs of non-hidden notes, read from note_rollups (and the archive's)."""
+        q, params = _stats_query(by, since, until, self._schemas())
+        return self.conn.execute(q, params).fetchall()
+
+    def rebuild_stats(self) -> None:
+        rebuild_rollups(self.conn)
+        if len(self._schemas()) > 1:
+            archive = sqlite3.connect(self.archive_path)
+            try:
+                rebuild_rollups(archive)
+            finally:
+                archive.close()
+
+    def _older_than(self, cutoff: int, project: Optional[str]) -> tuple[str, list]:
+        if project:
+            return "project = ? AND ts_epoch_ms < ?", [project, cutoff]
+        # is_hidden IN (0, 1) lets idx_notes_hidden_ms serve the range.
+        return "is_hidden IN (0, 1) AND ts_epoch_ms < ?", [cutoff]
+
+    def count_older(self, cutoff: int, project: Optional[str] = None) -> int:
+        cond, params = self._older_than(cutoff, project)
+        return sum(
+            self.conn.execute(f"SELECT COUNT(*) FROM {schema}.notes WHERE {cond}", params).fetchone()[0]
+            for schema in self._schemas()
+        )
+
+    def prune(self, cutoff: int, project: Optional[str] = None, batch_size: int = 500) -> tuple[int, int]:
+        """Delete notes older than `cutoff` in transactions of at most `batch_size` rows.
+
+        Returns (notes deleted, batches). Short transactions keep the write
+        lock free for other writers between batches. Archived notes are
+        pruned as well.
+        """
+        cond, params = self._older_than(cutoff, project)
+        return self._delete_in_batches([(cond, params)], batch_size)
+
+    def _delete_in_batches(self, conditions: Iterable[tuple[str, list]], batch_size: int) -> tuple[int, int]:
+        """Delete the notes matching each (condition, params), `batch_size` rows per transaction.
+
+        Returns (notes deleted, batches), counting notes rows only (not the
+        index rows the delete triggers remove with them).
+        """
+        deleted = batches = 0
+        schemas = self._schemas()
+        for cond, params in conditions:
+            for schema in schemas:
+                q = f"DELETE FROM {schema}.notes WHERE id IN (SELECT id FROM {schema}.notes WHERE {cond} LIMIT ?)"
+                while True:
+                    n = run_with_retry(self.conn, lambda cur: cur.execute(q, params + [batch_size]).rowcount)
+                    deleted += n
+                    if n == 0:
+                        break
+                    batches += 1
+                    if n < batch_size:
+                        break
+        return deleted, batches
+
+    def count_matching(
+        self,
+        id_ranges: Iterable[tuple[int, int]] = (),
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        directory: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> int:
+        """Count the notes `remove_matching` would delete (hidden and archived included)."""
+        schemas = self._schemas()
+        return sum(
+            self.conn.execute(f"SELECT COUNT(*) FROM {schema}.notes WHERE {cond}", params).fetchone()[0]
+            for cond, params in _removal_conditions(list(id_ranges), user, project, directory, since, until)
+            for schema in schemas
+        )
+
+    def remove_matching(
+        self,
+        id_ranges: Iterable[tuple[int, int]] = (),
+        user: Optional[str] = None,
+        project: Optional[str] = None,
+        directory: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        batch_size: int = 500,
+    ) -> tuple[int, int]:
+        """Delete notes in the inclusive `id_ranges` that match every filter; return (deleted, batches).
+
+        `since`/`until` are epoch ms. With no ranges the filters alone select
+        the notes; at least one of the two must be given. Each batch is a
+        set-based DELETE of at most `batch_size` notes in its own transaction.
+        """
+        ranges = list(id_ranges)
+        if not ranges and not (user or project or directory or since is not None or until is not None):
+            raise ValueError("give note ids or at least one filter")
+        return self._delete_in_batches(
+            _removal_conditions(ranges, user, project, directory, since, until), batch_size
+        )
+
+    def archive(self, cutoff: int, batch_size: int = 500) -> tuple[int, int]:
+        """Move notes older than `cutoff` (epoch ms) into the archive database in batches.
+
+        Returns (notes moved, batches). Each batch copies the notes and their
+        task rows into the archive, then deletes them here. Both databases
+        are in WAL mode, where SQLite does not commit attached databases
+        atomically, so a crash can leave a batch in both files. Note ids are
+        never reused (AUTOINCREMENT), so an archived id is the same note: the
+        copy skips it and the delete removes the leftover, and repeating an
+        interrupted run converges.
+        """
+        self._attach_archive()
+        columns = ", ".join(row[1] for row in self.conn.execute("PRAGMA main.table_info(notes)"))
+        # Legacy SHA-256 hidden notes stay until unlock() migrates them.
+        select_ids = (
+            "SELECT id FROM notes WHERE is_hidden IN (0, 1) AND ts_epoch_ms < ? "
+            "AND (password_hash IS NULL OR verifier_id IS NOT NULL) LIMIT ?"
+        )
+
+        def move(cur: sqlite3.Cursor) -> int:
+            cur.execute(
+                "INSERT INTO notes_meta (key, value) VALUES ('archived_before', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = max(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))",
+                (cutoff,),
+            )
+            ids = [row[0] for row in cur.execute(select_ids, (cutoff, batch_size)).fetchall()]
+            if not ids:
+                return 0
+            marks = ", ".join("?" * len(ids))
+            cur.execute(
+                f"INSERT OR IGNORE INTO archive.notes ({columns}) SELECT {columns} FROM main.notes WHERE id IN ({marks})",
+                ids,
+            )
+            cur.execute(
+                "INSERT OR IGNORE INTO archive.note_tasks (note_id, position, task) "
+                f"SELECT note_id, position, task FROM main.note_tasks WHERE note_id IN ({marks})",
+                ids,
+            )
+            cur.execute(f"DELETE FROM main.notes WHERE id IN ({marks})", ids)
+            return len(ids)
+
+        moved = batches = 0
+        while True:
+            n = run_with_retry(self.conn, move)
+            moved += n
+            if n == 0:
+                break
+            batches += 1
+            if n < batch_size:
+                break
+        return moved, batches
+
+    def compact(self) -> int:
+        """Return free pages to the filesystem; return how many were released."""
+        return sum(incremental_vacuum(self.conn, schema=schema) for schema in self._schemas())
+
+    def remove_many(self, note_ids: Iterable[int]) -> int:
+        """Delete notes by id (hot or archived) in one transaction; return how many existed."""
+        ids = [(int(note_id),) for note_id in note_ids]
+        schemas = self._schemas()
+        return run_with_retry(
+            self.conn,
+            lambda cur: sum(
+                cur.executemany(f"DELETE FROM {schema}.notes WHERE id = ?", ids).rowcount for schema in schemas
+            ),
+        )
+
+
+def iter_notes(
+    limit: Optional[int] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    db_path: Optional[str] = None,
+    show_hidden: bool = False,
+    password: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    task: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    directory_prefix: Optional[str] = None,
+) -> Iterator[Note]:
+    """Lazily yield matching notes, newest first, as `Note` objects.
+
+    Takes the same filters as `list_notes`; `limit=None` yields every match.
+    Rows are fetched from the cursor in chunks as the caller iterates, and
+    the connection is closed when the generator is exhausted or closed.
+    Raises ValueError for a malformed page token and RuntimeError when the
+    database cannot be opened.
+    """
+    with NotesStore(db_path) as store:
+        yield from store.query(
+            limit, user, project, directory, show_hidden, password, before, after, task, since, until, directory_prefix
         )
-        conn.commit()
-        print(f"Saved note for user '{username}' to {used_path}")
-    finally:
-        conn.close()
 
 
 def list_notes(
@@ -101,60 +1201,361 @@ def list_notes(
     db_path: Optional[str] = None,
     show_hidden: bool = False,
     password: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fmt: str = "text",
+    task: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    directory_prefix: Optional[str] = None,
 ) -> None:
+    """Print the newest matching notes, one keyset page at a time.
+
+    `before`/`after` take the `<ts_epoch_ms>,<id>` token printed under a full
+    page, so page N costs the same as page 1 and stays stable while new
+    notes are added. `fmt` is one of FORMATTERS. `task` keeps notes that
+    contain exactly that task (hidden notes' tasks are not indexed).
+    `since`/`until` take ISO-8601 or an age such as `7d`.
+    `directory_prefix` keeps notes recorded in that directory or below it.
+    """
     try:
-        conn, _ = get_db_connection(db_path)
+        store = NotesStore(db_path)
     except RuntimeError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(2)
 
+    with store:
+        try:
+            notes = store.query(
+                limit, user, project, directory, show_hidden, password, before, after, task, since, until, directory_prefix
+            )
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        # Rows are fetched lazily while rendering; the SQL lines of the trace split the two.
+        with tracing.phase("query+render"):
+            _write_page(notes, limit, bool(after), fmt, sys.stdout, sys.stderr)
+
+
+def watch_notes(
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    db_path: Optional[str] = None,
+    show_hidden: bool = False,
+    password: Optional[str] = None,
+    task: Optional[str] = None,
+    directory_prefix: Optional[str] = None,
+    backlog: int = 10,
+    fmt: str = "text",
+    min_interval: float = 0.1,
+    max_interval: float = 2.0,
+) -> None:
+    """Print the newest `backlog` matching notes, then each new one as it is committed (until Ctrl-C).
+
+    `fmt` is `text` or `json` (one object per line).
+    """
+    if fmt == "json":
+        import json
+
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+
+        def render(note: Note) -> str:
+            return encode(note.to_dict()) + "\n"
+    else:
+        render = str
+
     try:
-        cur = conn.cursor()
-        q = "SELECT id, username, host, timestamp, project, tasks, notes, directory, is_hidden, password_hash FROM notes"
-        conds = []
-        params = []
-        
-        if not show_hidden:
-            conds.append("is_hidden = 0")
-        elif password:
-            # We don't filter by password in SQL for simplicity in this demo, 
-            # we check it after fetching or we could filter by hash if we want.
-            # Filtering by hash is better if we have many notes.
-            conds.append("(is_hidden = 0 OR (is_hidden = 1 AND password_hash = ?))")
-            params.append(hash_password(password))
-        else:
-            # show_hidden is true but no password provided -> only show non-hidden
-            conds.append("is_hidden = 0")
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
 
-        
-        if user:
-            conds.append("username = ?")
-            params.append(user)
-        if project:
-            conds.append("project = ?")
-            params.append(project)
-        if directory:
-            conds.append("directory = ?")
-            params.append(directory)
-        
-        if conds:
-            q += " WHERE " + " AND ".join(conds)
-        q += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
-        
-        cur.execute(q, params)
-        rows = cur.fetchall()
-        
-        if not rows:
-            print("No notes found.")
-            return
-        
-        for row in rows:
-            id_, username, host, ts, proj, tasks, notes_text, direc, hidden_flag, pw_hash = row
-            note = Note(id_, username, host, ts, proj, tasks, notes_text, direc, bool(hidden_flag))
-            print(note, end="")
+    with store:
+        try:
+            batches = store.watch(
+                user, project, directory, show_hidden, password, task, directory_prefix, backlog, min_interval,
+                max_interval,
+            )
+            for notes in batches:
+                sys.stdout.write("".join(render(note) for note in notes))
+                sys.stdout.flush()
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        except KeyboardInterrupt:
+            pass
+
+
+def _read_dir_summary(conn: sqlite3.Connection, key: str, recursive: bool, schema: str = "main") -> tuple:
+    """Return (count, last_ts, last_note_id, schema) for `key` from one schema's dir_summary."""
+    if recursive:
+        cond, params = "directory >= ? AND directory < ?", [key, key[:-1] + "0"]
+    else:
+        cond, params = "directory = ?", [key]
+    count = conn.execute(f"SELECT COALESCE(SUM(count), 0) FROM {schema}.dir_summary WHERE {cond}", params).fetchone()[0]
+    last = conn.execute(
+        f"SELECT last_ts, last_note_id FROM {schema}.dir_summary WHERE {cond} "
+        "ORDER BY last_ts DESC, last_note_id DESC LIMIT 1",
+        params,
+    ).fetchone()
+    return (count,) + (last or (None, None)) + (schema,)
+
+
+def dir_summary(directory: str, recursive: bool = False, db_path: Optional[str] = None) -> dict:
+    """Return the note count and newest note recorded in `directory` (or below it with `recursive`).
+
+    Reads the trigger-maintained dir_summary table through a read-only
+    connection: no migrations, no writes and so no locks, which keeps it
+    cheap enough to run on every shell prompt. A missing database counts
+    as empty; one that predates the table is upgraded once through
+    NotesStore, and so is one with notes waiting in the add spool, which
+    are flushed first. Hidden notes are not counted.
+    """
+    path = db_path or USER_DB
+    key = dir_key(directory)
+    if pending_spools(spool_path_for(path)):
+        NotesStore(path).close()
+    try:
+        conn = open_db_readonly(path)
+    except sqlite3.OperationalError:
+        if not os.path.exists(path):
+            return {"directory": directory, "count": 0, "last_note_id": None, "last_timestamp": None,
+                    "last_tasks": None}
+        raise
+    try:
+        try:
+            parts = [_read_dir_summary(conn, key, recursive)]
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            conn.close()
+            conn = NotesStore(path, flush_spool=False).conn
+            parts = [_read_dir_summary(conn, key, recursive)]
+        archive = archive_path_for(path)
+        if os.path.exists(archive):
+            conn.execute("ATTACH DATABASE ? AS archive", (readonly_uri(archive),))
+            parts.append(_read_dir_summary(conn, key, recursive, "archive"))
+        count = sum(part[0] for part in parts)
+        newest = max((part for part in parts if part[2] is not None), key=lambda part: part[1:3], default=None)
+        last = None
+        if newest is not None:
+            last = conn.execute(
+                f"SELECT timestamp, tasks FROM {newest[3]}.notes WHERE id = ?", (newest[2],)
+            ).fetchone()
     finally:
         conn.close()
+    return {
+        "directory": directory,
+        "count": count,
+        "last_note_id": newest[2] if last else None,
+        "last_timestamp": last[0] if last else None,
+        "last_tasks": last[1] if last else None,
+    }
+
+
+def show_dir_summary(directory: str, recursive: bool = False, fmt: str = "text", db_path: Optional[str] = None) -> None:
+    """Print `dir_summary` as one line of text, one JSON object or a TSV row."""
+    try:
+        summary = dir_summary(directory, recursive, db_path)
+    except (sqlite3.Error, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    if fmt == "json":
+        import json
+
+        print(json.dumps(summary, ensure_ascii=False))
+        return
+    if fmt == "tsv":
+        import csv
+
+        writer = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+        writer.writerow(summary)
+        writer.writerow(summary.values())
+        return
+    where = "here and below" if recursive else "here"
+    line = f"{summary['count']} note{'' if summary['count'] == 1 else 's'} {where}"
+    if summary["last_tasks"] is not None:
+        line += f", last: {summary['last_tasks']} ({summary['last_timestamp']})"
+    print(line)
+
+
+def search_notes(
+    query: str,
+    limit: int = 20,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    db_path: Optional[str] = None,
+    show_hidden: bool = False,
+    password: Optional[str] = None,
+    rebuild: bool = False,
+) -> None:
+    """Full-text search over tasks and notes, best matches first.
+
+    Every term of `query` must match, punctuation and all (`deploy-prod`,
+    `v1.2`); `"restarted service"` matches a phrase and `deplo*` a prefix.
+    """
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        if rebuild:
+            rebuild_search_index(store.conn)
+        try:
+            notes = store.search(query, limit, user, project, directory, show_hidden, password)
+        except sqlite3.OperationalError as e:
+            if _is_fts_syntax_error(e):
+                print(f"Error: invalid search query: {e}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        writer = _ChunkedWriter(sys.stdout)
+        _write_text(notes, writer)
+        writer.flush()
+
+
+# Id ranges per DELETE condition, well under SQLite's bound-parameter limit.
+RANGES_PER_STATEMENT = 200
+
+
+def _parse_id_ranges(specs: Iterable[str]) -> list[tuple[int, int]]:
+    """Parse `12` and `100-250` arguments into sorted, merged inclusive id ranges."""
+    ranges = []
+    for spec in specs:
+        lo, sep, hi = str(spec).partition("-")
+        if not lo.isdigit() or (sep and not hi.isdigit()):
+            raise ValueError(f"invalid note id or range '{spec}' (expected e.g. 12 or 100-250)")
+        lo, hi = int(lo), int(hi) if sep else int(lo)
+        if lo > hi:
+            raise ValueError(f"invalid range '{spec}': start is greater than end")
+        ranges.append((lo, hi))
+    merged: list[tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def _removal_conditions(
+    id_ranges: list[tuple[int, int]],
+    user: Optional[str],
+    project: Optional[str],
+    directory: Optional[str],
+    since: Optional[int],
+    until: Optional[int],
+) -> Iterator[tuple[str, list]]:
+    """Yield (condition, params) pieces that together select the notes to remove."""
+    conds, params = _filter_conditions(user, project, directory)
+    if since is not None:
+        conds.append("ts_epoch_ms >= ?")
+        params.append(since)
+    if until is not None:
+        conds.append("ts_epoch_ms < ?")
+        params.append(until)
+    if not id_ranges:
+        if not (user or project or directory):
+            # is_hidden IN (0, 1) lets idx_notes_hidden_ms serve a bare time range.
+            conds.insert(0, "is_hidden IN (0, 1)")
+        yield " AND ".join(conds), params
+        return
+    # Rowid ranges, so each piece is a set of b-tree range seeks.
+    for start in range(0, len(id_ranges), RANGES_PER_STATEMENT):
+        chunk = id_ranges[start:start + RANGES_PER_STATEMENT]
+        id_cond = "(" + " OR ".join(["id BETWEEN ? AND ?"] * len(chunk)) + ")"
+        yield " AND ".join([id_cond] + conds), [v for r in chunk for v in r] + params
+
+
+def _remove_from_store(
+    store: "NotesStore",
+    specs: Iterable[str],
+    out: IO[str],
+    err: IO[str],
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    dry_run: bool = False,
+    batch_size: int = 500,
+) -> int:
+    """Run a `remove` request against `store`, writing its messages; return the exit code.
+
+    Shared by the CLI and the daemon so both print the same thing. Raises
+    ValueError for malformed ids, ranges, dates or batch sizes.
+    """
+    specs = [str(s) for s in specs]
+    ranges = _parse_id_ranges(specs)
+    if batch_size < 1:
+        raise ValueError("--batch-size must be positive")
+    since_ms = _epoch_ms(_parse_time_bound(since)) if since else None
+    until_ms = _epoch_ms(_parse_time_bound(until)) if until else None
+    filters = (ranges, user, project, directory, since_ms, until_ms)
+    if not any(filters):
+        raise ValueError("give note ids (e.g. 12 100-250) or a filter such as --project")
+    single = len(specs) == 1 and specs[0].isdigit() and not any(filters[1:])
+
+    if dry_run:
+        out.write(f"Would delete {store.count_matching(*filters)} notes\n")
+        return 0
+    deleted, batches = store.remove_matching(*filters, batch_size=batch_size)
+    if single:
+        if deleted == 0:
+            err.write(f"Error: Note with id {specs[0]} not found.\n")
+            return 1
+        out.write(f"Deleted note with id {specs[0]}\n")
+    elif deleted == 0:
+        err.write("Error: No matching notes found.\n")
+        return 1
+    else:
+        out.write(f"Deleted {deleted} notes in {batches} batches\n")
+    return 0
+
+
+def remove_notes(
+    specs: Iterable[str] = (),
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    db_path: Optional[str] = None,
+) -> None:
+    """Delete notes by id (`12`), id range (`100-250`) and/or filters, in bounded batches.
+
+    Ids and filters combine: with both, only listed notes that also match
+    the filters are removed. `since`/`until` take ISO-8601 or an age such
+    as `30d`. Hidden and archived notes are included.
+    """
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        try:
+            code = _remove_from_store(
+                store, specs, sys.stdout, sys.stderr, user, project, directory, since, until, dry_run, batch_size
+            )
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+    if code:
+        sys.exit(code)
 
 
 def remove_note(
@@ -162,20 +1563,602 @@ def remove_note(
     db_path: Optional[str] = None,
 ) -> None:
     try:
-        conn, used_path = get_db_connection(db_path)
+        store = NotesStore(db_path)
     except RuntimeError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(2)
 
+    with store:
+        try:
+            deleted = store.remove_many([note_id])
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    if deleted == 0:
+        print(f"Error: Note with id {note_id} not found.", file=sys.stderr)
+        sys.exit(1)
+    print(f"Deleted note with id {note_id}")
+
+
+def top_tasks(limit: int = 10, db_path: Optional[str] = None) -> None:
+    """Print the most frequent tasks across non-hidden notes."""
+    if limit < 1:
+        print("Error: --top must be positive.", file=sys.stderr)
+        sys.exit(1)
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-        
-        if cur.rowcount == 0:
-            print(f"Error: Note with id {note_id} not found.", file=sys.stderr)
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        rows = store.top_tasks(limit)
+    if not rows:
+        print("No tasks found.")
+        return
+    width = len(str(rows[0][1]))
+    for task, count in rows:
+        print(f"{count:>{width}}  {task}")
+
+
+_DURATION_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def _parse_duration(value: str) -> datetime.timedelta:
+    """Parse an age such as `90m`, `12h`, `180d` or `4w`."""
+    number, unit = value[:-1], value[-1:].lower()
+    if unit not in _DURATION_UNITS or not number.isdigit():
+        raise ValueError(f"invalid age '{value}' (expected e.g. 180d, 4w, 12h or 90m)")
+    return datetime.timedelta(**{_DURATION_UNITS[unit]: int(number)})
+
+
+def _db_size(path: str) -> int:
+    """Size of the database file plus its WAL, in bytes."""
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def prune_notes(
+    older_than: str,
+    project: Optional[str] = None,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    db_path: Optional[str] = None,
+) -> None:
+    """Delete notes older than `older_than` (e.g. `180d`) and reclaim the space."""
+    try:
+        age = _parse_duration(older_than)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if batch_size < 1:
+        print("Error: --batch-size must be positive.", file=sys.stderr)
+        sys.exit(1)
+    cutoff = datetime.datetime.utcnow() - age
+    scope = f" in project '{project}'" if project else ""
+
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        try:
+            if dry_run:
+                count = store.count_older(_epoch_ms(cutoff), project)
+                print(f"Would prune {count} notes{scope} older than {cutoff.isoformat()}Z")
+                return
+            size_before = _db_size(store.path) + _db_size(archive_path_for(store.path))
+            deleted, batches = store.prune(_epoch_ms(cutoff), project, batch_size)
+            store.compact()
+            size_after = _db_size(store.path) + _db_size(archive_path_for(store.path))
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    print(f"Pruned {deleted} notes{scope} older than {cutoff.isoformat()}Z in {batches} batches")
+    print(
+        f"Database size: {size_before} -> {size_after} bytes "
+        f"({max(size_before - size_after, 0)} bytes reclaimed)"
+    )
+
+
+def archive_notes(older_than: str, batch_size: int = 500, db_path: Optional[str] = None) -> None:
+    """Move notes older than `older_than` (e.g. `365d`) into the archive database."""
+    try:
+        age = _parse_duration(older_than)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if batch_size < 1:
+        print("Error: --batch-size must be positive.", file=sys.stderr)
+        sys.exit(1)
+    cutoff = datetime.datetime.utcnow() - age
+
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        try:
+            size_before = _db_size(store.path)
+            moved, batches = store.archive(_epoch_ms(cutoff), batch_size)
+            store.compact()
+            size_after = _db_size(store.path)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    print(f"Archived {moved} notes older than {cutoff.isoformat()}Z into {store.archive_path} in {batches} batches")
+    print(f"Database size: {size_before} -> {size_after} bytes")
+
+
+STATS_GROUPS = tuple(ROLLUP_DIMENSIONS) + ("day", "week")
+
+
+def _stats_query(
+    by: str, since: Optional[str], until: Optional[str], schemas: tuple[str, ...] = ("main",)
+) -> tuple[str, list]:
+    """Build the aggregate over note_rollups behind `stats`.
+
+    Rollups are per day, so `since`/`until` are applied to whole days
+    (since inclusive, until exclusive). The cost depends on the number of
+    days and groups in range, not on the number of notes.
+    """
+    if by not in STATS_GROUPS:
+        raise ValueError(f"cannot group by '{by}' (expected one of: {', '.join(STATS_GROUPS)})")
+    # Every note is counted once per dimension, so day/week totals can come from any one of them.
+    params: list = [by if by in ROLLUP_DIMENSIONS else "project"]
+    conds = ["dimension = ?"]
+    if since:
+        conds.append("day >= ?")
+        params.append(_parse_time_bound(since).date().isoformat())
+    if until:
+        conds.append("day < ?")
+        params.append(_parse_time_bound(until).date().isoformat())
+    group = {"day": "day", "week": "date(day, '-6 days', 'weekday 1')"}.get(by, "key")
+    order = "1" if by in ("day", "week") else "2 DESC, 1"
+    where = " AND ".join(conds)
+    source = f"note_rollups WHERE {where}"
+    if len(schemas) > 1:
+        source = "(" + " UNION ALL ".join(
+            f"SELECT day, key, count FROM {schema}.note_rollups WHERE {where}" for schema in schemas
+        ) + ")"
+        params = params * len(schemas)
+    return f"SELECT {group}, SUM(count) FROM {source} GROUP BY 1 ORDER BY {order}", params
+
+
+def show_stats(
+    by: str = "project",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    rebuild: bool = False,
+    db_path: Optional[str] = None,
+) -> None:
+    """Print note counts of non-hidden notes grouped by `by` (see STATS_GROUPS)."""
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        try:
+            if rebuild:
+                store.rebuild_stats()
+            rows = store.stats(by, since, until)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
-        
-        conn.commit()
-        print(f"Deleted note with id {note_id}")
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+
+    if not rows:
+        print("No notes found.")
+        return
+    total = sum(count for _, count in rows)
+    width = len(str(total))
+    # Weeks are labelled by their Monday.
+    for group, count in rows:
+        print(f"{count:>{width}}  {group or '-'}")
+    print(f"{total:>{width}}  total")
+
+
+# ts_epoch_ms is derived from timestamp, so exports leave it out.
+EXPORT_FIELDS = NOTE_COLUMNS.split(", ")[:-1]
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _epoch_ms(moment: datetime.datetime) -> int:
+    """Milliseconds since the Unix epoch for a naive UTC datetime."""
+    return (moment - _EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def _parse_iso(value: str) -> datetime.datetime:
+    """Parse ISO-8601 into a naive UTC datetime; values without an offset are taken as UTC."""
+    try:
+        moment = datetime.datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        raise ValueError(f"invalid date/time '{value}' (expected ISO-8601, e.g. 2024-05-01 or 2024-05-01T12:00)") from None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _parse_time_bound(value: str) -> datetime.datetime:
+    """Parse a --since/--until value: ISO-8601, or an age such as `7d` meaning that long ago."""
+    try:
+        age = _parse_duration(value)
+    except ValueError:
+        return _parse_iso(value)
+    return datetime.datetime.utcnow() - age
+
+
+def export_notes(
+    fmt: str = "jsonl",
+    output: Optional[str] = None,
+    user: Optional[str] = None,
+    project: Optional[str] = None,
+    directory: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    db_path: Optional[str] = None,
+    show_hidden: bool = False,
+    password: Optional[str] = None,
+    chunk_size: int = 1000,
+) -> int:
+    """Stream matching notes, oldest first, as JSON Lines, CSV or TSV.
+
+    Rows are pulled from the cursor `chunk_size` at a time and each chunk is
+    rendered into a single write, so memory stays flat however many notes
+    match. Writes to `output`, or stdout when it is None or "-". Returns the
+    number of notes written.
+    """
+    import csv
+    import io
+    import json
+
+    try:
+        since_ms = _epoch_ms(_parse_time_bound(since)) if since else None
+        until_ms = _epoch_ms(_parse_time_bound(until)) if until else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    conn = store.conn
+    to_stdout = output in (None, "-")
+    out = None
+    try:
+        out = sys.stdout if to_stdout else open(output, "w", newline="", encoding="utf-8", buffering=1 << 16)
+        archived_before = store.archived_before()
+        # The archive only holds notes older than its boundary.
+        schemas = ("main",)
+        if archived_before is not None and (since_ms is None or since_ms < archived_before):
+            schemas = store._schemas()
+        q, params = _select_notes(
+            user, project, directory, _unlock(conn, show_hidden, password), since_ms, until_ms, schemas=schemas
+        )
+        cur = conn.execute(q + " ORDER BY ts_epoch_ms, id", params)
+
+        buf = io.StringIO()
+        if fmt == "jsonl":
+            def render(rows: list) -> None:
+                for row in rows:
+                    buf.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False))
+                    buf.write("\n")
+        else:
+            writer = csv.writer(buf, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+            writer.writerow(EXPORT_FIELDS)
+
+            def render(rows: list) -> None:
+                writer.writerows(row[:-1] for row in rows)
+
+        count = 0
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            render(rows)
+            out.write(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+            count += len(rows)
+        # The CSV/TSV header is still buffered when nothing matched.
+        out.write(buf.getvalue())
+        out.flush()
+        return count
+    except BrokenPipeError:
+        # The reader went away (e.g. `notes export | head`); stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if out is not None and not to_stdout:
+            out.close()
+        conn.close()
+
+
+def _read_records(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """Yield one record dict at a time from a JSON Lines or CSV stream."""
+    import csv
+    import json
+
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for lineno, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {lineno}: invalid JSON ({e.msg})") from None
+        if not isinstance(record, dict):
+            raise ValueError(f"line {lineno}: expected a JSON object")
+        yield record
+
+
+def _record_to_row(
+    record: dict,
+    number: int,
+    flags: tuple[bool, bool, bool],
+    defaults: tuple[str, str, str],
+) -> tuple[dict, bool, Optional[str]]:
+    """Validate an imported record; return (fields, hidden, password) as add_note would use them."""
+    tasks = record.get("tasks") or []
+    if isinstance(tasks, str):
+        tasks = tasks.split(";")
+    tasks_text = _tasks_text(tasks)
+    if not tasks_text:
+        raise ValueError(f"record {number}: at least one task is required")
+
+    hidden = str(record.get("hidden") or "").lower() in ("1", "true", "yes")
+    password = record.get("password")
+    if hidden and not password:
+        raise ValueError(f"record {number}: password required for hidden note")
+
+    # Stored as UTC like new notes; an unparsable value would otherwise sort
+    # (and be pruned or archived) as the oldest note.
+    timestamp = record.get("timestamp")
+    if timestamp:
+        try:
+            timestamp = _parse_iso(str(timestamp)).isoformat() + "Z"
+        except ValueError as e:
+            raise ValueError(f"record {number}: {e}") from None
+    else:
+        timestamp = datetime.datetime.utcnow().isoformat() + "Z"
+
+    username, host, directory = _system_fields(
+        record.get("username") or defaults[0],
+        record.get("host") or defaults[1],
+        record.get("directory") or defaults[2],
+        flags,
+    )
+    fields = {
+        "username": username,
+        "host": host,
+        "timestamp": timestamp,
+        "project": record.get("project") or None,
+        "tasks": tasks_text,
+        "notes": record.get("notes") or None,
+        "directory": directory,
+    }
+    return fields, hidden, password
+
+
+def import_notes(
+    source: str,
+    fmt: str = "jsonl",
+    db_path: Optional[str] = None,
+    batch_size: int = 1000,
+    resume_key: Optional[str] = None,
+) -> None:
+    """Bulk-insert notes from a JSON Lines or CSV file ("-" reads stdin).
+
+    Records are streamed and inserted `batch_size` at a time, one
+    transaction per batch. The number of committed records is stored in the
+    same transaction, so re-running an interrupted import of the same source
+    skips what was already saved. Recognised fields: project, tasks (list or
+    `;`-separated), notes, hidden, password, and optionally username, host,
+    directory and timestamp.
+    """
+    import csv
+    import itertools
+    import time
+
+    if batch_size < 1:
+        print("Error: --batch-size must be positive.", file=sys.stderr)
+        sys.exit(1)
+
+    # Stdin cannot be replayed, so it only resumes under an explicit key.
+    if resume_key is None and source != "-":
+        resume_key = os.path.abspath(source)
+
+    try:
+        conn, used_path = get_db_connection(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    stream = sys.stdin if source == "-" else None
+    imported = 0
+    try:
+        if stream is None:
+            stream = open(source, newline="", encoding="utf-8")
+
+        done = 0
+        if resume_key is not None:
+            row = conn.execute("SELECT records_done FROM import_progress WHERE source = ?", (resume_key,)).fetchone()
+            if row:
+                done = row[0]
+                print(f"Resuming import after {done} records", file=sys.stderr)
+
+        records = itertools.islice(_read_records(stream, fmt), done, None)
+        flags = _privacy_flags()
+        defaults = _system_fields(flags=flags)
+        start = time.perf_counter()
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+            batch = [_record_to_row(record, done + i, flags, defaults) for i, record in enumerate(chunk, 1)]
+
+            def insert_batch(cur: sqlite3.Cursor) -> None:
+                _insert_notes(conn, cur, batch)
+                if resume_key is not None:
+                    cur.execute(
+                        "INSERT INTO import_progress (source, records_done) VALUES (?, ?) "
+                        "ON CONFLICT(source) DO UPDATE SET records_done = excluded.records_done",
+                        (resume_key, done + len(batch)),
+                    )
+
+            run_with_retry(conn, insert_batch)
+            done += len(batch)
+            imported += len(batch)
+
+        if resume_key is not None:
+            run_with_retry(conn, lambda cur: cur.execute("DELETE FROM import_progress WHERE source = ?", (resume_key,)))
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed > 0 else 0.0
+        print(f"Imported {imported} notes into {used_path} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        if imported and resume_key is not None:
+            print(f"{imported} notes were committed; re-run the import to resume.", file=sys.stderr)
+        sys.exit(1)
+    except sqlite3.OperationalError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
     finally:
+        if stream is not None and stream is not sys.stdin:
+            stream.close()
         conn.close()
+
+
+def _follow_lines(
+    fd: int,
+    batch_lines: int = 100,
+    batch_ms: int = 1000,
+    max_line: int = 1 << 16,
+) -> Iterator[list[tuple[str, str]]]:
+    """Yield batches of (line, arrival timestamp) read from `fd` as they arrive.
+
+    A batch is yielded once it holds `batch_lines` lines or `batch_ms`
+    milliseconds after its first line arrived, whichever comes first, and at
+    EOF or Ctrl-C. Blank lines are skipped and longer lines are split at
+    `max_line` bytes, so memory stays bounded by one batch plus one line.
+    """
+    import select
+    import time
+
+    pending = b""
+    batch: list[tuple[str, str]] = []
+    deadline = None
+    eof = False
+
+    def take(raw: bytes) -> None:
+        nonlocal deadline
+        text = raw.decode("utf-8", errors="replace").strip()
+        if text:
+            batch.append((text, datetime.datetime.utcnow().isoformat() + "Z"))
+            if deadline is None:
+                deadline = time.monotonic() + batch_ms / 1000
+
+    while not eof:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            chunk = os.read(fd, 1 << 16) if ready else None
+        except KeyboardInterrupt:
+            chunk = b""
+        if chunk is not None:
+            if not chunk:
+                eof = True
+                chunk = b"\n"
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            while len(pending) > max_line:
+                lines.append(pending[:max_line])
+                pending = pending[max_line:]
+            for line in lines:
+                for start in range(0, len(line) or 1, max_line):
+                    take(line[start:start + max_line])
+                    if len(batch) >= batch_lines:
+                        yield batch
+                        batch, deadline = [], None
+        if batch and (eof or time.monotonic() >= deadline):
+            yield batch
+            batch, deadline = [], None
+
+
+def follow_notes(
+    project: Optional[str],
+    note: Optional[str] = None,
+    db_path: Optional[str] = None,
+    hidden: bool = False,
+    password: Optional[str] = None,
+    batch_lines: int = 100,
+    batch_ms: int = 1000,
+    fd: Optional[int] = None,
+) -> None:
+    """Store every line read from `fd` (stdin) as its own note until EOF.
+
+    Lines are committed in groups (see `_follow_lines`), so a crash loses at
+    most the batch not yet committed. Each note keeps the time its line
+    arrived.
+    """
+    if batch_lines < 1 or batch_ms < 0:
+        print("Error: --batch-lines must be positive and --batch-ms not negative.", file=sys.stderr)
+        sys.exit(1)
+    if hidden and not password:
+        print("Error: Password required for hidden note.", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        store = NotesStore(db_path)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    username, host, directory = _system_fields()
+    saved = commits = 0
+    with store:
+        try:
+            for batch in _follow_lines(sys.stdin.fileno() if fd is None else fd, batch_lines, batch_ms):
+                entries = [
+                    (
+                        {
+                            "username": username,
+                            "host": host,
+                            "timestamp": timestamp,
+                            "project": project,
+                            "tasks": _tasks_text([line]),
+                            "notes": note,
+                            "directory": directory,
+                        },
+                        hidden,
+                        password,
+                    )
+                    for line, timestamp in batch
+                ]
+                saved += store.insert_entries(entries)
+                commits += 1
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e} ({saved} notes were committed)", file=sys.stderr)
+            sys.exit(2)
+    print(f"Saved {saved} notes in {commits} commits to {store.path}")
@@ -0,0 +1,117 @@
+"""Password protection for hidden notes.
+
+Each distinct password gets one row in `password_verifiers` holding its own
+random salt and scrypt key; hidden notes reference that row by id. Finding
+the verifier for a password tries every row under its own salt, so
+unlocking costs one KDF evaluation per distinct password (not per hidden
+note). There is deliberately no shared-salt lookup key: with one stored in
+the same file, a single scrypt per guess would test it against every
+verifier at once. `derive_key` caches results in process for
+NOTES_KDF_CACHE_TTL seconds so the daemon or a library caller does not pay
+them on every request.
+
+Notes written before verifiers existed carry an unsalted SHA-256
+`password_hash`; they are moved to a verifier the next time their password
+is used (see `unlock`).
+"""
+
+import hashlib
+import hmac
+import os
+import sqlite3
+import time
+from typing import Optional
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+KEY_BYTES = 32
+
+DEFAULT_CACHE_TTL = 300.0
+CACHE_MAX_ENTRIES = 256
+
+# (salt, sha256(password)) -> (expires_at, key); the plaintext is never kept.
+_key_cache: dict[tuple[bytes, bytes], tuple[float, bytes]] = {}
+
+
+def hash_password(password: str) -> str:
+    """Legacy unsalted SHA-256, kept to recognise and migrate old hidden notes."""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _cache_ttl() -> float:
+    try:
+        return float(os.environ.get("NOTES_KDF_CACHE_TTL", DEFAULT_CACHE_TTL))
+    except ValueError:
+        return DEFAULT_CACHE_TTL
+
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    """scrypt(password, salt), served from the in-process cache while fresh."""
+    now = time.monotonic()
+    cache_key = (salt, hashlib.sha256(password.encode()).digest())
+    cached = _key_cache.get(cache_key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    key = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=KEY_BYTES)
+    ttl = _cache_ttl()
+    if ttl > 0:
+        if len(_key_cache) >= CACHE_MAX_ENTRIES:
+            for stale in [k for k, (expires, _) in _key_cache.items() if expires <= now] or list(_key_cache)[:1]:
+                del _key_cache[stale]
+        _key_cache[cache_key] = (now + ttl, key)
+    return key
+
+
+def clear_key_cache() -> None:
+    _key_cache.clear()
+
+
+def find_verifier(conn: sqlite3.Connection, password: str) -> Optional[int]:
+    """Return the id of the verifier matching `password`, or None."""
+    for verifier_id, salt, key in conn.execute("SELECT id, salt, key FROM password_verifiers ORDER BY id").fetchall():
+        if hmac.compare_digest(derive_key(password, salt), key):
+            return verifier_id
+    return None
+
+
+def get_or_create_verifier(conn: sqlite3.Connection, password: str) -> int:
+    """Return the verifier id for `password`, creating it if needed (uncommitted)."""
+    verifier_id = find_verifier(conn, password)
+    if verifier_id is not None:
+        return verifier_id
+    salt = os.urandom(16)
+    cur = conn.execute(
+        "INSERT INTO password_verifiers (salt, key) VALUES (?, ?)",
+        (salt, derive_key(password, salt)),
+    )
+    return cur.lastrowid
+
+
+def unlock(conn: sqlite3.Connection, password: Optional[str]) -> Optional[int]:
+    """Return the verifier id that unlocks hidden notes for `password`.
+
+    Legacy SHA-256 notes with this password are first attached to the
+    verifier. Returns None when no hidden note uses the password.
+    """
+    if not password:
+        return None
+    legacy_hash = hash_password(password)
+    has_legacy = conn.execute(
+        "SELECT 1 FROM notes WHERE password_hash = ? AND verifier_id IS NULL LIMIT 1", (legacy_hash,)
+    ).fetchone()
+    if not has_legacy:
+        return find_verifier(conn, password)
+
+    from database import run_with_retry
+
+    def migrate(cur: sqlite3.Cursor) -> int:
+        verifier_id = get_or_create_verifier(conn, password)
+        cur.execute(
+            "UPDATE notes SET verifier_id = ?, password_hash = NULL WHERE password_hash = ? AND verifier_id IS NULL",
+            (verifier_id, legacy_hash),
+        )
+        return verifier_id
+
+    return run_with_retry(conn, migrate)
@@ -0,0 +1,137 @@
+"""Append-only spool behind `add --spool` / NOTES_SPOOL=1.
+
+A spooled note is one JSON line appended with a single write() to a file
+opened with O_APPEND, so `add` costs one small write instead of opening the
+database and committing a transaction. Flushing renames the spool aside (new
+notes go to a fresh file), hands its records to the caller in batches and
+then unlinks it. Every record carries a random `spool_id` that is stored
+with the note, so a flush interrupted after some batches committed can
+simply run again.
+
+Writers hold a shared flock while appending and a flush holds an exclusive
+one while draining; a writer that was holding a file that has since been
+renamed away reopens the spool and appends there instead.
+"""
+
+import os
+from typing import Callable, Iterator, Optional
+
+import dbfiles
+
+DEFAULT_BATCH = 500
+REQUIRED_FIELDS = ("username", "host", "timestamp", "tasks")
+
+# Read-only commands (`complete`, `list-dir --summary`) look for a spool
+# without importing this module, so the file names live in dbfiles.
+spool_path_for = dbfiles.spool_path_for
+pending = dbfiles.pending_spools
+
+
+def enabled(flag: Optional[bool] = None) -> bool:
+    """Return whether `add` should spool: `flag` if given, else NOTES_SPOOL."""
+    if flag is not None:
+        return flag
+    return os.environ.get("NOTES_SPOOL", "").lower() in ("1", "true", "yes", "on")
+
+
+def _same_file(fd: int, path: str) -> bool:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    own = os.fstat(fd)
+    return (own.st_dev, own.st_ino) == (st.st_dev, st.st_ino)
+
+
+def append(path: str, fields: dict) -> str:
+    """Append one note (`new_note_fields` output) to the spool; return its spool_id."""
+    import fcntl
+    import json
+
+    record = dict(fields, spool_id=os.urandom(16).hex())
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if _same_file(fd, path):
+                written = os.write(fd, line)
+                if written != len(line):
+                    raise OSError(f"short write to {path} ({written} of {len(line)} bytes)")
+                return record["spool_id"]
+        finally:
+            os.close(fd)
+
+
+def _records(f) -> Iterator[dict]:
+    import json
+
+    for line in f:
+        # A torn last line (crash mid-write) or a foreign line is skipped.
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if (
+            isinstance(record, dict)
+            and isinstance(record.get("spool_id"), str)
+            and all(isinstance(record.get(k), str) for k in REQUIRED_FIELDS)
+        ):
+            yield record
+
+
+def _drain_file(path: str, apply: Callable[[list[dict]], None], batch_size: int, wait: bool) -> int:
+    import fcntl
+
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            # Another flush is draining it.
+            return 0
+        count = 0
+        batch: list[dict] = []
+        for record in _records(f):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                apply(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            apply(batch)
+            count += len(batch)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    return count
+
+
+def drain(path: str, apply: Callable[[list[dict]], None], batch_size: int = DEFAULT_BATCH) -> int:
+    """Pass every spooled record to `apply` in batches, then remove the spool.
+
+    `apply` must store a batch idempotently (skipping spool_ids it already
+    has) and commit it. If it raises, the renamed file stays behind and the
+    next drain retries it. Returns how many records were passed on.
+    """
+    count = 0
+    for file in pending(path):
+        if file != path:
+            count += _drain_file(file, apply, batch_size, wait=False)
+            continue
+        target = f"{path}.flushing.{os.getpid()}-{os.urandom(4).hex()}"
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            # Another flush renamed it first.
+            continue
+        count += _drain_file(target, apply, batch_size, wait=True)
+    return count
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+from bench_suite import regressions  # noqa: E402
+from gen_db import Population, entries, generate  # noqa: E402
+from notes_core import NotesStore  # noqa: E402
+
+
+class TestGenerator(unittest.TestCase):
+    def test_seeded_and_skewed(self):
+        first = list(entries(2000, seed=3))
+        self.assertEqual(first, list(entries(2000, seed=3)))
+        self.assertNotEqual(first, list(entries(2000, seed=4)))
+
+        pop = Population(2000, seed=3)
+        projects = [fields["project"] for fields, _, _ in first]
+        self.assertGreater(projects.count(pop.projects[0]), 5 * projects.count(pop.projects[-1]))
+        hidden = sum(1 for _, is_hidden, _ in first if is_hidden)
+        self.assertTrue(10 <= hidden <= 80, hidden)
+        timestamps = [fields["timestamp"] for fields, _, _ in first]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_generate_uses_the_add_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            generate(db_path, 300, seed=1, batch_size=64)
+            with NotesStore(db_path) as store:
+                count, hidden = store.conn.execute("SELECT COUNT(*), SUM(is_hidden) FROM notes").fetchone()
+                self.assertEqual(count, 300)
+                self.assertEqual(sum(n for _, n in store.stats("project")), 300 - hidden)
+
+
+class TestRegressions(unittest.TestCase):
+    def test_thresholds(self):
+        baseline = {
+            ("list", "user", 10): {"seconds": 0.010},
+            ("add", "batch", 10): {"seconds": 1.0},
+            ("remove", "batch", 10): {"seconds": 0.0001},
+        }
+        results = [
+            {"benchmark": "list", "case": "user", "rows": 10, "seconds": 0.020},
+            {"benchmark": "add", "case": "batch", "rows": 10, "seconds": 1.2},
+            # Tripled, but below min_delta.
+            {"benchmark": "remove", "case": "batch", "rows": 10, "seconds": 0.0003},
+            {"benchmark": "list", "case": "new", "rows": 10, "seconds": 5.0},
+        ]
+        slower = regressions(results, baseline, tolerance=0.25, min_delta=0.002)
+        self.assertEqual([(r["benchmark"], r["case"]) for r in slower], [("list", "user")])
+
+
+if __name__ == "__main__":
+    unittest.main()
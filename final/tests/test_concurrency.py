@@ -0,0 +1,65 @@
+import io
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+from database import open_db
+from notes_core import add_note
+
+WRITERS = 6
+NOTES_PER_WRITER = 40
+
+
+def _writer(db_path: str, writer_id: int) -> None:
+    with redirect_stdout(io.StringIO()):
+        for i in range(NOTES_PER_WRITER):
+            add_note(f"writer-{writer_id}", [f"task {i}"], None, db_path=db_path)
+
+
+class TestConcurrentWriters(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        open_db(self.db_path).close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_uses_wal(self):
+        conn = open_db(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+        conn.close()
+
+    def test_concurrent_writers_lose_no_notes(self):
+        procs = [multiprocessing.Process(target=_writer, args=(self.db_path, w)) for w in range(WRITERS)]
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        for proc in procs:
+            self.assertEqual(proc.exitcode, 0)
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT project, COUNT(*) FROM notes GROUP BY project").fetchall()
+        conn.close()
+        self.assertEqual(len(rows), WRITERS)
+        for project, count in rows:
+            self.assertEqual(count, NOTES_PER_WRITER, project)
+
+        total = WRITERS * NOTES_PER_WRITER
+        print(
+            f"\n{WRITERS} writers, {total} notes in {elapsed:.2f}s ({total / elapsed:.0f} notes/s)",
+            file=sys.stderr,
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from daemon import NotesDaemon, connect, socket_path_for
+from notes_core import new_note_fields
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        # connect() returns None while NOTES_NO_DAEMON is set in the caller's environment.
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("NOTES_NO_DAEMON", None)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.daemon = NotesDaemon(self.db_path)
+        self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while self.daemon.server is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join(5)
+        self.tmpdir.cleanup()
+
+    def test_socket_lives_next_to_db(self):
+        self.assertEqual(socket_path_for(self.db_path), os.path.join(self.tmpdir.name, "notes.sock"))
+        self.assertEqual(os.stat(self.daemon.socket_path).st_mode & 0o077, 0)
+
+    def test_add_list_remove(self):
+        client = connect(self.db_path)
+        self.assertIsNotNone(client)
+        try:
+            fields = new_note_fields("proj", ["through the daemon"], None)
+            self.assertEqual(client.request("add", fields=fields)["code"], 0)
+            client.request("add", fields=new_note_fields("proj", ["secret"], None), hidden=True, password="pw")
+
+            listed = client.request("list", limit=10)
+            self.assertIn("through the daemon", listed["stdout"])
+            self.assertNotIn("secret", listed["stdout"])
+            listed = client.request("list", limit=10, show_hidden=True, password="pw")
+            self.assertIn("secret", listed["stdout"])
+
+            self.assertEqual(client.request("remove", id=1)["code"], 0)
+            missing = client.request("remove", id=1)
+            self.assertEqual(missing["code"], 1)
+            self.assertIn("not found", missing["stderr"])
+            self.assertEqual(client.request("list", before="bad")["code"], 1)
+            dry_run = client.request("remove", ids=["1-10"], dry_run=True)
+            self.assertEqual(dry_run["stdout"], "Would delete 1 notes\n")
+            self.assertEqual(client.request("remove", ids=[], project="proj")["stdout"], "Deleted 1 notes in 1 batches\n")
+        finally:
+            client.close()
+
+    def test_concurrent_adds_are_group_committed(self):
+        def writer(n):
+            client = connect(self.db_path)
+            try:
+                for i in range(25):
+                    response = client.request("add", fields=new_note_fields(f"w{n}", [f"task {i}"], None))
+                    self.assertEqual(response["code"], 0)
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 200)
+        conn.close()
+        self.assertEqual(self.daemon.notes_added, 200)
+        self.assertLessEqual(self.daemon.add_commits, 200)
+
+    def test_falls_back_without_daemon(self):
+        self.assertIsNone(connect(os.path.join(self.tmpdir.name, "other.db")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,9 @@ import unittest
 import tempfile
 import datetime
 import getpass
-from notes_core import add_note, list_notes, hash_password
-from database import open_db
+from notes_core import NotesStore, add_note, export_notes, import_notes, iter_notes, list_notes, search_notes, _list_query
+from passwords import clear_key_cache, find_verifier, hash_password
+from database import dir_key, open_db, SCHEMA_VERSION
 
 class TestNotesPrivacy(unittest.TestCase):
     def setUp(self):
@@ -68,10 +69,88 @@ class TestHiddenNotes(unittest.TestCase):
         add_note("proj", ["task1"], "note1", db_path=self.db_path, hidden=True, password="secret_password")
         conn = sqlite3.connect(self.db_path)
         cur = conn.cursor()
-        cur.execute("SELECT is_hidden, password_hash FROM notes")
+        cur.execute("SELECT is_hidden, password_hash, verifier_id FROM notes")
         row = cur.fetchone()
         self.assertEqual(row[0], 1)
-        self.assertEqual(row[1], hash_password("secret_password"))
+        self.assertIsNone(row[1])
+        cur.execute("SELECT salt, key FROM password_verifiers WHERE id = ?", (row[2],))
+        salt, key = cur.fetchone()
+        self.assertEqual(len(salt), 16)
+        self.assertNotEqual(key.hex(), hash_password("secret_password"))
+        self.assertEqual(find_verifier(conn, "secret_password"), row[2])
+        self.assertIsNone(find_verifier(conn, "wrong"))
+        conn.close()
+
+    def test_one_verifier_per_password(self):
+        for _ in range(3):
+            add_note("proj", ["task"], None, db_path=self.db_path, hidden=True, password="shared")
+        add_note("proj", ["task"], None, db_path=self.db_path, hidden=True, password="other")
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM password_verifiers").fetchone()[0], 2)
+        conn.close()
+
+    def test_listing_costs_bounded_kdf_calls(self):
+        import hashlib
+        from unittest import mock
+
+        for i in range(5):
+            for _ in range(3):
+                add_note("proj", ["task"], f"note{i}", db_path=self.db_path, hidden=True, password=f"pw{i}")
+        clear_key_cache()
+
+        import io
+        from contextlib import redirect_stdout
+
+        with mock.patch("hashlib.scrypt", wraps=hashlib.scrypt) as scrypt, redirect_stdout(io.StringIO()) as f:
+            list_notes(db_path=self.db_path, show_hidden=True, password="pw3")
+        self.assertIn("note3", f.getvalue())
+        self.assertNotIn("note2", f.getvalue())
+        # One KDF per distinct password at most, however many hidden notes use it.
+        self.assertLessEqual(scrypt.call_count, 5)
+
+    def test_upgrade_drops_shared_salt_lookup(self):
+        add_note("proj", ["task"], "kept", db_path=self.db_path, hidden=True, password="pw")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("ALTER TABLE password_verifiers RENAME TO password_verifiers_old")
+        conn.execute(
+            "CREATE TABLE password_verifiers (id INTEGER PRIMARY KEY, lookup TEXT NOT NULL UNIQUE, "
+            "salt BLOB NOT NULL, key BLOB NOT NULL)"
+        )
+        conn.execute("INSERT INTO password_verifiers SELECT id, 'x', salt, key FROM password_verifiers_old")
+        conn.execute("DROP TABLE password_verifiers_old")
+        conn.execute("INSERT INTO notes_meta (key, value) VALUES ('verifier_lookup_salt', '00')")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        conn = open_db(self.db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(password_verifiers)")]
+        self.assertEqual(columns, ["id", "salt", "key"])
+        self.assertIsNone(conn.execute("SELECT 1 FROM notes_meta WHERE key = 'verifier_lookup_salt'").fetchone())
+        self.assertIsNotNone(find_verifier(conn, "pw"))
+        conn.close()
+
+    def test_legacy_sha256_notes_migrate_on_use(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT INTO notes (username, timestamp, notes, is_hidden, password_hash) VALUES ('u', '2024-01-01T00:00:00Z', 'legacy_note', 1, ?)",
+            (hash_password("old"),),
+        )
+        conn.commit()
+        conn.close()
+
+        import io
+        from contextlib import redirect_stdout
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            list_notes(db_path=self.db_path, show_hidden=True, password="old")
+        self.assertIn("legacy_note", f.getvalue())
+
+        conn = sqlite3.connect(self.db_path)
+        password_hash, verifier_id = conn.execute("SELECT password_hash, verifier_id FROM notes").fetchone()
+        self.assertIsNone(password_hash)
+        self.assertEqual(find_verifier(conn, "old"), verifier_id)
         conn.close()
 
     def test_list_hidden_notes(self):
@@ -105,5 +184,1279 @@ class TestHiddenNotes(unittest.TestCase):
         self.assertIn("visible_note", output)
         self.assertIn("hidden_note", output)
 
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp()
+        open_db(self.db_path).close()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def search(self, query, **kwargs):
+        import io
+        from contextlib import redirect_stdout
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            search_notes(query, db_path=self.db_path, **kwargs)
+        return f.getvalue()
+
+    def test_phrase_and_prefix(self):
+        add_note("infra", ["restarted nginx service"], "first", db_path=self.db_path)
+        add_note("web", ["nginx restarted twice"], "second", db_path=self.db_path)
+
+        output = self.search('"restarted nginx"')
+        self.assertIn("first", output)
+        self.assertNotIn("second", output)
+
+        output = self.search("restar*")
+        self.assertIn("first", output)
+        self.assertIn("second", output)
+
+        output = self.search("nginx", project="web")
+        self.assertNotIn("first", output)
+        self.assertIn("second", output)
+
+    def test_punctuation_is_matched_literally(self):
+        add_note("infra", ["deploy-prod restarted nginx.service"], "first", db_path=self.db_path)
+        add_note("infra", ["bumped to v1.2 after C++ build"], "second", db_path=self.db_path)
+        add_note("infra", ["deploy staging"], "third", db_path=self.db_path)
+
+        output = self.search("deploy-prod")
+        self.assertIn("first", output)
+        self.assertNotIn("third", output)
+        self.assertIn("first", self.search("nginx.service"))
+        self.assertIn("second", self.search("v1.2"))
+        self.assertIn("second", self.search("C++"))
+        output = self.search('"deploy-prod restart"*')
+        self.assertIn("first", output)
+        self.assertNotIn("third", output)
+        self.assertIn("No notes found.", self.search('"unterminated phrase'))
+
+    def test_only_syntax_errors_are_invalid_queries(self):
+        import io
+        from contextlib import redirect_stderr
+        from unittest import mock
+
+        add_note("infra", ["deploy"], "first", db_path=self.db_path)
+        for error, code in [("fts5: syntax error near \".\"", 1), ("database is locked", 2)]:
+            err = io.StringIO()
+            with mock.patch.object(NotesStore, "search", side_effect=sqlite3.OperationalError(error)), \
+                    redirect_stderr(err), self.assertRaises(SystemExit) as cm:
+                self.search("deploy")
+            self.assertEqual(cm.exception.code, code)
+            self.assertEqual("invalid search query" in err.getvalue(), code == 1)
+
+    def test_hidden_notes_need_password(self):
+        add_note("proj", ["rotate keys"], "secret_note", db_path=self.db_path, hidden=True, password="pass")
+        self.assertNotIn("secret_note", self.search("rotate"))
+        self.assertNotIn("secret_note", self.search("rotate", show_hidden=True, password="wrong"))
+        self.assertIn("secret_note", self.search("rotate", show_hidden=True, password="pass"))
+
+    def test_index_follows_deletes_and_rebuilds(self):
+        add_note("proj", ["cleanup logs"], "note1", db_path=self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM notes")
+        conn.commit()
+        conn.close()
+        self.assertIn("No notes found.", self.search("cleanup"))
+
+        # A database created before the index existed gets backfilled on open.
+        conn = sqlite3.connect(self.db_path)
+        for trigger in ("notes_fts_ai", "notes_fts_ad", "notes_fts_au"):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE notes_fts")
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute(
+            "INSERT INTO notes (username, timestamp, tasks) VALUES ('user', '2024-01-01T00:00:00Z', 'legacy row')"
+        )
+        conn.commit()
+        conn.close()
+        self.assertIn("legacy row", self.search("legacy"))
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp()
+        conn = open_db(self.db_path)
+        # Two notes share a timestamp so the id tiebreak is exercised.
+        for i, ts in enumerate(["01", "02", "02", "03", "04"]):
+            conn.execute(
+                "INSERT INTO notes (username, timestamp, tasks, is_hidden) VALUES ('u', ?, ?, 0)",
+                (f"2024-01-{ts}T00:00:00Z", f"task{i}"),
+            )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def page(self, **kwargs):
+        import io
+        import re
+        from contextlib import redirect_stdout
+
+        f = io.StringIO()
+        with redirect_stdout(f):
+            list_notes(limit=2, db_path=self.db_path, **kwargs)
+        output = f.getvalue()
+        tasks = re.findall(r"tasks: (task\d)", output)
+        token = re.search(r"--(?:before|after) (\S+)", output)
+        return tasks, token.group(1) if token else None
+
+    def test_pages_are_stable_under_inserts(self):
+        tasks, token = self.page()
+        self.assertEqual(tasks, ["task4", "task3"])
+
+        add_note(None, ["task5"], None, db_path=self.db_path)
+        tasks, token = self.page(before=token)
+        self.assertEqual(tasks, ["task2", "task1"])
+        tasks, last = self.page(before=token)
+        self.assertEqual(tasks, ["task0"])
+        self.assertIsNone(last)
+
+        # Paging back towards newer notes starts right after the token.
+        tasks, _ = self.page(after=token)
+        self.assertEqual(tasks, ["task3", "task2"])
+
+    def test_iter_notes_is_lazy(self):
+        notes = iter_notes(db_path=self.db_path)
+        first = next(notes)
+        self.assertEqual(first.tasks, "task4")
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertEqual([n.tasks for n in notes], ["task3", "task2", "task1", "task0"])
+        self.assertEqual([n.tasks for n in iter_notes(limit=2, db_path=self.db_path, after="2024-01-02T00:00:00Z,2")],
+                         ["task3", "task2"])
+        with self.assertRaises(ValueError):
+            next(iter_notes(db_path=self.db_path, before="bogus"))
+
+    def test_json_and_tsv_formats(self):
+        import io
+        import json
+        from contextlib import redirect_stderr, redirect_stdout
+
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            list_notes(limit=2, db_path=self.db_path, fmt="json")
+        notes = json.loads(out.getvalue())
+        self.assertEqual([n["tasks"] for n in notes], ["task4", "task3"])
+        self.assertIs(notes[0]["is_hidden"], False)
+        # The continuation token must not corrupt machine-readable output.
+        self.assertIn("--before 1704240000000,4", err.getvalue())
+
+        out = io.StringIO()
+        with redirect_stdout(out), redirect_stderr(io.StringIO()):
+            list_notes(limit=10, db_path=self.db_path, fmt="tsv")
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split("\t")[:3], ["id", "username", "host"])
+        self.assertEqual(len(lines), 6)
+        hidden = lines[0].split("\t").index("is_hidden")
+        self.assertEqual({line.split("\t")[hidden] for line in lines[1:]}, {"0"})
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            list_notes(limit=10, project="none", db_path=self.db_path, fmt="json")
+        self.assertEqual(json.loads(out.getvalue()), [])
+
+    def test_since_until_ranges(self):
+        def tasks(**kwargs):
+            return [n.tasks for n in iter_notes(db_path=self.db_path, **kwargs)]
+
+        self.assertEqual(tasks(since="2024-01-02", until="2024-01-04"), ["task3", "task2", "task1"])
+        self.assertEqual(tasks(until="2024-01-02T00:00:00+01:00"), ["task0"])
+        self.assertEqual(tasks(since="1d"), [])
+        add_note(None, ["fresh"], None, db_path=self.db_path)
+        self.assertEqual(tasks(since="1h"), ["fresh"])
+        with self.assertRaises(ValueError):
+            tasks(since="last week")
+
+    def test_mixed_offsets_sort_by_instant(self):
+        conn = open_db(self.db_path)
+        # 23:30 at -02:00 is 01:30 UTC on the 4th: after task4, though it sorts first as text.
+        conn.execute(
+            "INSERT INTO notes (username, timestamp, tasks, is_hidden) VALUES ('u', '2024-01-03T23:30:00-02:00', 'task5', 0)"
+        )
+        conn.commit()
+        conn.close()
+        self.assertEqual([n.tasks for n in iter_notes(limit=2, db_path=self.db_path)], ["task5", "task4"])
+
+
+class TestNotesStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        clear_key_cache()
+
+    def test_add_many_query_remove_many(self):
+        with NotesStore(self.db_path) as store:
+            note_id = store.add("proj", ["single"])
+            added = store.add_many(
+                [{"project": "bulk", "tasks": f"t{i}a;t{i}b"} for i in range(50)]
+                + [{"project": "bulk", "tasks": ["secret"], "hidden": True, "password": "pw"}]
+            )
+            self.assertEqual(added, 51)
+            self.assertEqual(sum(1 for _ in store.query(project="bulk")), 50)
+            self.assertEqual(len(list(store.query(project="bulk", show_hidden=True, password="pw"))), 51)
+            self.assertEqual(next(store.query(limit=1, project="bulk")).tasks, "t49a; t49b")
+
+            self.assertEqual(store.remove_many([note_id, note_id, 99999]), 1)
+            self.assertEqual(list(store.query(project="proj")), [])
+
+    def test_errors_raise_instead_of_exiting(self):
+        with NotesStore(self.db_path) as store:
+            with self.assertRaises(ValueError):
+                store.add_many([{"project": "p", "tasks": "ok"}, {"project": "p", "tasks": " "}])
+            with self.assertRaises(ValueError):
+                store.add("p", ["hidden"], hidden=True)
+            with self.assertRaises(ValueError):
+                store.query(before="not-a-token")
+            # A failed batch stores nothing.
+            self.assertEqual(list(store.query()), [])
+
+
+class TestTasks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_tasks_indexed_with_note(self):
+        with NotesStore(self.db_path) as store:
+            store.add_many([
+                {"tasks": ["restart nginx", "patch kernel"]},
+                {"tasks": "restart nginx; rotate logs"},
+                {"tasks": ["restart nginx"], "hidden": True, "password": "pw"},
+            ])
+            self.assertEqual(store.top_tasks(2), [("restart nginx", 2), ("patch kernel", 1)])
+            self.assertEqual([n.tasks for n in store.query(task="rotate logs")], ["restart nginx; rotate logs"])
+            self.assertEqual(len(list(store.query(task="restart nginx", show_hidden=True, password="pw"))), 2)
+
+            store.remove_many([n.id for n in store.query(task="patch kernel")])
+            self.assertEqual(store.conn.execute("SELECT COUNT(*) FROM note_tasks").fetchone()[0], 2)
+
+    def test_backfill_existing_notes(self):
+        conn = open_db(self.db_path)
+        conn.executemany(
+            "INSERT INTO notes (username, timestamp, tasks, is_hidden) VALUES ('u', '2024-01-01T00:00:00Z', ?, ?)",
+            [(f"t{i % 3}; shared", 0) for i in range(25)] + [("secret", 1)],
+        )
+        conn.execute("DROP TABLE note_tasks")
+        conn.execute("PRAGMA user_version = 4")
+        conn.commit()
+        conn.close()
+
+        import database
+
+        conn = sqlite3.connect(self.db_path)
+        database._migrate_note_tasks(conn, chunk_size=7)
+        counts = dict(conn.execute("SELECT task, COUNT(*) FROM note_tasks GROUP BY task"))
+        self.assertEqual(counts, {"shared": 25, "t0": 9, "t1": 8, "t2": 8})
+        conn.close()
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        rows = [
+            ("alice", "2024-05-06T09:00:00Z", "infra", 0),  # Monday
+            ("alice", "2024-05-06T17:00:00Z", "infra", 0),
+            ("bob", "2024-05-08T10:00:00Z", None, 0),
+            ("bob", "2024-05-13T10:00:00Z", "web", 0),  # next Monday
+            ("bob", "2024-05-13T11:00:00Z", "secret", 1),
+        ]
+        self.store.conn.executemany(
+            "INSERT INTO notes (username, host, timestamp, project, tasks, is_hidden) VALUES (?, 'h', ?, ?, 't', ?)",
+            rows,
+        )
+        self.store.conn.commit()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_groups_and_ranges(self):
+        self.assertEqual(self.store.stats("project"), [("infra", 2), ("", 1), ("web", 1)])
+        self.assertEqual(self.store.stats("user"), [("alice", 2), ("bob", 2)])
+        self.assertEqual(self.store.stats("day"), [("2024-05-06", 2), ("2024-05-08", 1), ("2024-05-13", 1)])
+        self.assertEqual(self.store.stats("week"), [("2024-05-06", 3), ("2024-05-13", 1)])
+        self.assertEqual(self.store.stats("host", since="2024-05-07", until="2024-05-13"), [("h", 1)])
+        # Ages count back from now, like `list --since 7d`.
+        self.assertEqual(self.store.stats("project", since="7d"), [])
+        self.assertEqual(self.store.stats("user", until="7d"), [("alice", 2), ("bob", 2)])
+        with self.assertRaises(ValueError):
+            self.store.stats("tasks")
+
+    def test_days_are_utc(self):
+        note_id = self.store.add_fields({"username": "carol", "host": "h", "timestamp": "2024-05-13T23:30:00-05:00",
+                                         "project": "late", "tasks": "t", "notes": None, "directory": "/"})
+        self.assertEqual(self.store.stats("day", since="2024-05-14"), [("2024-05-14", 1)])
+        self.assertEqual(self.store.stats("project", since="2024-05-14"), [("late", 1)])
+        self.assertEqual(self.store.stats("project", until="2024-05-14"), [("infra", 2), ("", 1), ("web", 1)])
+        maintained = self.store.conn.execute("SELECT * FROM note_rollups ORDER BY 1, 2, 3").fetchall()
+        self.store.rebuild_stats()
+        self.assertEqual(self.store.conn.execute("SELECT * FROM note_rollups ORDER BY 1, 2, 3").fetchall(), maintained)
+        self.store.remove_many([note_id])
+        self.assertEqual(self.store.stats("day", since="2024-05-14"), [])
+
+    def test_deletes_and_rebuild(self):
+        self.store.remove_many([1, 3])
+        self.assertEqual(self.store.stats("project"), [("infra", 1), ("web", 1)])
+        maintained = self.store.conn.execute("SELECT * FROM note_rollups ORDER BY 1, 2, 3").fetchall()
+        self.store.rebuild_stats()
+        self.assertEqual(self.store.conn.execute("SELECT * FROM note_rollups ORDER BY 1, 2, 3").fetchall(), maintained)
+
+    def test_query_never_reads_notes(self):
+        from notes_core import _stats_query
+
+        for by in ["project", "day", "week"]:
+            q, params = _stats_query(by, "2024-01-01", "2025-01-01")
+            plan = " ".join(row[3] for row in self.store.conn.execute("EXPLAIN QUERY PLAN " + q, params))
+            self.assertNotIn("notes ", plan + " ")
+            self.assertIn("note_rollups USING PRIMARY KEY", plan)
+
+
+class TestPrune(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        old = [("2020-01-01T00:00:00Z", "infra" if i % 2 else "web", "x" * 2000) for i in range(600)]
+        self.store.conn.executemany(
+            "INSERT INTO notes (username, timestamp, project, tasks, is_hidden) VALUES ('u', ?, ?, ?, 0)", old
+        )
+        self.store.conn.commit()
+        self.store.add_many([{"project": "infra", "tasks": "recent"}])
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def run_prune(self, *args, **kwargs):
+        import io
+        from contextlib import redirect_stdout
+
+        from notes_core import prune_notes
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            prune_notes(*args, db_path=self.db_path, **kwargs)
+        return out.getvalue()
+
+    def test_dry_run_and_project_scope(self):
+        self.assertIn("Would prune 600 notes", self.run_prune("180d", dry_run=True))
+        self.assertIn("Pruned 300 notes in project 'infra'", self.run_prune("30d", project="infra", batch_size=7))
+        self.assertEqual(self.store.stats("project"), [("web", 300), ("infra", 1)])
+
+    def test_prune_reclaims_space(self):
+        import re
+
+        self.assertEqual(self.store.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        output = self.run_prune("180d", batch_size=100)
+        self.assertIn("Pruned 600 notes", output)
+        before, after, reclaimed = map(int, re.search(r"(\d+) -> (\d+) bytes \((\d+)", output).groups())
+        self.assertLess(after, before / 4)
+        self.assertEqual(reclaimed, before - after)
+        self.assertEqual([n.tasks for n in self.store.query()], ["recent"])
+
+    def test_invalid_age(self):
+        import io
+        from contextlib import redirect_stderr
+
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as cm:
+            self.run_prune("six months")
+        self.assertEqual(cm.exception.code, 1)
+
+
+class TestRemove(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        rows = [
+            (f"2024-01-{i % 28 + 1:02d}T00:00:00Z", "bad-import" if i < 300 else "keep", f"task {i}", int(i % 50 == 0))
+            for i in range(400)
+        ]
+        self.store.conn.executemany(
+            "INSERT INTO notes (username, timestamp, project, tasks, is_hidden) VALUES ('u', ?, ?, ?, ?)", rows
+        )
+        self.store.conn.commit()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def run_remove(self, *specs, **kwargs):
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        from notes_core import remove_notes
+
+        out, err = io.StringIO(), io.StringIO()
+        code = 0
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                remove_notes(specs, db_path=self.db_path, **kwargs)
+            except SystemExit as e:
+                code = e.code
+        return code, out.getvalue() + err.getvalue()
+
+    def remaining(self):
+        return self.store.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def test_ids_and_ranges(self):
+        from notes_core import _parse_id_ranges
+
+        self.assertEqual(_parse_id_ranges(["15", "12", "100-250", "240-260", "13"]), [(12, 13), (15, 15), (100, 260)])
+        self.assertEqual(self.run_remove("12", "15", "100-250", dry_run=True), (0, "Would delete 153 notes\n"))
+        self.assertEqual(self.remaining(), 400)
+        self.assertEqual(self.run_remove("12", "15", "100-250", "9000-9100", batch_size=40),
+                         (0, "Deleted 153 notes in 4 batches\n"))
+        self.assertEqual(self.remaining(), 247)
+        self.assertEqual(self.run_remove("12"), (1, "Error: Note with id 12 not found.\n"))
+        self.assertEqual(self.run_remove("13"), (0, "Deleted note with id 13\n"))
+
+    def test_filters(self):
+        code, output = self.run_remove(project="bad-import", until="2024-01-10")
+        self.assertEqual(code, 0)
+        expected = sum(1 for i in range(300) if i % 28 + 1 < 10)
+        self.assertIn(f"Deleted {expected} notes", output)
+        # Hidden notes are removed too, and the rollups and task index follow.
+        visible = self.store.conn.execute(
+            "SELECT COUNT(*) FROM notes WHERE project = 'bad-import' AND is_hidden = 0"
+        ).fetchone()[0]
+        self.assertEqual(self.remaining(), 400 - expected)
+        self.assertEqual(dict(self.store.stats("project"))["bad-import"], visible)
+        self.assertEqual(self.run_remove("1-100", project="keep"), (1, "Error: No matching notes found.\n"))
+        self.assertEqual(self.run_remove("1-400", project="keep", dry_run=True), (0, "Would delete 100 notes\n"))
+
+    def test_invalid_requests(self):
+        for specs, kwargs in [(("12a",), {}), (("9-3",), {}), ((), {}), (("1",), {"batch_size": 0}),
+                              ((), {"until": "tomorrow"})]:
+            code, output = self.run_remove(*specs, **kwargs)
+            self.assertEqual(code, 1, output)
+            self.assertTrue(output.startswith("Error:"), output)
+        self.assertEqual(self.remaining(), 400)
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        old = [(f"2020-01-{i + 1:02d}T00:00:00Z", "old" if i % 2 else "both", f"old task {i}") for i in range(20)]
+        self.store.conn.executemany(
+            "INSERT INTO notes (username, timestamp, project, tasks, is_hidden) VALUES ('u', ?, ?, ?, 0)", old
+        )
+        self.store.conn.commit()
+        import database
+
+        database._migrate_note_tasks(self.store.conn)
+        self.store.add_many([{"project": "both", "tasks": f"new task {i}"} for i in range(3)])
+        self.moved, _ = self.store.archive(1704067200000, batch_size=6)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def tasks(self, notes):
+        return [n.tasks for n in notes]
+
+    def test_rows_move_to_archive(self):
+        self.assertEqual(self.moved, 20)
+        archive = sqlite3.connect(os.path.join(self.tmpdir.name, "notes-archive.db"))
+        self.assertEqual(archive.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 20)
+        self.assertEqual(archive.execute("SELECT COUNT(*) FROM note_tasks").fetchone()[0], 20)
+        archive.close()
+        self.assertEqual(self.store.conn.execute("SELECT COUNT(*) FROM main.notes").fetchone()[0], 3)
+
+    def test_queries_reach_archive_only_when_needed(self):
+        fresh = NotesStore(self.db_path)
+        self.assertEqual(self.tasks(fresh.query(limit=3)), ["new task 2", "new task 1", "new task 0"])
+        self.assertIsNone(fresh.archive_path)
+        self.assertEqual(self.tasks(fresh.query(limit=5)), ["new task 2", "new task 1", "new task 0",
+                                                             "old task 19", "old task 18"])
+        self.assertIsNotNone(fresh.archive_path)
+        fresh.close()
+
+        # Keyset tokens work across the boundary in both directions.
+        page = list(self.store.query(limit=4, project="both"))
+        self.assertEqual(self.tasks(page)[-1], "old task 18")
+        token = f"{page[-1].ts_epoch_ms},{page[-1].id}"
+        self.assertEqual(self.tasks(self.store.query(limit=2, project="both", before=token)), ["old task 16", "old task 14"])
+        self.assertEqual(self.tasks(self.store.query(limit=2, after="2020-01-18T00:00:00Z,0")),
+                         ["old task 18", "old task 17"])
+        self.assertEqual(len(list(self.store.query())), 23)
+
+    def test_search_stats_tasks_remove(self):
+        self.assertEqual(self.tasks(self.store.search("task", limit=3)), ["new task 0", "new task 1", "new task 2"])
+        self.assertEqual(len(self.store.search("old", limit=50)), 20)
+        self.assertEqual(dict(self.store.stats("project")), {"both": 13, "old": 10})
+        self.assertEqual(self.store.top_tasks(1), [("new task 0", 1)])
+        archived_id = next(self.store.query(project="old")).id
+        self.assertEqual(self.store.remove_many([archived_id, 21]), 2)
+        self.assertEqual(dict(self.store.stats("project")), {"both": 12, "old": 9})
+
+    def test_ids_are_never_reused(self):
+        newest = max(note.id for note in self.store.query())
+        self.assertEqual(self.store.remove_many([newest]), 1)
+        added = self.store.add("both", ["after remove"])
+        self.assertGreater(added, newest)
+        moved, _ = self.store.archive(4102444800000)
+        self.assertEqual(moved, 3)
+        self.assertEqual(self.store.add("both", ["after archive"]), added + 1)
+        tasks = self.tasks(self.store.query())
+        self.assertEqual(len(tasks), 24)
+        self.assertIn("after remove", tasks)
+        self.assertIn("after archive", tasks)
+        self.assertEqual(self.store.remove_many([added]), 1)
+        self.assertEqual(len(list(self.store.query())), 23)
+
+    def test_rerun_after_crash_converges(self):
+        # A crash between the two WAL commits leaves the batch in both databases.
+        self.store.conn.execute(
+            "INSERT INTO notes (username, timestamp, project, tasks, is_hidden) "
+            "VALUES ('u', '2020-02-01T00:00:00Z', 'old', 'copied twice', 0)"
+        )
+        self.store.conn.commit()
+        import database
+
+        database._migrate_note_tasks(self.store.conn)
+        note_id = self.store.conn.execute("SELECT id FROM main.notes WHERE tasks = 'copied twice'").fetchone()[0]
+        columns = ", ".join(row[1] for row in self.store.conn.execute("PRAGMA main.table_info(notes)"))
+        self.store.conn.execute(
+            f"INSERT INTO archive.notes ({columns}) SELECT {columns} FROM main.notes WHERE id = ?", (note_id,)
+        )
+        self.store.conn.execute(
+            "INSERT INTO archive.note_tasks (note_id, position, task) "
+            "SELECT note_id, position, task FROM main.note_tasks WHERE note_id = ?",
+            (note_id,),
+        )
+        self.store.conn.commit()
+        self.assertEqual(self.store.archive(1704067200000), (1, 1))
+        self.assertEqual(self.store.archive(1704067200000), (0, 0))
+        self.assertEqual(self.tasks(self.store.query(project="old")).count("copied twice"), 1)
+        conn = self.store.conn
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM archive.notes WHERE id = ?", (note_id,)).fetchone()[0], 1)
+        self.assertEqual(
+            conn.execute("SELECT COUNT(*) FROM archive.note_tasks WHERE note_id = ?", (note_id,)).fetchone()[0], 1
+        )
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM main.notes WHERE id = ?", (note_id,)).fetchone()[0], 0)
+
+    def test_upgrade_starts_ids_above_the_archive(self):
+        # Before AUTOINCREMENT, removing the newest hot note let the next add reuse an archived id.
+        self.store.conn.execute("DELETE FROM main.notes")
+        self.store.conn.commit()
+        self.store.close()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DROP TABLE notes")
+        conn.execute(
+            "CREATE TABLE notes (id INTEGER PRIMARY KEY, username TEXT NOT NULL, host TEXT, timestamp TEXT NOT NULL, "
+            "project TEXT, tasks TEXT, notes TEXT, directory TEXT, is_hidden INTEGER DEFAULT 0, password_hash TEXT)"
+        )
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+        self.store = NotesStore(self.db_path)
+        self.assertGreater(self.store.add("both", ["after upgrade"]), 20)
+        self.assertEqual(len(list(self.store.query())), 21)
+
+    def test_export_merges_in_timestamp_order(self):
+        import io
+        import json
+        from contextlib import redirect_stdout
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            export_notes(db_path=self.db_path)
+        timestamps = [json.loads(line)["timestamp"] for line in out.getvalue().splitlines()]
+        self.assertEqual(len(timestamps), 23)
+        self.assertEqual(timestamps, sorted(timestamps))
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            export_notes(db_path=self.db_path, since="2025-01-01")
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+    def test_merged_list_uses_indexes(self):
+        self.store._attach_archive()
+        for project in [None, "both"]:
+            q, params = _list_query(20, None, project, None, None, schemas=("main", "archive"))
+            plan = [row[3] for row in self.store.conn.execute("EXPLAIN QUERY PLAN " + q, params)]
+            self.assertFalse(any("TEMP B-TREE" in step or step.startswith("SCAN") for step in plan), plan)
+
+
+class TestFollow(unittest.TestCase):
+    def pipe(self, *chunks, pause=0.0):
+        import threading
+        import time
+
+        read_fd, write_fd = os.pipe()
+
+        def writer():
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(pause)
+                os.write(write_fd, chunk)
+            os.close(write_fd)
+
+        threading.Thread(target=writer, daemon=True).start()
+        self.addCleanup(os.close, read_fd)
+        return read_fd
+
+    def test_batches_by_count_and_eof(self):
+        from notes_core import _follow_lines
+
+        fd = self.pipe(b"".join(b"line %d\r\n\n" % i for i in range(250)) + b"tail")
+        batches = [[line for line, _ in batch] for batch in _follow_lines(fd, batch_lines=100, batch_ms=60000)]
+        self.assertEqual([len(b) for b in batches], [100, 100, 51])
+        self.assertEqual(batches[0][0], "line 0")
+        self.assertEqual(batches[-1][-1], "tail")
+
+    def test_flushes_after_batch_ms_and_bounds_lines(self):
+        import time
+
+        from notes_core import _follow_lines
+
+        fd = self.pipe(b"first\nsecond\n", b"x" * 250 + b"\n", pause=0.5)
+        batches = _follow_lines(fd, batch_lines=100, batch_ms=50, max_line=100)
+        start = time.monotonic()
+        self.assertEqual([line for line, _ in next(batches)], ["first", "second"])
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual([len(line) for line, _ in next(batches)], [100, 100, 50])
+
+    def test_follow_notes_group_commits(self):
+        import io
+        from contextlib import redirect_stdout
+
+        from notes_core import follow_notes
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "notes.db")
+            fd = self.pipe(b"".join(b"step %d\n" % i for i in range(25)))
+            out = io.StringIO()
+            with redirect_stdout(out):
+                follow_notes("Infra", db_path=db_path, batch_lines=10, fd=fd)
+            self.assertIn("Saved 25 notes in 3 commits", out.getvalue())
+            notes = list(iter_notes(db_path=db_path, project="Infra"))
+            self.assertEqual([n.tasks for n in notes[:2]], ["step 24", "step 23"])
+            self.assertEqual(len({n.timestamp for n in notes}), 25)
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        import io
+        from contextlib import redirect_stdout
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.out = io.StringIO()
+        self.redirect = redirect_stdout(self.out)
+
+    def spool_path(self):
+        import spool
+
+        return spool.spool_path_for(self.db_path)
+
+    def test_add_appends_and_readers_flush(self):
+        with self.redirect:
+            add_note("Infra", ["rotated keys"], None, db_path=self.db_path, spool=True)
+            add_note("Infra", ["patched host"], None, db_path=self.db_path, spool=True)
+        self.assertIn("Spooled note", self.out.getvalue())
+        self.assertFalse(os.path.exists(self.db_path))
+        with open(self.spool_path()) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        notes = list(iter_notes(db_path=self.db_path))
+        self.assertEqual([n.tasks for n in notes], ["patched host", "rotated keys"])
+        self.assertFalse(os.path.exists(self.spool_path()))
+
+    def test_hidden_notes_are_not_spooled(self):
+        with self.redirect:
+            add_note("Infra", ["secret"], None, db_path=self.db_path, hidden=True, password="pw", spool=True)
+        self.assertFalse(os.path.exists(self.spool_path()))
+        self.assertIn("Saved note", self.out.getvalue())
+
+    def test_read_only_commands_flush_first(self):
+        from complete import complete
+        from notes_core import dir_summary
+
+        with self.redirect:
+            add_note("Infra", ["rotated keys"], None, db_path=self.db_path, spool=True)
+        self.assertEqual(complete("project", "In", db_path=self.db_path), ["Infra"])
+        with self.redirect:
+            add_note("Infra", ["patched host"], None, db_path=self.db_path, spool=True)
+        summary = dir_summary(os.getcwd(), db_path=self.db_path)
+        self.assertEqual((summary["count"], summary["last_tasks"]), (2, "patched host"))
+        self.assertFalse(os.path.exists(self.spool_path()))
+
+    def test_interrupted_flush_is_repeatable(self):
+        import spool
+        from database import run_with_retry
+        from notes_core import _insert_spooled
+
+        with self.redirect:
+            for i in range(5):
+                add_note("Infra", [f"task {i}"], None, db_path=self.db_path, spool=True)
+        with open(self.spool_path(), "a") as f:
+            f.write('{"torn": ')
+
+        store = NotesStore(self.db_path, flush_spool=False)
+        self.addCleanup(store.close)
+        calls = []
+
+        def apply_then_crash(records):
+            calls.append(len(records))
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("disk I/O error")
+            run_with_retry(store.conn, lambda cur: _insert_spooled(store.conn, cur, records))
+
+        with self.assertRaises(sqlite3.OperationalError):
+            spool.drain(self.spool_path(), apply_then_crash, batch_size=2)
+        self.assertEqual(len(spool.pending(self.spool_path())), 1)
+
+        # New notes keep arriving in a fresh spool meanwhile.
+        with self.redirect:
+            add_note("Infra", ["task 5"], None, db_path=self.db_path, spool=True)
+        self.assertEqual(store.flush_spool(batch_size=2), 4)
+        self.assertEqual(spool.pending(self.spool_path()), [])
+        tasks = [row[0] for row in store.conn.execute("SELECT tasks FROM notes ORDER BY tasks")]
+        self.assertEqual(tasks, [f"task {i}" for i in range(6)])
+        self.assertEqual(store.stats("project"), [("Infra", 6)])
+
+    def test_concurrent_appends_are_not_lost(self):
+        import spool
+        from multiprocessing import Process
+
+        def writer(n):
+            for i in range(50):
+                spool.append(self.spool_path(), {"username": "u", "host": "h", "timestamp": "2024-01-01T00:00:00Z",
+                                                 "project": f"p{n}", "tasks": str(i), "notes": None, "directory": "/"})
+
+        procs = [Process(target=writer, args=(n,)) for n in range(4)]
+        for proc in procs:
+            proc.start()
+        flushed = 0
+        with NotesStore(self.db_path, flush_spool=False) as store:
+            while any(proc.is_alive() for proc in procs):
+                flushed += store.flush_spool()
+            for proc in procs:
+                proc.join()
+            flushed += store.flush_spool()
+            self.assertEqual(flushed, 200)
+            self.assertEqual(store.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 200)
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.writer = NotesStore(self.db_path)
+        self.addCleanup(self.writer.close)
+
+    def test_backlog_then_new_notes_with_adaptive_polling(self):
+        self.writer.add_many([{"project": "Infra", "tasks": [f"old {i}"]} for i in range(3)])
+        self.writer.add_many([{"project": "Web", "tasks": ["other"]}])
+        sleeps = []
+        # Poll number -> notes another connection commits during that sleep.
+        arrivals = {3: [("Infra", "new 1"), ("Web", "skipped")], 4: [("Infra", "new 2"), ("Infra", "new 3")]}
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            notes = arrivals.get(len(sleeps), [])
+            if notes:
+                self.writer.add_many([{"project": p, "tasks": [t]} for p, t in notes])
+
+        with NotesStore(self.db_path) as store:
+            batches = store.watch(project="Infra", backlog=2, min_interval=0.1, max_interval=0.5, sleep=sleep)
+            self.assertEqual([n.tasks for n in next(batches)], ["old 1", "old 2"])
+            self.assertEqual([n.tasks for n in next(batches)], ["new 1"])
+            self.assertEqual([n.tasks for n in next(batches)], ["new 2", "new 3"])
+        self.assertEqual(sleeps, [0.1, 0.2, 0.4, 0.1])
+
+    def test_note_added_after_removing_the_newest_is_reported(self):
+        first, second = (self.writer.add("Infra", [t]) for t in ["one", "two"])
+        polls = []
+
+        def sleep(seconds):
+            polls.append(seconds)
+            if len(polls) == 1:
+                self.writer.remove_many([second])
+                self.writer.add("Infra", ["three"])
+
+        with NotesStore(self.db_path) as store:
+            batches = store.watch(backlog=5, sleep=sleep)
+            self.assertEqual([n.id for n in next(batches)], [first, second])
+            self.assertEqual([n.tasks for n in next(batches)], ["three"])
+
+    def test_query_is_a_rowid_range(self):
+        from notes_core import _newer_query
+
+        q, params = _newer_query("alice", "Infra", None, None, directory_prefix="/srv")
+        plan = " ".join(row[3] for row in self.writer.conn.execute("EXPLAIN QUERY PLAN " + q, params + [0, 10]))
+        self.assertIn("INTEGER PRIMARY KEY (rowid>?)", plan)
+
+
+class TestImport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        open_db(self.db_path).close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        os.environ.pop("NOTES_PRIVACY_LEVEL", None)
+
+    def write_source(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def run_import(self, *args, **kwargs):
+        import io
+        from contextlib import redirect_stderr, redirect_stdout
+
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            import_notes(*args, db_path=self.db_path, **kwargs)
+
+    def rows(self, query):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(query).fetchall()
+        conn.close()
+        return rows
+
+    def test_jsonl_applies_privacy_and_hidden_rules(self):
+        import json
+
+        os.environ["NOTES_PRIVACY_LEVEL"] = "minimal"
+        path = self.write_source(
+            "notes.jsonl",
+            json.dumps({"project": "p", "tasks": ["a", "b"], "username": "alice"}) + "\n"
+            + json.dumps({"tasks": "c; d", "hidden": True, "password": "pw"}) + "\n",
+        )
+        self.run_import(path, batch_size=1)
+        rows = self.rows("SELECT username, directory, tasks, is_hidden, verifier_id FROM notes ORDER BY id")
+        self.assertEqual(rows[0][:4], ("user", "/redacted", "a; b", 0))
+        self.assertEqual(rows[1][2:4], ("c; d", 1))
+        self.assertIsNotNone(rows[1][4])
+
+        bad = self.write_source("bad.jsonl", json.dumps({"tasks": ["x"], "hidden": True}) + "\n")
+        with self.assertRaises(SystemExit):
+            self.run_import(bad)
+
+    def test_resumes_after_last_committed_batch(self):
+        good = "".join(f'{{"tasks": ["task {i}"]}}\n' for i in range(5))
+        path = self.write_source("notes.jsonl", good + "{broken\n")
+        with self.assertRaises(SystemExit):
+            self.run_import(path, batch_size=2)
+        # Batches [0, 1] and [2, 3] were committed; the batch with the bad line was not.
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM notes")[0][0], 4)
+
+        self.write_source("notes.jsonl", good + '{"tasks": ["task 5"]}\n')
+        self.run_import(path, batch_size=2)
+        tasks = [row[0] for row in self.rows("SELECT tasks FROM notes ORDER BY id")]
+        self.assertEqual(tasks, [f"task {i}" for i in range(6)])
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM import_progress")[0][0], 0)
+
+    def test_timestamps_are_validated_and_normalized(self):
+        import json
+
+        path = self.write_source(
+            "notes.jsonl",
+            json.dumps({"tasks": ["east"], "timestamp": "2024-01-01T23:30:00-05:00"}) + "\n"
+            + json.dumps({"tasks": ["day"], "timestamp": "2024-01-03"}) + "\n",
+        )
+        self.run_import(path)
+        self.assertEqual(
+            self.rows("SELECT tasks, timestamp, ts_epoch_ms FROM notes ORDER BY id"),
+            [("east", "2024-01-02T04:30:00Z", 1704169800000), ("day", "2024-01-03T00:00:00Z", 1704240000000)],
+        )
+
+        bad = self.write_source("bad.jsonl", json.dumps({"tasks": ["late"], "timestamp": "yesterday"}) + "\n")
+        with self.assertRaises(SystemExit) as cm:
+            self.run_import(bad)
+        self.assertEqual(cm.exception.code, 1)
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM notes WHERE tasks = 'late'")[0][0], 0)
+
+    def test_csv(self):
+        path = self.write_source("notes.csv", 'project,tasks,notes\nInfra,"one; two",done\n')
+        self.run_import(path, fmt="csv")
+        self.assertEqual(self.rows("SELECT project, tasks, notes FROM notes"), [("Infra", "one; two", "done")])
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        conn = open_db(self.db_path)
+        for i, ts in enumerate(["2024-01-01T10:00:00Z", "2024-02-01T10:00:00Z", "2024-03-01T10:00:00Z"]):
+            conn.execute(
+                "INSERT INTO notes (username, host, timestamp, project, tasks, is_hidden) VALUES ('u', 'h', ?, ?, ?, 0)",
+                (ts, "a" if i < 2 else "b", f"task {i}"),
+            )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def export(self, **kwargs):
+        out = os.path.join(self.tmpdir.name, "out")
+        count = export_notes(output=out, db_path=self.db_path, chunk_size=1, **kwargs)
+        with open(out) as f:
+            return count, f.read()
+
+    def test_jsonl_in_timestamp_order(self):
+        import json
+
+        count, text = self.export()
+        self.assertEqual(count, 3)
+        tasks = [json.loads(line)["tasks"] for line in text.splitlines()]
+        self.assertEqual(tasks, ["task 0", "task 1", "task 2"])
+
+    def test_filters_and_range(self):
+        count, text = self.export(fmt="tsv", project="a", since="2024-01-15")
+        self.assertEqual(count, 1)
+        header, row = text.splitlines()
+        self.assertTrue(header.startswith("id\tusername"))
+        self.assertIn("task 1", row)
+
+        count, text = self.export(fmt="csv", until="2024-01-01")
+        self.assertEqual(count, 0)
+        self.assertEqual(text.splitlines(), ["id,username,host,timestamp,project,tasks,notes,directory,is_hidden"])
+
+
+class TestDirectoryPrefix(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        conn = open_db(self.db_path)
+        directories = ["/srv/repo", "/srv/repo/a", "/srv/repo//a/b/", "/srv/repo2", "/srv/repo-old", "/srv", "C:\\srv\\repo\\c"]
+        for i, directory in enumerate(directories):
+            conn.execute(
+                "INSERT INTO notes (username, timestamp, tasks, directory, is_hidden) VALUES ('u', ?, ?, ?, 0)",
+                (f"2024-01-{i + 1:02d}T00:00:00Z", directory, directory),
+            )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def dirs(self, **kwargs):
+        return [n.tasks for n in iter_notes(db_path=self.db_path, **kwargs)]
+
+    def test_subtree_is_separator_aware(self):
+        expected = ["/srv/repo//a/b/", "/srv/repo/a", "/srv/repo"]
+        self.assertEqual(self.dirs(directory_prefix="/srv/repo"), expected)
+        self.assertEqual(self.dirs(directory_prefix="/srv/repo/"), expected)
+        self.assertEqual(self.dirs(directory_prefix="/srv/repo/a"), expected[:2])
+        # A backslash separates only where it is os.sep; on POSIX it is part of the name.
+        if os.sep == "\\":
+            self.assertEqual(self.dirs(directory_prefix="C:/srv"), ["C:\\srv\\repo\\c"])
+        else:
+            self.assertEqual(self.dirs(directory_prefix="C:/srv"), [])
+            self.assertEqual(self.dirs(directory="C:\\srv\\repo\\c\\"), [])
+            self.assertEqual(self.dirs(directory_prefix="C:\\srv\\repo\\c"), ["C:\\srv\\repo\\c"])
+        self.assertEqual(len(self.dirs(directory_prefix="/")), 6)
+        # Exact matches ignore trailing and doubled separators too.
+        self.assertEqual(self.dirs(directory="/srv/repo/a/b"), ["/srv/repo//a/b/"])
+        self.assertEqual(self.dirs(directory="/srv/repo/"), ["/srv/repo"])
+
+    def test_inserted_keys_match_the_query_side(self):
+        from notes_core import dir_summary
+
+        store = NotesStore(self.db_path)
+        self.addCleanup(store.close)
+        base = {"username": "u", "host": "h", "timestamp": "2024-02-01T00:00:00Z", "project": None, "notes": None}
+        store.insert_entries([
+            (dict(base, tasks="slashes", directory="/srv" + "/" * 20 + "deep" + "/" * 12), False, None),
+            (dict(base, tasks="backslash", directory="/srv/x\\y"), False, None),
+        ])
+        self.assertEqual([n.tasks for n in store.query(directory="/srv/deep")], ["slashes"])
+        self.assertEqual([n.tasks for n in store.query(directory_prefix="/srv/deep/")], ["slashes"])
+        self.assertEqual(dir_summary("/srv//deep", db_path=self.db_path)["count"], 1)
+        self.assertEqual([n.tasks for n in store.query(directory="/srv/x\\y")], ["backslash"])
+        if os.sep == "/":
+            self.assertEqual([n.tasks for n in store.query(directory_prefix="/srv/x")], [])
+
+    def test_upgrade_recomputes_keys(self):
+        conn = open_db(self.db_path)
+        # What the SQL normalization stored before: `\\` read as a separator.
+        conn.execute("UPDATE notes SET dir_key = 'C:/srv/repo/c/' WHERE directory = 'C:\\srv\\repo\\c'")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+        conn = open_db(self.db_path)
+        self.addCleanup(conn.close)
+        key = dir_key("C:\\srv\\repo\\c")
+        self.assertEqual(conn.execute("SELECT dir_key FROM notes WHERE tasks = 'C:\\srv\\repo\\c'").fetchone()[0], key)
+        self.assertEqual(conn.execute("SELECT count FROM dir_summary WHERE directory = ?", (key,)).fetchone()[0], 1)
+
+    def test_new_notes_and_paging(self):
+        store = NotesStore(self.db_path)
+        fields = {"username": "u", "host": "h", "timestamp": "2024-02-01T00:00:00Z", "project": None,
+                  "tasks": "fresh", "notes": None, "directory": "/srv/repo/a/"}
+        store.insert_entries([(fields, False, None)])
+        page = list(store.query(limit=2, directory_prefix="/srv/repo"))
+        self.assertEqual([n.tasks for n in page], ["fresh", "/srv/repo//a/b/"])
+        token = f"{page[-1].ts_epoch_ms},{page[-1].id}"
+        self.assertEqual([n.tasks for n in store.query(directory_prefix="/srv/repo", before=token)],
+                         ["/srv/repo/a", "/srv/repo"])
+        store.close()
+
+    def test_prefix_is_an_index_range(self):
+        conn = open_db(self.db_path)
+        for verifier_id in [None, 1]:
+            q, params = _list_query(20, None, None, None, verifier_id, directory_prefix="/srv/repo")
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + q, params)]
+            self.assertTrue(any("idx_notes_dir_key_ms (dir_key>? AND dir_key<?)" in step for step in plan), plan)
+            self.assertFalse(any(step.startswith("SCAN notes") for step in plan), plan)
+        conn.close()
+
+
+class TestDirSummary(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        self.addCleanup(self.store.close)
+
+    def add(self, directory, task, timestamp, hidden=False):
+        fields = {"username": "u", "host": "h", "timestamp": timestamp, "project": None, "tasks": task,
+                  "notes": None, "directory": directory}
+        self.store.insert_entries([(fields, hidden, "pw" if hidden else None)])
+        return self.store.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def summary(self, directory, recursive=False):
+        from notes_core import dir_summary
+
+        s = dir_summary(directory, recursive, db_path=self.db_path)
+        return s["count"], s["last_tasks"]
+
+    def test_triggers_track_count_and_newest(self):
+        self.add("/srv/app", "first", "2024-01-02T00:00:00Z")
+        newest = self.add("/srv/app/", "newest", "2024-01-03T00:00:00Z")
+        self.add("/srv/app", "backfilled", "2024-01-01T00:00:00Z")
+        self.add("/srv/app", "secret", "2024-01-04T00:00:00Z", hidden=True)
+        self.add("/srv/app/web", "deep", "2024-01-05T00:00:00Z")
+        self.add("/srv/application", "sibling", "2024-01-06T00:00:00Z")
+
+        self.assertEqual(self.summary("/srv/app"), (3, "newest"))
+        self.assertEqual(self.summary("/srv/app", recursive=True), (4, "deep"))
+        self.store.remove_many([newest])
+        self.assertEqual(self.summary("/srv/app"), (2, "first"))
+        self.assertEqual(self.summary("/nowhere"), (0, None))
+
+        before = self.store.conn.execute("SELECT * FROM dir_summary ORDER BY directory").fetchall()
+        from database import rebuild_dir_summary
+
+        rebuild_dir_summary(self.store.conn)
+        self.assertEqual(self.store.conn.execute("SELECT * FROM dir_summary ORDER BY directory").fetchall(), before)
+
+    def test_counts_archived_notes(self):
+        self.add("/srv/app", "old", "2020-01-01T00:00:00Z")
+        self.add("/srv/app", "new", "2024-01-01T00:00:00Z")
+        self.add("/srv/other", "keeps the max id", "2024-01-02T00:00:00Z")
+        self.assertEqual(self.store.archive(1672531200000)[0], 1)
+        self.assertEqual(self.summary("/srv/app"), (2, "new"))
+
+    def test_reads_while_a_writer_holds_the_lock(self):
+        self.add("/srv/app", "first", "2024-01-02T00:00:00Z")
+        self.store.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.assertEqual(self.summary("/srv/app"), (1, "first"))
+        finally:
+            self.store.conn.rollback()
+
+    def test_missing_database_is_not_created(self):
+        from notes_core import dir_summary
+
+        missing = os.path.join(self.tmpdir.name, "missing.db")
+        self.assertEqual(dir_summary("/srv", db_path=missing)["count"], 0)
+        self.assertFalse(os.path.exists(missing))
+
+
+class TestComplete(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        self.store = NotesStore(self.db_path)
+        self.addCleanup(self.store.close)
+
+    def add(self, project, timestamp, hidden=False):
+        fields = {"username": "alice", "host": "h", "timestamp": timestamp, "project": project, "tasks": "t",
+                  "notes": None, "directory": "/srv/app"}
+        self.store.insert_entries([(fields, hidden, "pw" if hidden else None)])
+        return self.store.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def complete(self, field, prefix="", limit=50):
+        from complete import complete
+
+        return complete(field, prefix, limit, db_path=self.db_path)
+
+    def test_prefix_lookup_in_frequency_order(self):
+        for project, day in [("Infra", 1), ("Infra", 2), ("Infosec", 3), ("Web", 4), ("Inf", 5), ("Infra", 6)]:
+            self.add(project, f"2024-01-0{day}T00:00:00Z")
+        self.add("Internal", "2024-01-07T00:00:00Z", hidden=True)
+        self.add(None, "2024-01-08T00:00:00Z")
+        self.add("", "2024-01-09T00:00:00Z")
+
+        self.assertEqual(self.complete("project", "Inf"), ["Infra", "Inf", "Infosec"])
+        self.assertEqual(self.complete("project"), ["Infra", "Inf", "Web", "Infosec"])
+        self.assertEqual(self.complete("project", "Inf", limit=1), ["Infra"])
+        self.assertEqual(self.complete("user", "al"), ["alice"])
+        self.assertEqual(self.complete("directory", "/srv/"), ["/srv/app"])
+        with self.assertRaises(ValueError):
+            self.complete("host")
+
+        ids = [row[0] for row in self.store.conn.execute("SELECT id FROM notes WHERE project = 'Infra'")]
+        self.store.remove_many(ids[:2])
+        # Infra drops to one use; its remaining note is still the newest.
+        self.assertEqual(self.complete("project", "Inf"), ["Infra", "Inf", "Infosec"])
+        self.store.remove_many(ids[2:])
+        self.assertEqual(self.complete("project", "Infr"), [])
+
+        before = self.store.conn.execute("SELECT * FROM vocabulary ORDER BY field, value").fetchall()
+        from database import rebuild_vocabulary
+
+        rebuild_vocabulary(self.store.conn)
+        self.assertEqual(self.store.conn.execute("SELECT * FROM vocabulary ORDER BY field, value").fetchall(), before)
+
+    def test_lookups_are_range_scans(self):
+        from complete import _lookup_query
+
+        def plan(prefix):
+            sql, params = _lookup_query("project", prefix, 10)
+            return " ".join(row[3] for row in self.store.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+        self.assertIn("PRIMARY KEY (field=? AND value>? AND value<?)", plan("Inf"))
+        self.assertIn("idx_vocabulary_rank", plan(""))
+        self.assertNotIn("TEMP B-TREE", plan(""))
+
+    def test_includes_archived_values(self):
+        for project, day in [("Infra", 1), ("Infra", 2), ("Infosec", 3), ("Infosec", 4), ("Infosec", 5), ("Inf", 6)]:
+            self.add(project, f"2024-01-0{day}T00:00:00Z")
+        self.add("Infra", "2025-01-01T00:00:00Z")
+        self.assertEqual(self.store.archive(1704499200000), (5, 1))
+
+        # Infra and Infosec both have three uses; Infra was used last.
+        self.assertEqual(self.complete("project", "Inf"), ["Infra", "Infosec", "Inf"])
+        self.assertEqual(self.complete("project"), ["Infra", "Infosec", "Inf"])
+        self.assertEqual(self.complete("project", "Infos"), ["Infosec"])
+        from complete import _merged_query
+
+        sql, params = _merged_query("project", "Inf", 10)
+        plan = [row[3] for row in self.store.conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        self.assertEqual(sum("PRIMARY KEY (field=? AND value>? AND value<?)" in step for step in plan), 2, plan)
+
+        # An archive created before the vocabulary table is upgraded like the main database.
+        archive = sqlite3.connect(os.path.join(self.tmpdir.name, "notes-archive.db"))
+        archive.execute("DROP TABLE vocabulary")
+        archive.execute("PRAGMA user_version = 0")
+        archive.commit()
+        archive.close()
+        self.assertEqual(self.complete("project", "Inf"), ["Infra", "Infosec", "Inf"])
+
+    def test_top_values_across_the_archive_are_exact(self):
+        # Archived: b b c c; hot: a b a. Neither side's top value is b, yet b has the most uses.
+        for project, day in [("b", 1), ("b", 2), ("c", 3), ("c", 4), ("a", 6), ("b", 7), ("a", 8)]:
+            self.add(project, f"2024-01-0{day}T00:00:00Z")
+        self.store.archive(1704499200000)
+        self.assertEqual(self.complete("project", limit=1), ["b"])
+        self.assertEqual(self.complete("project", limit=2), ["b", "a"])
+        self.assertEqual(self.complete("project"), ["b", "a", "c"])
+
+    def test_older_database_is_upgraded_once(self):
+        self.add("Infra", "2024-01-01T00:00:00Z")
+        self.store.conn.execute("DROP TABLE vocabulary")
+        self.store.conn.execute("PRAGMA user_version = 0")
+        self.store.conn.commit()
+        self.assertEqual(self.complete("project", "I"), ["Infra"])
+        self.assertEqual(self.store.conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+
+    def test_parse_argv(self):
+        from complete import DEFAULT_LIMIT, FIELDS, parse_argv
+        from database import VOCABULARY_FIELDS
+
+        self.assertEqual(set(FIELDS), set(VOCABULARY_FIELDS))
+        self.assertEqual(parse_argv(["project"]), ("project", "", DEFAULT_LIMIT, None))
+        self.assertEqual(parse_argv(["--db", "x.db", "-l", "3", "user", "--", "-al"]), ("user", "-al", 3, "x.db"))
+        for argv in [[], ["--help"], ["project", "--limit"], ["project", "--limit", "many"], ["a", "b", "c"],
+                     ["user", "--", "-al", "--limit", "3"]]:
+            self.assertIsNone(parse_argv(argv), argv)
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, self.db_path = tempfile.mkstemp()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(self.db_path)
+
+    def test_upgrades_unversioned_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE notes (id INTEGER PRIMARY KEY, username TEXT NOT NULL, host TEXT, timestamp TEXT NOT NULL, "
+            "project TEXT, tasks TEXT, notes TEXT, directory TEXT, is_hidden INTEGER DEFAULT 0, password_hash TEXT)"
+        )
+        conn.execute("INSERT INTO notes (username, timestamp, tasks) VALUES ('user', '2024-01-01T00:00:00Z', 'old')")
+        conn.commit()
+        conn.close()
+
+        conn = open_db(self.db_path)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0], 1)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn("idx_notes_project_ms", indexes)
+        self.assertEqual(conn.execute("SELECT ts_epoch_ms FROM notes").fetchone()[0], 1704067200000)
+        self.assertIn("idx_notes_dir_key_ms", indexes)
+        # Converted by a full VACUUM so prune can use incremental_vacuum.
+        self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        conn.close()
+
+    def test_list_filters_use_index_without_sort(self):
+        import itertools
+
+        conn = open_db(self.db_path)
+        filters = ["user", "project", "directory"]
+        pages = [
+            {},
+            {"before": (1704067200000, 5)},
+            {"after": (1704067200000, 5)},
+            {"since": 1704067200000, "until": 1706745600000},
+        ]
+        for verifier_id in [None, 1]:
+            for r in range(len(filters) + 1):
+                for combo, page in itertools.product(itertools.combinations(filters, r), pages):
+                    kwargs = {f: "x" for f in combo}
+                    q, params = _list_query(
+                        20,
+                        kwargs.get("user"),
+                        kwargs.get("project"),
+                        kwargs.get("directory"),
+                        verifier_id,
+                        **page,
+                    )
+                    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + q, params)]
+                    label = f"{combo} {page} verifier={verifier_id}: {plan}"
+                    self.assertTrue(any("USING INDEX" in step for step in plan), label)
+                    self.assertFalse(any(step.startswith("SCAN notes") for step in plan), label)
+                    self.assertFalse(any("TEMP B-TREE" in step for step in plan), label)
+        conn.close()
+
 if __name__ == "__main__":
     unittest.main()
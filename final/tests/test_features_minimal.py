@@ -5,7 +5,7 @@ import tempfile
 import datetime
 import getpass
 import hashlib
-from notes_core import add_note, list_notes, hash_password
+from notes_core import add_note, list_notes
 from database import open_db
 
 class TestNotesPrivacy(unittest.TestCase):
@@ -45,10 +45,14 @@ class TestHiddenNotes(unittest.TestCase):
         add_note("proj", ["task1"], "note1", db_path=self.db_path, hidden=True, password="pass")
         conn = sqlite3.connect(self.db_path)
         cur = conn.cursor()
-        cur.execute("SELECT is_hidden, password_hash FROM notes")
+        cur.execute("SELECT is_hidden, password_hash, verifier_id FROM notes")
         row = cur.fetchone()
         self.assertEqual(row[0], 1)
-        self.assertEqual(row[1], hashlib.sha256("pass".encode()).hexdigest())
+        # Hidden notes reference a salted verifier instead of an unsalted hash.
+        self.assertIsNone(row[1])
+        self.assertIsNotNone(row[2])
+        cur.execute("SELECT key FROM password_verifiers")
+        self.assertNotEqual(cur.fetchone()[0].hex(), hashlib.sha256("pass".encode()).hexdigest())
         conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from database import ensure_db, open_db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+# Modules a read-only subcommand must not pull in at startup.
+HEAVY_MODULES = {"socket", "hashlib", "getpass", "json", "csv", "random"}
+
+# Wall-clock budget for one `list-dir` run against a warm DB. Generous enough
+# for slow CI hosts; bench/bench_startup.py gives the precise numbers.
+LIST_DIR_BUDGET_SECONDS = 0.5
+
+
+def loaded_modules(code: str) -> set[str]:
+    out = subprocess.run(
+        [sys.executable, "-c", code + "\nimport sys\nprint('\\n'.join(sys.modules))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(out.split())
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        open_db(self.db_path).close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cli_import_is_lazy(self):
+        modules = loaded_modules("import cli")
+        self.assertNotIn("notes_core", modules)
+        self.assertFalse(HEAVY_MODULES & modules, HEAVY_MODULES & modules)
+
+    def test_list_dir_imports(self):
+        modules = loaded_modules(
+            f"import io, contextlib, cli\n"
+            f"with contextlib.redirect_stdout(io.StringIO()):\n"
+            f"    cli.dispatch(cli.parse_args(['list-dir', '--db', {self.db_path!r}]))"
+        )
+        self.assertIn("notes_core", modules)
+        self.assertFalse(HEAVY_MODULES & modules, HEAVY_MODULES & modules)
+
+    def test_list_dir_summary_imports(self):
+        modules = loaded_modules(
+            f"import io, contextlib, cli\n"
+            f"with contextlib.redirect_stdout(io.StringIO()):\n"
+            f"    cli.dispatch(cli.parse_args(['list-dir', '--summary', '--db', {self.db_path!r}]))"
+        )
+        self.assertFalse(HEAVY_MODULES & modules, HEAVY_MODULES & modules)
+
+    def test_complete_skips_the_cli(self):
+        modules = loaded_modules(
+            f"import sys, main\n"
+            f"sys.argv = ['main.py', 'complete', 'project', 'x', '--db', {self.db_path!r}]\n"
+            f"main.main()"
+        )
+        self.assertIn("complete", modules)
+        self.assertFalse({"argparse", "typing", "cli", "daemon", "tracing"} & modules)
+
+    def test_warm_db_runs_no_ddl(self):
+        conn = open_db(self.db_path)
+        statements = []
+        conn.set_trace_callback(statements.append)
+        ensure_db(conn)
+        conn.close()
+        self.assertEqual(statements, ["PRAGMA user_version"])
+
+    def test_list_dir_within_budget(self):
+        cmd = [sys.executable, MAIN, "list-dir", "--db", self.db_path]
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start)
+        self.assertLess(min(times), LIST_DIR_BUDGET_SECONDS)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import tracing
+from database import open_db
+from notes_core import NotesStore, list_notes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "notes.db")
+        with NotesStore(self.db_path) as store:
+            store.add_many([{"project": "p", "tasks": f"task {i}"} for i in range(3)])
+
+    def tearDown(self):
+        tracing.ENABLED = False
+        tracing.report()
+        self.tmpdir.cleanup()
+
+    def test_disabled_is_plain_sqlite(self):
+        self.assertFalse(tracing.ENABLED)
+        self.assertIs(tracing.connection_factory(), sqlite3.Connection)
+        self.assertIs(tracing.phase("a"), tracing.phase("b"))
+        conn = open_db(self.db_path)
+        self.assertIs(type(conn), sqlite3.Connection)
+        conn.close()
+
+    def test_phases_statements_and_plans(self):
+        tracing.enable("json,plan")
+        with redirect_stdout(io.StringIO()):
+            list_notes(limit=2, project="p", db_path=self.db_path)
+        out = io.StringIO()
+        tracing.report(out)
+        trace = json.loads(out.getvalue())["trace"]
+
+        names = [p["phase"] for p in trace["phases"]]
+        self.assertIn("ensure_db", names)
+        self.assertIn("query+render", names)
+        self.assertTrue(all(p["ms"] is not None for p in trace["phases"]))
+        select = [s for s in trace["statements"] if "ORDER BY ts_epoch_ms DESC" in s["sql"]]
+        self.assertEqual(len(select), 1)
+        self.assertEqual(select[0]["rows"], 2)
+        self.assertTrue(any("idx_notes_project_ms" in step for step in select[0]["plan"]))
+
+        # report() resets the trace.
+        out = io.StringIO()
+        tracing.report(out)
+        self.assertEqual(json.loads(out.getvalue())["trace"]["statements"], [])
+
+    def test_cli_flag_and_environment(self):
+        env = dict(os.environ, NOTES_NO_DAEMON="1")
+        proc = subprocess.run([sys.executable, MAIN, "--trace", "list", "--db", self.db_path],
+                              env=env, capture_output=True, text=True, check=True)
+        self.assertIn("task 2", proc.stdout)
+        self.assertRegex(proc.stderr, r"trace: sql .* 3 rows  SELECT id, username")
+
+        env["NOTES_TRACE"] = "json"
+        proc = subprocess.run([sys.executable, MAIN, "tasks", "--db", self.db_path],
+                              env=env, capture_output=True, text=True, check=True)
+        trace = json.loads(proc.stderr.splitlines()[-1])["trace"]
+        self.assertEqual(trace["phases"][0]["phase"], "parse_args")
+
+        env["NOTES_TRACE"] = "verbose"
+        proc = subprocess.run([sys.executable, MAIN, "--trace-plan", "list", "--db", self.db_path],
+                              env=env, capture_output=True, text=True, check=True)
+        self.assertIn("unknown trace mode", proc.stderr)
+        self.assertIn("plan: SEARCH notes USING INDEX idx_notes_hidden_ms", proc.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+"""Opt-in tracing of where a command spends its time.
+
+Enabled with `notes --trace [--trace-format json] [--trace-plan] ...` or
+NOTES_TRACE=MODE, where MODE is a comma-separated list of:
+
+    text   human-readable report on stderr (the default)
+    json   one JSON object on stderr instead
+    plan   also record EXPLAIN QUERY PLAN for each traced statement
+
+The report lists named phases (nested `phase()` blocks) with monotonic
+timings, and every SQL statement run through a traced connection with its
+time and row count. When tracing is off `phase()` returns a shared no-op
+context manager and `connection_factory()` returns plain sqlite3.Connection,
+so the instrumented code paths are unchanged.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from typing import Optional
+
+# Statements beyond this are counted but not kept (e.g. a long-running daemon).
+MAX_STATEMENTS = 10000
+
+_T0 = time.perf_counter()
+ENABLED = False
+_json = False
+_plans = False
+_depth = 0
+_phases: list[dict] = []
+_statements: list[dict] = []
+_dropped = 0
+
+
+def enable(mode: Optional[str] = "text") -> None:
+    """Turn tracing on; `mode` as in the module docstring. Empty or "0" leaves it off."""
+    global ENABLED, _json, _plans
+    flags = {f.strip().lower() for f in (mode or "").split(",") if f.strip()}
+    if not flags or flags <= {"0", "off", "false"}:
+        return
+    unknown = flags - {"1", "on", "true", "text", "json", "plan"}
+    if unknown:
+        raise ValueError(f"unknown trace mode(s): {', '.join(sorted(unknown))} (expected text, json or plan)")
+    ENABLED = True
+    _json = "json" in flags
+    _plans = "plan" in flags
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Phase:
+    __slots__ = ("record",)
+
+    def __init__(self, name: str):
+        self.record = {"phase": name, "depth": _depth, "ms": None}
+
+    def __enter__(self) -> None:
+        global _depth
+        _phases.append(self.record)
+        self.record["start"] = time.perf_counter()
+        _depth += 1
+
+    def __exit__(self, *exc) -> None:
+        global _depth
+        _depth -= 1
+        self.record["ms"] = round((time.perf_counter() - self.record.pop("start")) * 1000, 3)
+
+
+def phase(name: str):
+    """Context manager timing the block as phase `name` (a no-op unless tracing)."""
+    return _Phase(name) if ENABLED else _NO_PHASE
+
+
+def _record_statement(conn: sqlite3.Connection, sql: str, params) -> Optional[dict]:
+    global _dropped
+    if len(_statements) >= MAX_STATEMENTS:
+        _dropped += 1
+        return None
+    record = {"sql": " ".join(sql.split()), "ms": 0.0, "rows": 0}
+    if _plans and sql.lstrip()[:6].upper() in ("SELECT", "WITH", "UPDATE", "DELETE"):
+        try:
+            # A plain cursor, so the EXPLAIN itself is not traced.
+            cur = sqlite3.Cursor(conn)
+            record["plan"] = [row[3] for row in cur.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error as e:
+            record["plan"] = [f"(unavailable: {e})"]
+    _statements.append(record)
+    return record
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that adds execute/fetch time and fetched (or changed) rows to its statement."""
+
+    _record: Optional[dict] = None
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._record is not None:
+                self._record["ms"] += (time.perf_counter() - start) * 1000
+
+    def execute(self, sql, params=()):
+        self._record = _record_statement(self.connection, sql, params)
+        self._timed(super().execute, sql, params)
+        if self._record is not None and self.description is None and self.rowcount > 0:
+            self._record["rows"] = self.rowcount
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._record = _record_statement(self.connection, sql, ())
+        self._timed(super().executemany, sql, seq_of_params)
+        if self._record is not None and self.rowcount > 0:
+            self._record["rows"] = self.rowcount
+        return self
+
+    def _count(self, rows):
+        if self._record is not None:
+            self._record["rows"] += rows
+        return rows
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._count(len(rows))
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        self._count(1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are traced."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+def connection_factory() -> type:
+    """The `factory` to pass to sqlite3.connect."""
+    return TracedConnection if ENABLED else sqlite3.Connection
+
+
+def report(out=None) -> None:
+    """Write the trace to `out` (stderr) and reset it; does nothing unless tracing."""
+    global _dropped
+    if not ENABLED:
+        return
+    out = out or sys.stderr
+    total_ms = (time.perf_counter() - _T0) * 1000
+    sql_ms = sum(s["ms"] for s in _statements)
+    if _json:
+        import json
+
+        statements = [dict(s, ms=round(s["ms"], 3)) for s in _statements]
+        out.write(json.dumps({"trace": {"pid": os.getpid(), "total_ms": round(total_ms, 3),
+                                        "sql_ms": round(sql_ms, 3), "phases": _phases,
+                                        "statements": statements, "dropped_statements": _dropped}}) + "\n")
+    else:
+        out.write(f"trace: {total_ms:.2f} ms since startup, {len(_statements)} SQL statements in {sql_ms:.2f} ms\n")
+        for p in _phases:
+            ms = "unfinished" if p["ms"] is None else f"{p['ms']:9.3f} ms"
+            out.write(f"trace: {'  ' * p['depth']}{p['phase']:<{24 - 2 * p['depth']}} {ms}\n")
+        for s in _statements:
+            out.write(f"trace: sql {s['ms']:9.3f} ms {s['rows']:>7} rows  {s['sql']}\n")
+            for step in s.get("plan", ()):
+                out.write(f"trace:     plan: {step}\n")
+        if _dropped:
+            out.write(f"trace: {_dropped} further statements not recorded\n")
+    out.flush()
+    _phases.clear()
+    _statements.clear()
+    _dropped = 0
+
+
+try:
+    enable(os.environ.get("NOTES_TRACE"))
+except ValueError as e:
+    print(f"Warning: NOTES_TRACE: {e}", file=sys.stderr)